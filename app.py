@@ -1,12 +1,11 @@
 import os
 import sys
-import subprocess
 import streamlit as st
 
 # Add the `src` directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from backend.upgrade_project import read_code, upgrade_code, write_code  # Corrected import
+from backend.upgrade_project import read_code, read_targeted, select_relevant, upgrade_code, upgrade_code_concurrent, upgrade_code_streaming, write_code  # Corrected import
 from backend.autocoder_enhancer import enhance_enhancer  # Corrected import
 from dotenv import load_dotenv
 import time
@@ -16,8 +15,16 @@ import hashlib
 from memory.logger import log_memory, get_edit_history  # Corrected import
 
 from memory.database import initialize_database, save_project_snapshot, get_project_history  # Corrected import
-from utils.file_utils import scan_project_directory, format_directory_tree  # Corrected import
+from utils.file_utils import scan_project_directory, format_directory_tree, render_tree  # Corrected import
+from utils.tree_index import TreeIndex
 from backend.app_generator import generate_app_from_spec  # Corrected import
+from backend.rate_limiter import is_retryable
+from backend.auto_heal import heal_files, stubbed_files
+from backend.lint_repair import repair_until_clean
+from backend.incremental_check import check_project
+from backend.sandbox import smoke_run
+from backend.hedging import HedgePolicy, hedging_scope
+from memory.usage_metrics import format_summary, new_run, run_summary
 
 # Load environment variables
 load_dotenv()
@@ -32,14 +39,26 @@ def set_page_settings():
         page_icon="🤖"
     )
 
+@st.cache_resource
+def get_tree_index(path):
+    """One tree index per project directory, shared across sessions and reruns"""
+    return TreeIndex(path)
+
+def project_tree(path):
+    """Nested tree of `path`, from the shared index when it is a directory"""
+    if os.path.isdir(path):
+        return get_tree_index(os.path.abspath(path)).tree()
+    return scan_project_directory(path)
+
 def auto_heal_generated(output_dir):
     """
     Automatically fill in any stubs or TODOs in the generated app.
-    This is a second-pass enhancement after initial generation.
+    This is a second-pass enhancement after initial generation: only files
+    with stubs are healed, concurrently, with per-file progress.
     """
     try:
         # Step 1: get a flat list of all .py files under output_dir
-        tree = scan_project_directory(output_dir)
+        tree = project_tree(output_dir)
         flat_files = []
         def _flatten(d, prefix=""):
             for name, sub in d.items():
@@ -55,27 +74,31 @@ def auto_heal_generated(output_dir):
             st.error("❌ No Python files found in generated app")
             return
 
-        with st.spinner("🧠 Auto-healing generated app..."):
-            for full_path in flat_files:
-                # Step 2: read the file’s content
-                orig = read_code(full_path).get(full_path, None)
-                if orig is None:
-                    continue
-
-                # Step 3: upgrade it
-                fixed = upgrade_code(
-                    { full_path: orig },
-                    "Fill in unimplemented methods, remove TODOs, and ensure this file runs without errors.",
-                    provider=st.session_state.provider,
-                    model=st.session_state.model,
-                    temperature=0.2
-                )
+        # Step 2: find the files that actually contain stubs
+        stubbed = stubbed_files(flat_files)
+        if not stubbed:
+            st.success(f"✅ No stubs found in {len(flat_files)} files, nothing to heal")
+            return
+        st.caption(f"🩹 {len(stubbed)} of {len(flat_files)} files have stubs")
 
-                # Step 4: write back any fixes (with .bak backup)
-                if fixed:
-                    write_code(fixed)
+        # Step 3: heal them concurrently, writing each back as it finishes
+        progress = st.progress(0.0, text="🧠 Auto-healing generated app...")
+        healed = 0
+        for done, (full_path, fixed) in enumerate(heal_files(
+            stubbed,
+            provider=st.session_state.provider,
+            model=st.session_state.model,
+            temperature=0.2
+        ), start=1):
+            rel = os.path.relpath(full_path, output_dir)
+            if fixed:
+                write_code(fixed)
+                healed += 1
+            else:
+                st.warning(f"⚠️ Could not heal `{rel}`")
+            progress.progress(done / len(stubbed), text=f"🧠 Healed `{rel}` ({done}/{len(stubbed)})")
 
-        st.success("✅ Auto-healing completed!")
+        st.success(f"✅ Auto-healing completed! {healed}/{len(stubbed)} files healed")
     except Exception as e:
         st.error(f"❌ Auto-healing failed: {e}")
 
@@ -108,9 +131,27 @@ def configure_sidebar():
         value=0.3
     )
     
-    st.session_state.setdefault("provider", provider)
-    st.session_state.setdefault("model", model)
-    st.session_state.setdefault("temperature", temperature)
+    # Follow the widgets on every rerun; requests and the hedging scope read these
+    st.session_state["provider"] = provider
+    st.session_state["model"] = model
+    st.session_state["temperature"] = temperature
+
+    concurrency = st.sidebar.slider(
+        "Parallel requests",
+        min_value=1,
+        max_value=16,
+        value=4,
+        help="Folder upgrades send each file in its own request, this many at a time"
+    )
+    st.session_state["concurrency"] = concurrency
+
+    # Hedge slow or failing requests to the other provider, for this session only
+    backup = "DeepSeek" if provider == "OpenAI" else "OpenAI"
+    hedge = st.sidebar.checkbox(f"🪁 Hedge with {backup}", value=False,
+                                help=f"Send a duplicate request to {backup} when {provider} is slow to respond")
+    st.session_state["hedging"] = (
+        st.session_state.provider, HedgePolicy(backup, models[backup][0]) if hedge else None
+    )
     
     return dark_mode
 
@@ -175,31 +216,55 @@ def choose_path(label="📂 Path to file or folder"):
     return st.session_state.get(key, "")
 
 
-def perform_upgrade(file_path, upgrade_instruction):
+def perform_upgrade(file_path, upgrade_instruction, stream=False, edit_format="whole", target=None, top_k=0):
     try:
-        files = read_code(file_path)
+        context = None
+        if target:
+            try:
+                files, context = read_targeted(file_path, target)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                return None, None
+        else:
+            files = read_code(file_path, include_large=True)
+            files = select_relevant(files, file_path, upgrade_instruction, top_k)
         if not files:
             st.error("❌ No valid files found")
             return None, files
             
+        run_id = new_run()
         with st.spinner("🧠 Applying AI upgrades..."):
-            upgraded = upgrade_code(
-                files, 
-                upgrade_instruction,
-                provider=st.session_state.provider,
-                model=st.session_state.model,
-                temperature=st.session_state.temperature
-            )
+            if stream:
+                upgraded = stream_upgrade(files, upgrade_instruction, context)
+            else:
+                upgraded = upgrade_code_concurrent(
+                    files, 
+                    upgrade_instruction,
+                    provider=st.session_state.provider,
+                    model=st.session_state.model,
+                    temperature=st.session_state.temperature,
+                    max_workers=st.session_state.get("concurrency", 4),
+                    edit_format=edit_format,
+                    context=context
+                )
+                if upgraded:
+                    write_code(upgraded)
             if upgraded:
-                write_code(upgraded)
-                
                 # Save project snapshot
                 project_hash = save_project_snapshot(file_path, files, upgraded)
                 st.session_state["last_project_hash"] = project_hash
+            usage = run_summary(run_id)
+            if usage["requests"]:
+                st.caption(f"📊 {format_summary(usage)}")
                 
         return upgraded, files
     except Exception as e:
         st.error(f"⚠️ Upgrade failed: {e}")
+        if is_retryable(e):
+            # Throttling / outages were already retried with backoff;
+            # re-sending every file would only make it worse.
+            st.info("⏳ The provider is busy or unavailable. Please try again shortly.")
+            return None, None
         # Attempt self-healing
         with st.spinner("🛠️ Attempting self-healing..."):
             try:
@@ -211,6 +276,26 @@ def perform_upgrade(file_path, upgrade_instruction):
                 st.error(f"❌ Self-healing failed: {heal_error}")
         return None, None
 
+def stream_upgrade(files, upgrade_instruction, context=None):
+    """Stream the upgrade, writing and listing each file as soon as it lands"""
+    landed = st.empty()
+    written = []
+
+    def _on_file(fname, content):
+        write_code({fname: content})
+        written.append(fname)
+        landed.markdown("\n".join(f"- ✅ `{name}`" for name in written))
+
+    return upgrade_code_streaming(
+        files,
+        upgrade_instruction,
+        provider=st.session_state.provider,
+        model=st.session_state.model,
+        temperature=st.session_state.temperature,
+        on_file=_on_file,
+        context=context
+    )
+
 def self_heal_upgrade(file_path, upgrade_instruction, error_message):
     """Attempt to automatically fix upgrade errors"""
     try:
@@ -282,34 +367,30 @@ def show_generator_page():
                     output_dir = generate_app_from_spec(spec)
                     # second-pass fill in any stubs
                     auto_heal_generated(output_dir)
-                    # lint & auto-fix
-                    tree_tmp = scan_project_directory(output_dir)
-                    flat_tmp = []
-                    def _flatten(d, prefix=""):
-                        for name, sub in d.items():
-                            path = os.path.join(prefix, name) if prefix else name
-                            if sub is None:
-                                flat_tmp.append(path)
-                            else:
-                                _flatten(sub, path)
-                    _flatten(tree_tmp)
+                    # lint & auto-fix only the files with errors
                     errors = lint_and_test(output_dir)
                     if errors:
                         with st.spinner("Fixing lint errors…"):
-                            for rel in flat_tmp:
-                                full = os.path.join(output_dir, rel)
-                                content = open(full, encoding='utf-8').read()
-                                fixed = upgrade_code(
-                                    {full: content},
-                                    f"Flake8 errors:\n{errors}\nPlease correct them.",
-                                    provider=st.session_state.provider,
-                                    model=st.session_state.model,
-                                    temperature=0.1
+                            remaining = repair_until_clean(
+                                output_dir,
+                                errors,
+                                lambda paths: lint_and_test(output_dir, paths),
+                                provider=st.session_state.provider,
+                                model=st.session_state.model,
+                                temperature=0.1,
+                                on_round=lambda n, by_file: st.caption(
+                                    f"🔧 Repair round {n}: " + ", ".join(
+                                        f"`{os.path.relpath(p, output_dir)}` ({len(d)})" for p, d in by_file.items()
+                                    )
                                 )
-                                if fixed:
-                                    for p, new in fixed.items():
-                                        relp = os.path.relpath(p, output_dir)
-                                        write_file(relp, output_dir, new)
+                            )
+                            if remaining:
+                                st.warning(f"⚠️ {len(remaining)} problems left after repair")
+                    # headless start, in a sandbox with a timeout
+                    smoke = smoke_run(output_dir)
+                    if smoke and not smoke.passed:
+                        st.warning(f"⚠️ The app exited with code {smoke.returncode} on startup")
+                        st.code(smoke.stderr[-2000:] or smoke.stdout[-2000:])
                 st.success(f"🎉 Project generated in `{output_dir}`")
                 st.session_state["generated_app"] = output_dir
             except Exception as e:
@@ -318,7 +399,7 @@ def show_generator_page():
     # If we have a generated app, show its tree + let the user preview/enhance individual files
     base = st.session_state.get("generated_app")
     if base:
-        tree = scan_project_directory(base)
+        tree = project_tree(base)
         flat_files = []
         def _flatten(d, prefix=""):
             for name, sub in d.items():
@@ -359,8 +440,6 @@ def show_generator_page():
                         st.success("✅ File enhanced!")
                         st.experimental_rerun()
 
-import subprocess
-
 
 import os
 
@@ -376,33 +455,32 @@ def write_file(rel_path: str, base_dir: str, content: str) -> None:
         f.write(content)
 
 
-def lint_and_test(base_dir: str) -> str:
+def lint_and_test(base_dir: str, paths=None) -> str:
     """
-    Run Flake8 and pytest on `base_dir`.
+    Run Flake8 and pytest on `base_dir`, or only on `paths` and the tests
+    that import them. Unchanged files and tests reuse their cached results.
     Returns a combined error report, or empty string if all pass.
     """
-    reports = []
+    return check_project(base_dir, paths)
 
-    # 1) Flake8 linting
-    lint = subprocess.run(
-        ['flake8', base_dir],
-        capture_output=True,
-        text=True
-    )
-    if lint.returncode != 0:
-        reports.append("🔍 Lint errors:\n" + lint.stdout)
-
-    # 2) Pytest (discover tests under base_dir)
-    test = subprocess.run(
-        ['pytest', base_dir, '--maxfail=1', '--disable-warnings'],
-        capture_output=True,
-        text=True
-    )
-    if test.returncode != 0:
-        reports.append("🧪 Test failures:\n" + test.stdout + test.stderr)
 
-    return "\n\n".join(reports)
+def _expand_folder(state_key, view):
+    folder = st.session_state[f"{state_key}:expand"]
+    if folder:
+        # Opening a nested folder opens its parents too
+        parts = folder.split("/")
+        view["expanded"].update("/".join(parts[:i]) for i in range(1, len(parts) + 1))
+    st.session_state[f"{state_key}:expand"] = ""
 
+def _next_page(state_key, view):
+    folder = st.session_state[f"{state_key}:more"]
+    if folder is not None:
+        view["pages"][folder] = view["pages"].get(folder, 1) + 1
+    st.session_state[f"{state_key}:more"] = None
+
+def _collapse_tree(view):
+    view["expanded"].clear()
+    view["pages"].clear()
 
 def show_project_browser(project_path):
     """Display project directory structure with real-time updates"""
@@ -412,17 +490,43 @@ def show_project_browser(project_path):
         st.warning("⚠️ Please select a valid project path")
         return
         
-    # Scan project directory
-    project_tree = scan_project_directory(project_path)
-    formatted_tree = format_directory_tree(project_tree)
+    # Render lazily: only expanded folders, a page of entries per folder
+    state_key = f"tree_view:{os.path.abspath(project_path)}"
+    view = st.session_state.setdefault(state_key, {"expanded": set(), "pages": {}})
+
+    # Cached scan: only directories that changed since the last rerun are re-read,
+    # and file sizes are only re-checked in the folders on screen
+    if os.path.isdir(project_path):
+        index = get_tree_index(os.path.abspath(project_path))
+        if st.button("🔄 Recount sizes", key=f"{state_key}:restat"):
+            index.restat()
+        else:
+            index.restat([""] + sorted(view["expanded"]))
+        tree, file_count, total_size = index.tree(), index.file_count, index.total_size
+    else:
+        tree, file_count, total_size = scan_project_directory(project_path), 1, os.path.getsize(project_path)
+    rendered = render_tree(tree, view["expanded"], view["pages"])
     
     # Display with expandable sections
     with st.expander("📁 Project Tree", expanded=True):
-        st.markdown(f"<div class='file-tree'>{formatted_tree}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div class='file-tree'>{rendered.html}</div>", unsafe_allow_html=True)
+        col1, col2, col3 = st.columns([2, 2, 1])
+        if rendered.collapsed:
+            col1.selectbox(
+                "📂 Expand folder", [""] + rendered.collapsed,
+                key=f"{state_key}:expand", on_change=_expand_folder, args=(state_key, view)
+            )
+        if rendered.paginated:
+            col2.selectbox(
+                "➕ Show more in", [None] + rendered.paginated,
+                format_func=lambda rel: "" if rel is None else rel or "(project root)",
+                key=f"{state_key}:more", on_change=_next_page, args=(state_key, view)
+            )
+        if view["expanded"] or view["pages"]:
+            col3.button("⏫ Collapse all", key=f"{state_key}:collapse", on_click=_collapse_tree, args=(view,))
     
     # Show file count stats
-    file_count = sum(1 for _ in os.walk(project_path))
-    st.caption(f"📊 {file_count} files in project")
+    st.caption(f"📊 {file_count} files in project, {total_size / 1024:.1f} KB")
 
 def show_autocoder_page():
     st.header("⚙️ Autocoder Upgrade Tool")
@@ -450,6 +554,27 @@ def show_autocoder_page():
         value=selected_upgrade,
         height=100
     )
+    target = ""
+    top_k = 0
+    if file_path and os.path.isdir(file_path):
+        target = st.text_input(
+            "🔎 Target file or symbol (optional)",
+            help="Upgrade just this file, class or function; the files it imports and that import it go along as reference"
+        )
+        top_k = st.number_input(
+            "📚 Most relevant files to upgrade (0 = all)",
+            min_value=0,
+            value=0,
+            disabled=bool(target.strip()),
+            help="Rank the project's files against the instruction and only send the best matches"
+        )
+    stream = st.checkbox("📡 Stream files as they land", value=False)
+    diff_mode = st.checkbox(
+        "✂️ Request edits as diffs",
+        value=False,
+        disabled=stream,
+        help="The model returns only changed regions, which are patched in locally"
+    )
     
     # Execute upgrade
     if st.button("🚀 Apply Upgrade", use_container_width=True):
@@ -460,7 +585,14 @@ def show_autocoder_page():
         elif not file_path or not os.path.exists(file_path):
             st.warning("⚠️ Please select a valid file or folder")
         else:
-            upgraded, original = perform_upgrade(file_path, custom_upgrade)
+            upgraded, original = perform_upgrade(
+                file_path,
+                custom_upgrade,
+                stream=stream,
+                edit_format="diff" if diff_mode and not stream else "whole",
+                target=target.strip() or None,
+                top_k=int(top_k)
+            )
             if upgraded:
                 st.success("🎉 Upgrade completed successfully!")
                 st.balloons()
@@ -548,7 +680,10 @@ def main():
         ["🧠 Autocoder", "🧬 Enhancer", "🛠️ Generator", "📚 Project History", "ℹ️ About"],
         label_visibility="collapsed"
     )
-    
+    with hedging_scope(*st.session_state["hedging"]):
+        show_page(page)
+
+def show_page(page):
     if page == "🧠 Autocoder":
         show_autocoder_page()
     elif page == "🧬 Enhancer":
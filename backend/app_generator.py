@@ -1,21 +1,18 @@
 # backend/app_generator.py
 
-import os
 import textwrap
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
-import openai
-from openai import OpenAI, APIError
-import re
+from openai import APIError
+
+from backend.llm_client import chat_completion, get_client
+from backend.response_parser import parse_file_blocks
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 def break_down_task(prompt: str) -> str:
     """
     Break down a high-level goal into clear subgoals.
@@ -41,13 +38,13 @@ def break_down_task(prompt: str) -> str:
     ]
 
     try:
-        res = client.chat.completions.create(
+        breakdown = chat_completion(
+            get_client(),
+            messages,
             model="gpt-4-turbo",
-            messages=messages,
             temperature=0.4,
             max_tokens=1000
-        )
-        breakdown = res.choices[0].message.content.strip()
+        ).strip()
         logger.info("Task breakdown:\n%s", breakdown)
         return breakdown
     except APIError as e:
@@ -58,45 +55,13 @@ def break_down_task(prompt: str) -> str:
 
 def parse_project_structure(response: str) -> dict:
     """
-    More robust parser: first try fenced blocks, then fallback to FILE: headers.
+    Parse FILE: blocks (fenced or not) in a single pass.
     Returns { relative_path: content }.
     """
-    result = {}
-
-    # 1) Look for blocks like:
-    #    FILE: path/to/file.ext
-    #    ```[lang]
-    #    code...
-    #    ```
-    fence_pattern = re.compile(
-        r"FILE:\s*(?P<fname>.+?)\s*?\n```(?:[^\n]*)?\n(?P<code>[\s\S]*?)\n```",
-        re.MULTILINE
-    )
-    for m in fence_pattern.finditer(response):
-        fname = m.group("fname").strip()
-        code  = m.group("code").rstrip()
-        result[fname] = code
-
-    if result:
-        return result
-
-    # 2) Fallback: split on lines starting with FILE:
-    lines = response.splitlines()
-    curr = None
-    buf  = []
-    for line in lines:
-        if line.strip().upper().startswith("FILE:"):
-            if curr:
-                result[curr] = "\n".join(buf).strip()
-            curr = line.split(":",1)[1].strip()
-            buf = []
-        elif curr:
-            buf.append(line)
-    if curr and buf:
-        result[curr] = "\n".join(buf).strip()
+    result = dict(parse_file_blocks(response))
 
     if not result:
-        # 3) Debug: log raw GPT output to help tune your prompt
+        # Debug: log raw GPT output to help tune your prompt
         logger.error("Failed to parse project structure. Raw response:\n%s", response)
 
     return result
@@ -132,17 +97,16 @@ def generate_app_from_spec(spec: str, output_dir: str = "generated_app") -> Path
     """).strip()
 
     # 3. Call the API to generate scaffold
-    resp = client.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[
+    project_text = chat_completion(
+        get_client(),
+        [
             {"role": "system",  "content": system_prompt},
             {"role": "user",    "content": "Please output the project files as specified above."}
         ],
+        model="gpt-4-turbo",
         temperature=0.3,
         max_tokens=3000
     )
-
-    project_text = resp.choices[0].message.content
     files = parse_project_structure(project_text)
     if not files:
         raise RuntimeError("Failed to parse project structure from GPT response")
@@ -0,0 +1,142 @@
+# backend/auto_heal.py
+
+import io
+import re
+import ast
+import logging
+import tokenize
+from concurrent.futures import as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utils.context_threads import ContextThreadPoolExecutor
+from backend.upgrade_project import DEFAULT_CONCURRENCY, read_file, upgrade_code
+
+logger = logging.getLogger(__name__)
+
+HEAL_INSTRUCTION = "Fill in unimplemented methods, remove TODOs, and ensure this file runs without errors."
+MARKER_RE = re.compile(r"\b(TODO|FIXME)\b")
+# Decorated functions that are meant to have no body
+EXEMPT_DECORATORS = frozenset(("abstractmethod", "overload"))
+
+
+def find_stubs(content: str) -> List[str]:
+    """
+    Describe every stub in a Python source: functions whose body is only
+    `pass` / `...` / `raise NotImplementedError`, any other raise of
+    NotImplementedError, and TODO/FIXME comments. Empty list if complete.
+    """
+    try:
+        tree = ast.parse(content)
+    except SyntaxError as e:
+        return [f"line {e.lineno}: syntax error ({e.msg})"]
+
+    stubs = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if any(_decorator_name(d) in EXEMPT_DECORATORS for d in node.decorator_list):
+            continue
+        body = node.body
+        if ast.get_docstring(node) is not None:
+            body = body[1:]
+        if not body or all(_is_placeholder(stmt) for stmt in body):
+            stubs.append(f"line {node.lineno}: `{node.name}` has no implementation")
+            continue
+        for child in ast.walk(node):
+            if isinstance(child, ast.Raise) and _is_not_implemented(child.exc):
+                stubs.append(f"line {child.lineno}: `{node.name}` raises NotImplementedError")
+                break
+
+    stubs.extend(_marker_comments(content))
+    return stubs
+
+
+def _decorator_name(decorator: ast.expr) -> Optional[str]:
+    if isinstance(decorator, ast.Call):
+        decorator = decorator.func
+    if isinstance(decorator, ast.Attribute):
+        return decorator.attr
+    if isinstance(decorator, ast.Name):
+        return decorator.id
+    return None
+
+
+def _is_placeholder(stmt: ast.stmt) -> bool:
+    if isinstance(stmt, ast.Pass):
+        return True
+    if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+        return stmt.value.value is Ellipsis or isinstance(stmt.value.value, str)
+    return isinstance(stmt, ast.Raise) and _is_not_implemented(stmt.exc)
+
+
+def _is_not_implemented(exc: Optional[ast.expr]) -> bool:
+    if isinstance(exc, ast.Call):
+        exc = exc.func
+    return isinstance(exc, ast.Name) and exc.id in ("NotImplementedError", "NotImplemented")
+
+
+def _marker_comments(content: str) -> List[str]:
+    found = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(content).readline):
+            if token.type == tokenize.COMMENT and MARKER_RE.search(token.string):
+                found.append(f"line {token.start[0]}: {token.string.lstrip('# ').strip()}")
+    except (tokenize.TokenError, IndentationError):
+        logger.debug("Could not tokenize source for TODO markers", exc_info=True)
+    return found
+
+
+def stubbed_files(paths: List[str]) -> Dict[str, Tuple[str, List[str]]]:
+    """{path: (content, stubs)} for the .py files among `paths` that need healing"""
+    result = {}
+    for path in paths:
+        if not path.endswith(".py"):
+            continue
+        try:
+            content = read_file(path)
+        except OSError as e:
+            logger.warning("Skipping %s: %s", path, e)
+            continue
+        stubs = find_stubs(content)
+        if stubs:
+            result[path] = (content, stubs)
+    return result
+
+
+def heal_files(
+    stubbed: Dict[str, Tuple[str, List[str]]],
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.2,
+    max_workers: int = DEFAULT_CONCURRENCY
+) -> Iterator[Tuple[str, Optional[Dict[str, str]]]]:
+    """
+    Heal each stubbed file in its own request, concurrently. Yields
+    (path, upgraded files) as each finishes, or (path, None) on failure,
+    so the caller can report progress from its own thread.
+    """
+    if not stubbed:
+        return
+    with ContextThreadPoolExecutor(max_workers=max(1, min(max_workers, len(stubbed)))) as pool:
+        futures = {
+            pool.submit(
+                upgrade_code,
+                {path: content},
+                _heal_instruction(stubs),
+                provider=provider,
+                model=model,
+                temperature=temperature
+            ): path
+            for path, (content, stubs) in stubbed.items()
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                yield path, future.result()
+            except Exception as e:
+                logger.error("Healing %s failed: %s", path, e)
+                yield path, None
+
+
+def _heal_instruction(stubs: List[str]) -> str:
+    return HEAL_INSTRUCTION + "\nUnfinished spots:\n" + "\n".join(f"- {stub}" for stub in stubs)
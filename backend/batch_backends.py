@@ -0,0 +1,211 @@
+# backend/batch_backends.py
+
+import os
+import json
+import shutil
+import logging
+from typing import Callable, Dict, Iterator, Optional, Tuple, Type
+
+from memory.batch_jobs import BATCH_DIR
+from backend.llm_client import get_client
+
+logger = logging.getLogger(__name__)
+
+# Normalised job states reported by every backend
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# A batch line body (model, messages, ...) -> reply text
+Responder = Callable[[Dict], str]
+
+
+class BatchBackend:
+    """
+    Somewhere to send a JSONL file of chat requests and collect the replies later.
+    Input lines follow the OpenAI batch format:
+        {"custom_id": ..., "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+    """
+
+    name = "base"
+
+    def submit(self, batch_path: str, job_id: str) -> str:
+        """Submit the batch file, tagged with our job id, and return the backend's id for it"""
+        raise NotImplementedError
+
+    def find(self, job_id: str) -> Optional[str]:
+        """The backend's id for a batch submitted under `job_id`, if it got that far"""
+        return None
+
+    def status(self, batch_id: str) -> str:
+        """IN_PROGRESS, COMPLETED or FAILED"""
+        raise NotImplementedError
+
+    def results(self, batch_id: str) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield (custom_id, reply text) per request; text is None for failed requests"""
+        raise NotImplementedError
+
+
+def parse_result_line(line: str) -> Tuple[str, Optional[str]]:
+    """Read one line of OpenAI batch output"""
+    record = json.loads(line)
+    response = record.get("response") or {}
+    if record.get("error") or response.get("status_code", 200) != 200:
+        logger.warning("Batch request %s failed: %s", record.get("custom_id"), record.get("error") or response)
+        return record["custom_id"], None
+    choices = (response.get("body") or {}).get("choices") or [{}]
+    return record["custom_id"], (choices[0].get("message") or {}).get("content")
+
+
+def result_line(custom_id: str, content: Optional[str] = None, error: Optional[str] = None) -> str:
+    """Write one line of OpenAI batch output"""
+    if error is not None:
+        record = {"custom_id": custom_id, "response": None, "error": {"message": error}}
+    else:
+        record = {
+            "custom_id": custom_id,
+            "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}},
+            "error": None,
+        }
+    return json.dumps(record, ensure_ascii=False)
+
+
+def echo_responder(body: Dict) -> str:
+    """
+    A Responder that returns every file of the request unchanged, without
+    calling a provider: a dry run of the submit -> poll -> apply cycle.
+    """
+    blocks = []
+    for message in body["messages"]:
+        header, _, content = message["content"].partition("\n\n")
+        if message["role"] == "user" and header.startswith("File: "):
+            blocks.append(f"{header}\n```\n{content}\n```")
+    return "\n\n".join(blocks)
+
+
+class LocalFileBackend(BatchBackend):
+    """
+    Batches live in a directory: <root>/<job id>/input.jsonl and output.jsonl.
+    With a `respond` callable the batch is worked through on submit;
+    otherwise output.jsonl is left for another process to produce.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str = os.path.join(BATCH_DIR, "local"), respond: Optional[Responder] = None):
+        self.root = root
+        self.respond = respond
+
+    def _dir(self, batch_id: str) -> str:
+        return os.path.join(self.root, batch_id)
+
+    def submit(self, batch_path: str, job_id: str) -> str:
+        batch_id = job_id
+        os.makedirs(self._dir(batch_id), exist_ok=True)
+        target = os.path.join(self._dir(batch_id), "input.jsonl")
+        shutil.copyfile(batch_path, target + ".part")
+        os.replace(target + ".part", target)
+        if self.respond is not None:
+            self.process(batch_id, self.respond)
+        return batch_id
+
+    def find(self, job_id: str) -> Optional[str]:
+        if not os.path.exists(os.path.join(self._dir(job_id), "input.jsonl")):
+            return None
+        if self.respond is not None and self.status(job_id) != COMPLETED:
+            self.process(job_id, self.respond)  # Interrupted while answering
+        return job_id
+
+    def process(self, batch_id: str, respond: Responder) -> None:
+        """Answer every request in the batch and publish output.jsonl atomically"""
+        output = os.path.join(self._dir(batch_id), "output.jsonl")
+        partial = output + ".part"
+        with open(os.path.join(self._dir(batch_id), "input.jsonl"), encoding="utf-8") as src, \
+                open(partial, "w", encoding="utf-8") as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    dst.write(result_line(request["custom_id"], respond(request["body"])) + "\n")
+                except Exception as e:
+                    logger.warning("Local batch request %s failed: %s", request["custom_id"], e)
+                    dst.write(result_line(request["custom_id"], error=str(e)) + "\n")
+        os.replace(partial, output)
+
+    def status(self, batch_id: str) -> str:
+        if not os.path.isdir(self._dir(batch_id)):
+            return FAILED
+        if os.path.exists(os.path.join(self._dir(batch_id), "output.jsonl")):
+            return COMPLETED
+        return IN_PROGRESS
+
+    def results(self, batch_id: str) -> Iterator[Tuple[str, Optional[str]]]:
+        with open(os.path.join(self._dir(batch_id), "output.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield parse_result_line(line)
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """The OpenAI Batch API (24h completion window, discounted pricing)"""
+
+    name = "openai"
+    FAILED_STATES = {"failed", "expired", "cancelled", "cancelling"}
+
+    def __init__(self, provider: str = "OpenAI"):
+        self.provider = provider
+
+    def submit(self, batch_path: str, job_id: str) -> str:
+        client = get_client(self.provider)
+        with open(batch_path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            metadata={"autocoder_job": job_id}
+        )
+        return batch.id
+
+    def find(self, job_id: str) -> Optional[str]:
+        for batch in get_client(self.provider).batches.list(limit=100):
+            if (batch.metadata or {}).get("autocoder_job") == job_id:
+                return batch.id
+        return None
+
+    def status(self, batch_id: str) -> str:
+        state = get_client(self.provider).batches.retrieve(batch_id).status
+        if state == "completed":
+            return COMPLETED
+        if state in self.FAILED_STATES:
+            return FAILED
+        return IN_PROGRESS
+
+    def results(self, batch_id: str) -> Iterator[Tuple[str, Optional[str]]]:
+        client = get_client(self.provider)
+        batch = client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield parse_result_line(line)
+
+
+BATCH_BACKENDS: Dict[str, Type[BatchBackend]] = {
+    LocalFileBackend.name: LocalFileBackend,
+    OpenAIBatchBackend.name: OpenAIBatchBackend,
+}
+
+
+def register_backend(backend: Type[BatchBackend]) -> None:
+    """Make a BatchBackend subclass available by its name"""
+    BATCH_BACKENDS[backend.name] = backend
+
+
+def get_backend(name: str, **kwargs) -> BatchBackend:
+    try:
+        return BATCH_BACKENDS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown batch backend: {name}") from None
@@ -0,0 +1,188 @@
+# backend/batch_runner.py
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, List, NamedTuple, Optional
+
+from utils.context_threads import ContextThreadPoolExecutor
+from backend.upgrade_project import iter_paths, read_file, upgrade_code, write_code
+from backend.validation import validate_content
+from memory.run_checkpoints import FINISHED, clear_checkpoints, load_checkpoints, run_counts, save_checkpoint
+
+DEFAULT_WORKERS = 4
+
+
+class Job(NamedTuple):
+    """One manifest entry: an instruction applied to every file under a path"""
+    index: int
+    path: str
+    instruction: str
+    provider: str = "OpenAI"
+    model: str = "gpt-4-turbo"
+    temperature: float = 0.3
+    edit_format: str = "whole"
+
+
+def load_manifest(manifest_path: str) -> List[Job]:
+    """
+    Read jobs from a JSON list or a JSONL file. Each entry needs "path"
+    and "instruction" (or "upgrade"); provider, model, temperature and
+    edit_format are optional.
+    """
+    with open(manifest_path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    jobs = []
+    for index, entry in enumerate(entries):
+        instruction = entry.get("instruction") or entry.get("upgrade")
+        if not entry.get("path") or not instruction:
+            raise ValueError(f"Manifest entry {index} needs a path and an instruction")
+        options = {key: entry[key] for key in ("provider", "model", "temperature", "edit_format") if key in entry}
+        jobs.append(Job(index, entry["path"], instruction, **options))
+    return jobs
+
+
+def manifest_id(jobs: List[Job]) -> str:
+    """Stable id for a manifest: the same jobs resume the same run"""
+    payload = json.dumps([job._asdict() for job in jobs], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class Progress:
+    """Throughput and ETA over the files processed in this session"""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.finished = skipped
+        self.processed = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, fname: str, status: str) -> None:
+        with self._lock:
+            self.finished += 1
+            self.processed += 1
+            elapsed = time.monotonic() - self.started
+            rate = self.processed / elapsed if elapsed else 0.0
+            remaining = self.total - self.finished
+            eta = _format_duration(remaining / rate) if rate else "?"
+            logging.info(f"[{self.finished}/{self.total}] {rate * 60:.1f} files/min, ETA {eta} - {status}: {fname}")
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def run_manifest(
+    manifest_path: str,
+    max_workers: int = DEFAULT_WORKERS,
+    run_id: Optional[str] = None,
+    restart: bool = False
+) -> Dict[str, int]:
+    """
+    Run every job of a manifest through read -> prompt -> call -> parse ->
+    validate -> write, one file per unit of work, `max_workers` at a time.
+    Each finished file is checkpointed in SQLite; rerunning the same
+    manifest skips them and retries only what failed or never ran.
+    The run id defaults to a hash of the manifest; pass another `run_id`,
+    or `restart`, to run a finished manifest again from scratch.
+    Returns the count of files per final status.
+    """
+    jobs = load_manifest(manifest_path)
+    run_id = run_id or manifest_id(jobs)
+    if restart:
+        clear_checkpoints(run_id)
+        logging.info(f"🔁 Restarting run {run_id}")
+    checkpoints = load_checkpoints(run_id)
+
+    units, skipped = [], 0
+    for job in jobs:
+        for fname in iter_paths(job.path):
+            status, new_hash = checkpoints.get((job.index, fname), (None, None))
+            if status == "writing" and _current_hash(fname) == new_hash:
+                # Crashed between writing the file and checkpointing it
+                save_checkpoint(run_id, job.index, fname, "done", new_hash)
+                status = "done"
+            if status in FINISHED:
+                skipped += 1
+            else:
+                units.append((job, fname))
+
+    total = len(units) + skipped
+    logging.info(f"📋 Run {run_id}: {len(jobs)} jobs, {total} files, {skipped} already done")
+    progress = Progress(total, skipped)
+
+    pending = set()
+    with ContextThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for job, fname in units:
+            pending.add(pool.submit(_process, run_id, job, fname, progress))
+            # Keep the queue short so a crash loses as little as possible
+            if len(pending) >= 2 * max(1, max_workers):
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+        wait(pending)
+
+    counts = run_counts(run_id)
+    logging.info(f"✅ Run {run_id} finished: {counts}")
+    return counts
+
+
+def _current_hash(fname: str) -> Optional[str]:
+    try:
+        return _content_hash(read_file(fname))
+    except OSError:
+        return None
+
+
+def _process(run_id: str, job: Job, fname: str, progress: Progress) -> None:
+    """The pipeline for one file; every outcome ends in a checkpoint"""
+    status, error = "failed", None
+    try:
+        # Read
+        content = read_file(fname)
+        # Prompt, call and parse
+        updated = upgrade_code(
+            {fname: content},
+            job.instruction,
+            provider=job.provider,
+            model=job.model,
+            temperature=job.temperature,
+            edit_format=job.edit_format
+        ).get(fname, content)
+
+        if updated == content:
+            status = "unchanged"
+            save_checkpoint(run_id, job.index, fname, status)
+            return
+        # Validate (upgrade_code already repaired what it could)
+        error = validate_content(fname, updated)
+        if error:
+            logging.warning(f"⚠️ {fname}: upgraded file is invalid ({error}). Keeping original.")
+            save_checkpoint(run_id, job.index, fname, status, error=error)
+            return
+        # Write
+        new_hash = _content_hash(updated)
+        save_checkpoint(run_id, job.index, fname, "writing", new_hash)
+        write_code({fname: updated})
+        status = "done"
+        save_checkpoint(run_id, job.index, fname, status, new_hash)
+    except Exception as e:
+        error = str(e)
+        logging.error(f"❌ {fname}: {error}")
+        save_checkpoint(run_id, job.index, fname, status, error=error)
+    finally:
+        progress.update(fname, status)
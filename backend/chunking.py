@@ -0,0 +1,153 @@
+# backend/chunking.py
+
+import ast
+import logging
+from typing import Dict, List, NamedTuple, Tuple
+
+from backend.token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_LINES = 200
+
+
+class Chunk(NamedTuple):
+    """A contiguous slice of a file: lines [start, end) and their text"""
+    start: int
+    end: int
+    text: str
+    name: str
+
+
+def split_source(fname: str, source: str, max_chunk_tokens: int) -> Tuple[str, List[Chunk]]:
+    """
+    Split a file into chunks that each fit `max_chunk_tokens`.
+    Returns (header, chunks) where header is shared context for every chunk.
+    Python is split along top-level functions and classes; anything else
+    (or Python that doesn't parse) falls back to line windows.
+    """
+    if fname.endswith(".py"):
+        try:
+            return split_python(source, max_chunk_tokens)
+        except SyntaxError as e:
+            logger.warning("Could not parse %s (%s); using line windows", fname, e)
+    return "", split_lines(source, max_chunk_tokens)
+
+
+def split_python(source: str, max_chunk_tokens: int) -> Tuple[str, List[Chunk]]:
+    """Split Python source on top-level definitions; oversized classes split on their methods"""
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+
+    boundaries = set()
+    for node in tree.body:
+        start = _node_start(node)
+        boundaries.add(start)
+        if isinstance(node, ast.ClassDef) and _tokens(lines, start, node.end_lineno) > max_chunk_tokens:
+            for child in node.body[1:]:
+                boundaries.add(_node_start(child))
+        if hasattr(node, "end_lineno"):
+            boundaries.add(node.end_lineno)
+    segments = _segments(lines, boundaries)
+    return python_header(tree, lines), _merge(lines, segments, max_chunk_tokens)
+
+
+def split_lines(source: str, max_chunk_tokens: int, window: int = DEFAULT_WINDOW_LINES) -> List[Chunk]:
+    """Split into line windows, preferring to break on blank lines"""
+    lines = source.splitlines(keepends=True)
+    boundaries = set()
+    start = 0
+    while start < len(lines):
+        end = min(start + window, len(lines))
+        # Back off to the last blank line in the second half of the window
+        for candidate in range(end, start + window // 2, -1):
+            if candidate < len(lines) and not lines[candidate - 1].strip():
+                end = candidate
+                break
+        boundaries.add(end)
+        start = end
+    return _merge(lines, _segments(lines, boundaries), max_chunk_tokens)
+
+
+def python_header(tree: ast.Module, lines: List[str]) -> str:
+    """Imports plus class/function signatures: context shared by every chunk"""
+    header = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            header.append("".join(lines[node.lineno - 1:node.end_lineno]).rstrip())
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            header.append(_signature(node, lines))
+        elif isinstance(node, ast.ClassDef):
+            header.append(_signature(node, lines))
+            for child in node.body:
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    header.append(_signature(child, lines))
+    return "\n".join(header)
+
+
+def stitch(source: str, chunks: List[Chunk], replacements: Dict[int, str]) -> str:
+    """
+    Rebuild the file from its chunks, swapping in replacements by chunk index.
+    Raises ValueError if the chunks don't tile the source exactly.
+    """
+    lines = source.splitlines(keepends=True)
+    position = 0
+    parts = []
+    for index, chunk in enumerate(chunks):
+        if chunk.start != position or chunk.end < chunk.start:
+            raise ValueError(f"Chunk {chunk.name} has invalid offsets {chunk.start}-{chunk.end}")
+        if "".join(lines[chunk.start:chunk.end]) != chunk.text:
+            raise ValueError(f"Chunk {chunk.name} no longer matches the source")
+        text = replacements.get(index, chunk.text)
+        if chunk.text.endswith("\n") and not text.endswith("\n"):
+            text += "\n"
+        parts.append(text)
+        position = chunk.end
+    if position != len(lines):
+        raise ValueError("Chunks don't cover the whole file")
+    return "".join(parts)
+
+
+def _node_start(node: ast.AST) -> int:
+    """0-based first line of a node, including its decorators"""
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators]) - 1
+
+
+def _signature(node: ast.AST, lines: List[str]) -> str:
+    first_body = max(node.body[0].lineno - 1, node.lineno) if node.body else node.lineno
+    signature = "".join(lines[node.lineno - 1:first_body]).rstrip()
+    return f"{signature} ..."
+
+
+def _tokens(lines: List[str], start: int, end: int) -> int:
+    return count_tokens("".join(lines[start:end]))
+
+
+def _segments(lines: List[str], boundaries) -> List[Tuple[int, int]]:
+    cuts = sorted({0, len(lines)} | {b for b in boundaries if 0 < b < len(lines)})
+    return list(zip(cuts, cuts[1:]))
+
+
+def _merge(lines: List[str], segments: List[Tuple[int, int]], max_chunk_tokens: int) -> List[Chunk]:
+    """Greedily merge neighbouring segments while they fit the token limit"""
+    chunks = []
+    start = end = None
+    used = 0
+    for seg_start, seg_end in segments:
+        cost = _tokens(lines, seg_start, seg_end)
+        if start is None:
+            start, end, used = seg_start, seg_end, cost
+        elif used + cost <= max_chunk_tokens:
+            end = seg_end
+            used += cost
+        else:
+            chunks.append(_chunk(lines, start, end))
+            start, end, used = seg_start, seg_end, cost
+    if start is not None:
+        chunks.append(_chunk(lines, start, end))
+    return chunks
+
+
+def _chunk(lines: List[str], start: int, end: int) -> Chunk:
+    return Chunk(start, end, "".join(lines[start:end]), f"lines {start + 1}-{end}")
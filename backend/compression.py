@@ -0,0 +1,144 @@
+# backend/compression.py
+
+import re
+import ast
+import logging
+from typing import Dict, List, Tuple
+
+from backend.token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+# Statements shaped like a method signature, "if (ready) {", that are not one
+JS_CONTROL_KEYWORDS = ("if", "for", "while", "switch", "catch", "with", "do", "else", "return", "await", "yield")
+# Lines worth keeping in a JS/TS skeleton: imports, exports and declarations
+JS_KEEP_RE = re.compile(
+    r"^\s*(?:import\b|export\b|(?:async\s+)?function\b|class\b|interface\b|type\s+\w+\s*=|enum\b|"
+    r"(?:public|private|protected|static|async|get|set|\s)*"
+    rf"(?!(?:{'|'.join(JS_CONTROL_KEYWORDS)})\b)[A-Za-z_$][\w$]*\s*\([^;]*\)\s*(?::[^={{]+)?\{{\s*$|"
+    r"(?:const|let|var)\s+[A-Za-z_$][\w$]*\s*=\s*(?:async\s*)?(?:\([^)]*\)|[A-Za-z_$][\w$]*)\s*=>)"
+)
+LINE_COMMENT = {".py": "#", ".sh": "#", ".js": "//", ".jsx": "//", ".ts": "//", ".tsx": "//"}
+ELIDED = "..."
+
+
+def compress(fname: str, content: str) -> str:
+    """
+    Reduce a reference-only file to its skeleton: imports, signatures and
+    the first line of each docstring, with bodies elided. Anything we
+    can't parse just gets its whitespace and comments normalized.
+    """
+    if fname.endswith(".py"):
+        try:
+            return python_skeleton(content)
+        except SyntaxError:
+            logger.debug("Could not parse %s; normalizing only", fname)
+    elif fname.endswith(JS_EXTENSIONS):
+        return js_skeleton(content)
+    return normalize(fname, content)
+
+
+def compress_context(context: Dict[str, str], model: str = "gpt-4-turbo") -> Tuple[Dict[str, str], int, int]:
+    """Compress every file; returns (compressed files, tokens before, tokens after)"""
+    compressed, before, after = {}, 0, 0
+    for fname, content in context.items():
+        skeleton = compress(fname, content)
+        # Tiny files can come out longer once elision markers are added
+        if len(skeleton) >= len(content):
+            skeleton = content
+        compressed[fname] = skeleton
+        before += count_tokens(content, model)
+        after += count_tokens(skeleton, model)
+    return compressed, before, after
+
+
+def python_skeleton(source: str) -> str:
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    out: List[str] = []
+    _python_body(tree.body, lines, out, top_level=True)
+    return "\n".join(out)
+
+
+def _python_body(body, lines: List[str], out: List[str], top_level: bool = False) -> None:
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            out.extend(_segment(node, lines))
+        elif isinstance(node, ast.Try) and top_level:
+            # Optional imports: try: import x / except ImportError: x = None
+            for child in node.body:
+                if isinstance(child, (ast.Import, ast.ImportFrom)):
+                    out.extend(line.strip() for line in _segment(child, lines))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+            first_body = max(node.body[0].lineno - 1, node.lineno)
+            out.extend(line for line in map(_strip_comment, lines[start:first_body]) if line.strip())
+            indent = _body_indent(node, lines)
+            docstring = ast.get_docstring(node)
+            if docstring:
+                out.append(f'{indent}"""{docstring.strip().splitlines()[0]}"""')
+            if isinstance(node, ast.ClassDef):
+                before = len(out)
+                _python_body(node.body, lines, out)
+                if len(out) == before and not docstring:
+                    out.append(f"{indent}{ELIDED}")
+            else:
+                out.append(f"{indent}{ELIDED}")
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            if node.lineno == node.end_lineno:
+                # Single-line constants and class attributes
+                out.extend(_strip_comment(line) for line in _segment(node, lines))
+            else:
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                names = [t.id for t in targets if isinstance(t, ast.Name)]
+                if names:
+                    indent = " " * node.col_offset
+                    out.append(f"{indent}{' = '.join(names)} = {ELIDED}")
+
+
+def _segment(node: ast.AST, lines: List[str]) -> List[str]:
+    return lines[node.lineno - 1:node.end_lineno]
+
+
+def _body_indent(node: ast.AST, lines: List[str]) -> str:
+    line = lines[node.body[0].lineno - 1]
+    if node.body[0].lineno == node.lineno:  # def f(): return 1
+        return " " * (node.col_offset + 4)
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _strip_comment(line: str) -> str:
+    """Drop a trailing # comment unless the # might sit inside a string"""
+    if "#" in line and "'" not in line and '"' not in line:
+        line = line[:line.index("#")]
+    return line.rstrip()
+
+
+def js_skeleton(source: str) -> str:
+    """Keep import/export/declaration lines and elide runs of everything else"""
+    out: List[str] = []
+    elided = False
+    for line in normalize(".js", source).splitlines():
+        if JS_KEEP_RE.match(line):
+            out.append(line)
+            elided = False
+        elif not elided and line.strip() not in ("", "}", "};"):
+            indent = line[:len(line) - len(line.lstrip())]
+            out.append(f"{indent}{ELIDED}")
+            elided = True
+    return "\n".join(out)
+
+
+def normalize(fname: str, content: str) -> str:
+    """Strip trailing whitespace and full-line comments, collapse blank runs"""
+    marker = next((m for ext, m in LINE_COMMENT.items() if fname.endswith(ext)), None)
+    out: List[str] = []
+    for line in content.splitlines():
+        line = line.rstrip()
+        if marker and line.lstrip().startswith(marker):
+            continue
+        if not line and (not out or not out[-1]):
+            continue
+        out.append(line)
+    return "\n".join(out).strip("\n")
@@ -0,0 +1,232 @@
+# backend/hedging.py
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.context_threads import start_thread
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERCENTILE = 95
+DEFAULT_HEDGE_DELAY = 5.0   # seconds to wait for a first token before we have samples
+MIN_SAMPLES = 5
+FAILURE_THRESHOLD = 3       # consecutive failures before a breaker opens
+RESET_TIMEOUT = 30.0        # seconds before an open breaker lets a trial request through
+
+
+class LatencyTracker:
+    """Recent time-to-first-token samples for one provider"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """The pct-th percentile, or None until MIN_SAMPLES have been seen"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial after a cool-down"""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            # Half-open: let one trial through per cool-down period
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning("Circuit opened after %d consecutive failures", self.failures)
+                self.opened_at = time.monotonic()
+
+
+class HedgePolicy:
+    """Where to send a duplicate request and how long to wait before doing so"""
+
+    def __init__(self, secondary: str, secondary_model: str,
+                 percentile: float = DEFAULT_PERCENTILE, default_delay: float = DEFAULT_HEDGE_DELAY):
+        self.secondary = secondary
+        self.secondary_model = secondary_model
+        self.percentile = percentile
+        self.default_delay = default_delay
+
+
+_policies: Dict[str, HedgePolicy] = {}
+_trackers: Dict[str, LatencyTracker] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_lock = threading.Lock()
+# Per-session overrides of the process-wide policies: {primary: policy or None}
+_scoped_policies: ContextVar[Optional[Dict[str, Optional[HedgePolicy]]]] = ContextVar(
+    "hedge_policies", default=None
+)
+
+
+def enable_hedging(primary: str, secondary: str, secondary_model: str,
+                   percentile: float = DEFAULT_PERCENTILE, default_delay: float = DEFAULT_HEDGE_DELAY) -> None:
+    """
+    Hedge requests to `primary`: if no first token arrives within its
+    recent `percentile` latency, send the same request to `secondary`.
+    Providers are names known to llm_client (see register_provider), so
+    two local OpenAI-compatible stub servers can stand in for both.
+    """
+    with _lock:
+        _policies[primary] = HedgePolicy(secondary, secondary_model, percentile, default_delay)
+
+
+def disable_hedging(primary: str) -> None:
+    with _lock:
+        _policies.pop(primary, None)
+
+
+@contextmanager
+def hedging_scope(primary: str, policy: Optional[HedgePolicy]):
+    """
+    Use `policy` (None: don't hedge) for `primary` in this context only,
+    e.g. one Streamlit session, overriding enable_hedging. Work submitted
+    through utils.context_threads pools inherits the scope.
+    """
+    token = _scoped_policies.set({primary: policy})
+    try:
+        yield
+    finally:
+        _scoped_policies.reset(token)
+
+
+def get_policy(provider: str) -> Optional[HedgePolicy]:
+    scoped = _scoped_policies.get()
+    if scoped is not None and provider in scoped:
+        return scoped[provider]
+    return _policies.get(provider)
+
+
+def get_tracker(provider: str) -> LatencyTracker:
+    with _lock:
+        return _trackers.setdefault(provider, LatencyTracker())
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _lock:
+        return _breakers.setdefault(provider, CircuitBreaker())
+
+
+def hedged_completion(
+    candidates: List[Tuple[str, str, Callable[[], object]]],
+    policy: HedgePolicy,
+    is_valid: Callable[[str], bool] = bool
+) -> Tuple[str, str]:
+    """
+    Race streaming attempts with hedging and failover.
+
+    `candidates` is [(provider, model, start_stream)] with the primary
+    first; start_stream() returns an iterator of text deltas. The
+    secondary is only started if the primary is slow to produce a first
+    token, fails, or its breaker is open. The first valid response wins
+    and the rest are cancelled. Returns (text, provider).
+    """
+    results = queue.Queue()
+    cancel = threading.Event()
+    first_token = {provider: threading.Event() for provider, _, _ in candidates}
+
+    def _attempt(provider: str, start_stream: Callable[[], object]) -> None:
+        started = time.monotonic()
+        stream = None
+        parts = []
+        try:
+            stream = start_stream()
+            for delta in stream:
+                if cancel.is_set():
+                    return
+                if not parts:
+                    get_tracker(provider).record(time.monotonic() - started)
+                    first_token[provider].set()
+                parts.append(delta)
+            results.put((provider, "".join(parts), None))
+        except Exception as e:
+            results.put((provider, None, e))
+        finally:
+            first_token[provider].set()
+            close = getattr(stream, "close", None)
+            if close and cancel.is_set():
+                close()
+
+    launched = []
+    next_index = [0]
+
+    def _start(index: int) -> str:
+        provider, model, start_stream = candidates[index]
+        launched.append(provider)
+        logger.info("Sending %s request to %s/%s", "hedged" if len(launched) > 1 else "primary", provider, model)
+        start_thread(_attempt, provider, start_stream)
+        return provider
+
+    def _launch() -> Optional[str]:
+        """
+        Start the next candidate whose breaker lets it through. Breakers are
+        only asked here, so a secondary that is never needed keeps its
+        half-open trial.
+        """
+        while next_index[0] < len(candidates):
+            index = next_index[0]
+            next_index[0] += 1
+            if get_breaker(candidates[index][0]).allow():
+                return _start(index)
+            logger.info("Skipping %s: its circuit is open", candidates[index][0])
+        return None
+
+    # With every circuit open, still try the primary rather than fail outright
+    first = _launch() or _start(0)
+    delay = get_tracker(first).percentile(policy.percentile) or policy.default_delay
+    if next_index[0] < len(candidates) and not first_token[first].wait(delay):
+        logger.info("No first token from %s after %.1fs; hedging", first, delay)
+        _launch()
+
+    last_error = None
+    finished = 0
+    while finished < len(launched):
+        provider, text, error = results.get()
+        finished += 1
+        if error is None and text is not None and is_valid(text):
+            get_breaker(provider).record_success()
+            cancel.set()
+            return text, provider
+        get_breaker(provider).record_failure()
+        last_error = error or ValueError(f"Invalid response from {provider}")
+        logger.warning("%s attempt failed: %s", provider, last_error)
+        _launch()  # Fail over, if a candidate is left
+    cancel.set()
+    raise last_error
@@ -0,0 +1,238 @@
+# backend/incremental_check.py
+
+import os
+import atexit
+import hashlib
+import functools
+import logging
+import posixpath
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from flake8.api import legacy as flake8_legacy
+    from flake8.formatting.base import BaseFormatter
+except ImportError:
+    flake8_legacy = None
+    BaseFormatter = object
+
+from backend.project_index import ProjectIndex
+from backend.sandbox import run_sandboxed, test_command
+from memory.check_cache import (
+    Violation, load_lint_results, load_test_results, save_lint_results, save_test_result
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEST_WORKERS = 4
+# Files flake8 reads its configuration from
+CONFIG_FILES = ("setup.cfg", "tox.ini", ".flake8")
+
+
+class _Collector(BaseFormatter):
+    """Keeps violations in memory instead of printing them"""
+    violations: List[Violation] = []
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def handle(self, error):
+        _Collector.violations.append((error.line_number, error.column_number, error.code, error.text))
+
+
+# (project root, config hash) -> style guide, per worker process
+_style_guides: Dict[Tuple[str, str], object] = {}
+
+
+def _lint_file(root: str, config: str, path: str) -> List[Violation]:
+    """
+    Runs in a pool worker; a project's style guide (and its plugins) load
+    once per process. flake8 finds its config from the working directory,
+    so the worker moves to the project root first.
+    """
+    if flake8_legacy is None:
+        return _lint_file_cli(root, path)
+    os.chdir(root)
+    style_guide = _style_guides.get((root, config))
+    if style_guide is None:
+        logging.getLogger("flake8").setLevel(logging.WARNING)  # it logs every run at INFO
+        style_guide = flake8_legacy.get_style_guide()
+        style_guide.init_report(_Collector)
+        _style_guides[(root, config)] = style_guide
+    _Collector.violations = []
+    style_guide.check_files([path])
+    return sorted(_Collector.violations)
+
+
+def _lint_file_cli(root: str, path: str) -> List[Violation]:
+    result = subprocess.run(["flake8", path], cwd=root, capture_output=True, text=True)
+    violations = []
+    for line in result.stdout.splitlines():
+        rest = line[len(path) + 1:] if line.startswith(path + ":") else ""
+        parts = rest.split(":", 2)
+        if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+            code, _, message = parts[2].strip().partition(" ")
+            violations.append((int(parts[0]), int(parts[1]), code, message))
+    return violations
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+            atexit.register(_pool.shutdown, wait=False)
+        return _pool
+
+
+def _file_hash(path: str, salt: str = "") -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(salt.encode("utf-8") + f.read()).hexdigest()
+
+
+def config_hash(root: str) -> str:
+    """Hash of the flake8 config files in `root` and the directories above it"""
+    digest = hashlib.sha256()
+    directory = os.path.abspath(root)
+    while True:
+        for name in CONFIG_FILES:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                digest.update(f"{path}:{_file_hash(path)}\n".encode("utf-8"))
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return digest.hexdigest()
+        directory = parent
+
+
+def lint_files(paths: Iterable[str], root: str) -> Dict[str, List[Violation]]:
+    """
+    flake8 violations per file, with the configuration of the project at
+    `root`. Results are cached by content and config hash, so only new or
+    edited files are linted, in a warm process pool.
+    """
+    root = os.path.abspath(root)
+    config = config_hash(root)
+    hashes = {path: _file_hash(path, config) for path in paths}
+    cached = load_lint_results(hashes.values())
+    misses = {digest: path for path, digest in hashes.items() if digest not in cached}
+    if misses:
+        lint = functools.partial(_lint_file, root, config)
+        fresh = dict(zip(misses, _get_pool().map(lint, misses.values())))
+        save_lint_results(fresh)
+        cached.update(fresh)
+    logger.info("Linted %d files (%d from cache)", len(hashes), len(hashes) - len(misses))
+    return {path: cached[digest] for path, digest in hashes.items()}
+
+
+def is_test_file(path: str) -> bool:
+    name = posixpath.basename(path.replace(os.sep, "/"))
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def _dependency_closure(index: ProjectIndex, start: str) -> Set[str]:
+    seen, stack = {start}, [start]
+    while stack:
+        for dependency in index.dependencies.get(stack.pop(), ()):
+            if dependency not in seen:
+                seen.add(dependency)
+                stack.append(dependency)
+    # conftest.py files apply to every test below them
+    directory = posixpath.dirname(start)
+    while True:
+        conftest = posixpath.join(directory, "conftest.py") if directory else "conftest.py"
+        if conftest in index.entries:
+            seen.add(conftest)
+        if not directory:
+            return seen
+        directory = posixpath.dirname(directory)
+
+
+def select_tests(index: ProjectIndex, paths: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    {test relpath: signature} for the test modules whose import closure
+    touches any of `paths` (all tests when None). The signature hashes the
+    content of that closure, so an unchanged one can reuse its last result.
+    """
+    touched = None
+    if paths is not None:
+        touched = {os.path.relpath(p, index.root).replace(os.sep, "/") for p in paths}
+    selected = {}
+    for relpath in index.entries:
+        if not is_test_file(relpath):
+            continue
+        closure = _dependency_closure(index, relpath)
+        if touched is not None and not closure & touched:
+            continue
+        payload = "\n".join(f"{p}:{index.entries[p]['hash']}" for p in sorted(closure))
+        selected[relpath] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return selected
+
+
+def _run_test(root: str, relpath: str) -> Tuple[bool, str]:
+    result = run_sandboxed(test_command([relpath]), root, "test")
+    return result.passed, "" if result.passed else result.stdout + result.stderr
+
+
+def run_tests(index: ProjectIndex, selected: Dict[str, str], max_workers: int = DEFAULT_TEST_WORKERS) -> Dict[str, str]:
+    """
+    Run each selected test module in its own sandboxed pytest process, concurrently,
+    reusing the cached outcome when its signature is unchanged.
+    Returns {test relpath: failure output} for the modules that failed.
+    """
+    cached = load_test_results(index.root)
+    failures, stale = {}, []
+    for relpath, signature in selected.items():
+        previous = cached.get(relpath)
+        if previous and previous[0] == signature:
+            if not previous[1]:
+                failures[relpath] = previous[2]
+        else:
+            stale.append(relpath)
+    logger.info("Running %d of %d selected test modules", len(stale), len(selected))
+    if stale:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(stale)))) as pool:
+            outcomes = pool.map(lambda relpath: _run_test(index.root, relpath), stale)
+            for relpath, (passed, output) in zip(stale, outcomes):
+                save_test_result(index.root, relpath, selected[relpath], passed, output)
+                if not passed:
+                    failures[relpath] = output
+    return failures
+
+
+def check_project(base_dir: str, paths: Optional[Iterable[str]] = None) -> str:
+    """
+    Lint and test `base_dir` incrementally, or only `paths` and the tests
+    that import them. Returns the same combined report as a full
+    flake8 + pytest run, or "" when everything passes.
+    """
+    index = ProjectIndex.build(base_dir)
+    if paths is None:
+        lint_targets = [os.path.join(index.root, p) for p in index.entries if p.endswith(".py")]
+    else:
+        paths = [os.path.abspath(p) for p in paths]
+        lint_targets = [p for p in paths if p.endswith(".py") and os.path.isfile(p)]
+
+    reports = []
+    violations = lint_files(lint_targets, index.root)
+    lines = [
+        f"{os.path.relpath(path, index.root)}:{line}:{column}: {code} {message}"
+        for path in sorted(violations)
+        for line, column, code, message in violations[path]
+    ]
+    if lines:
+        reports.append("🔍 Lint errors:\n" + "\n".join(lines))
+
+    failures = run_tests(index, select_tests(index, paths))
+    if failures:
+        reports.append("🧪 Test failures:\n" + "\n".join(failures[p] for p in sorted(failures)))
+    return "\n\n".join(reports)
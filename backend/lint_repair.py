@@ -0,0 +1,181 @@
+# backend/lint_repair.py
+
+import os
+import re
+import logging
+from concurrent.futures import as_completed
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from utils.context_threads import ContextThreadPoolExecutor
+from backend.upgrade_project import DEFAULT_CONCURRENCY, read_file, upgrade_code, write_code
+
+logger = logging.getLogger(__name__)
+
+MAX_REPAIR_ROUNDS = 3
+MAX_DIAGNOSTICS_PER_FILE = 30  # keep a pathological file from flooding its prompt
+
+# x.py:12:5: E302 expected 2 blank lines, found 1
+FLAKE8_RE = re.compile(r"^(?P<path>[^\s:][^:]*):(?P<line>\d+):(?P<col>\d+): (?P<code>[A-Z]+\d+) (?P<message>.*)$")
+# tests/test_x.py:12: AssertionError   /   src/app.py:5: in add
+PYTEST_LOCATION_RE = re.compile(r"^(?P<path>[^\s:][^:]*\.py):(?P<line>\d+):(?: .*)?$")
+# E     File "/abs/src/app.py", line 5
+PYTHON_FRAME_RE = re.compile(r'File "(?P<path>[^"]+\.py)", line (?P<line>\d+)')
+# ____ test_add ____   /   ____ ERROR collecting tests/test_x.py ____
+PYTEST_SECTION_RE = re.compile(r"^_{3,} (?P<name>.+?) _{3,}$")
+
+
+class Diagnostic(NamedTuple):
+    path: str
+    line: int
+    code: str
+    message: str
+
+    def describe(self) -> str:
+        return f"line {self.line}: {self.code} {self.message}"
+
+
+def _resolve(path: str, base_dir: str) -> Optional[str]:
+    """Absolute path if it lies inside base_dir (tracebacks also list site-packages)"""
+    root = os.path.abspath(base_dir)
+    full = os.path.abspath(os.path.join(root, path))
+    if os.path.commonpath([full, root]) != root or not os.path.isfile(full):
+        return None
+    return full
+
+
+def parse_flake8(output: str, base_dir: str) -> List[Diagnostic]:
+    diagnostics = []
+    for line in output.splitlines():
+        match = FLAKE8_RE.match(line.strip())
+        if not match:
+            continue
+        path = _resolve(match["path"], base_dir)
+        if path:
+            diagnostics.append(Diagnostic(path, int(match["line"]), match["code"], match["message"]))
+    return diagnostics
+
+
+def parse_pytest(output: str, base_dir: str) -> List[Diagnostic]:
+    """
+    One diagnostic per project file in each failure's traceback, carrying
+    the failure's name and its `E` lines, so a broken source module is
+    repaired alongside (or instead of) the test that exposed it.
+    """
+    diagnostics = []
+    section, errors, locations = None, [], []
+
+    def _flush():
+        message = f"{section}: " + " / ".join(errors[:3]) if section else " / ".join(errors[:3])
+        seen = set()
+        for path, line in locations:
+            if (path, line) not in seen:
+                seen.add((path, line))
+                diagnostics.append(Diagnostic(path, line, "pytest", message))
+
+    for raw in output.splitlines():
+        header = PYTEST_SECTION_RE.match(raw.strip())
+        if header:
+            _flush()
+            section, errors, locations = header["name"], [], []
+            continue
+        if raw.startswith("E "):
+            text = raw[1:].strip()
+            frame = PYTHON_FRAME_RE.search(text)
+            if frame:
+                path = _resolve(frame["path"], base_dir)
+                if path:
+                    locations.append((path, int(frame["line"])))
+            elif text:
+                errors.append(text)
+            continue
+        match = PYTEST_LOCATION_RE.match(raw.strip())
+        if match:
+            path = _resolve(match["path"], base_dir)
+            if path:
+                locations.append((path, int(match["line"])))
+    _flush()
+    return diagnostics
+
+
+def parse_report(report: str, base_dir: str) -> List[Diagnostic]:
+    """Diagnostics from a combined flake8 + pytest report"""
+    return parse_flake8(report, base_dir) + parse_pytest(report, base_dir)
+
+
+def group_by_file(diagnostics: List[Diagnostic]) -> Dict[str, List[Diagnostic]]:
+    by_file: Dict[str, List[Diagnostic]] = {}
+    for diagnostic in diagnostics:
+        by_file.setdefault(diagnostic.path, []).append(diagnostic)
+    return by_file
+
+
+def _repair_instruction(diagnostics: List[Diagnostic]) -> str:
+    lines = [d.describe() for d in sorted(diagnostics)[:MAX_DIAGNOSTICS_PER_FILE]]
+    return (
+        "Fix the following lint errors and test failures reported for this file. "
+        "Change only what is needed to fix them.\n" + "\n".join(lines)
+    )
+
+
+def repair_files(
+    by_file: Dict[str, List[Diagnostic]],
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.1,
+    max_workers: int = DEFAULT_CONCURRENCY
+) -> List[str]:
+    """Send each file with only its own diagnostics, concurrently; returns the files rewritten"""
+    written = []
+    with ContextThreadPoolExecutor(max_workers=max(1, min(max_workers, len(by_file)))) as pool:
+        futures = {
+            pool.submit(
+                upgrade_code,
+                {path: read_file(path)},
+                _repair_instruction(diagnostics),
+                provider=provider,
+                model=model,
+                temperature=temperature
+            ): path
+            for path, diagnostics in by_file.items()
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                fixed = future.result()
+            except Exception as e:
+                logger.error("Repair of %s failed: %s", path, e)
+                continue
+            if fixed.get(path) is not None and fixed[path] != read_file(path):
+                write_code({path: fixed[path]})
+                written.append(path)
+    return written
+
+
+def repair_until_clean(
+    base_dir: str,
+    report: str,
+    check: Callable[[List[str]], str],
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.1,
+    max_rounds: int = MAX_REPAIR_ROUNDS,
+    on_round: Optional[Callable[[int, Dict[str, List[Diagnostic]]], None]] = None
+) -> List[Diagnostic]:
+    """
+    Route each error in `report` to its file, repair only the affected
+    files, and re-check just those with `check(paths) -> report` until
+    clean or `max_rounds` is spent. Returns the diagnostics still open.
+    """
+    diagnostics = parse_report(report, base_dir)
+    if report.strip() and not diagnostics:
+        logger.warning("Could not route any error in the report to a file in %s", base_dir)
+    for round_number in range(1, max_rounds + 1):
+        by_file = group_by_file(diagnostics)
+        if not by_file:
+            break
+        if on_round:
+            on_round(round_number, by_file)
+        logger.info("Repair round %d: %d files", round_number, len(by_file))
+        repair_files(by_file, provider, model, temperature)
+        diagnostics = parse_report(check(sorted(by_file)), base_dir)
+    return diagnostics
@@ -0,0 +1,233 @@
+# backend/llm_client.py
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import openai
+
+from memory.llm_cache import get_cache, make_cache_key
+from memory.usage_metrics import record_usage
+from backend.rate_limiter import get_scheduler
+from backend.hedging import get_policy, hedged_completion
+from backend.token_budget import count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+# OpenAI-compatible providers: API key env var and default endpoint
+PROVIDERS = {
+    "OpenAI": {"api_key_env": "OPENAI_API_KEY", "base_url": None},
+    "DeepSeek": {"api_key_env": "DEEPSEEK_API_KEY", "base_url": "https://api.deepseek.com/v1"},
+}
+
+# Connection pool and timeout settings shared by every pooled client
+POOL_SETTINGS = {
+    "max_connections": 32,
+    "max_keepalive_connections": 16,
+    "keepalive_expiry": 60.0,
+    "connect_timeout": 10.0,
+    "timeout": 120.0,
+}
+
+_clients: Dict[Tuple[str, Optional[str]], openai.OpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def register_provider(name: str, base_url: Optional[str], api_key_env: str) -> None:
+    """Add or override an OpenAI-compatible provider"""
+    with _clients_lock:
+        PROVIDERS[name] = {"api_key_env": api_key_env, "base_url": base_url}
+
+
+def configure_pool(**settings) -> None:
+    """
+    Tune pool limits / timeouts (keys of POOL_SETTINGS).
+    Existing clients are closed so the next get_client() picks them up.
+    """
+    unknown = set(settings) - set(POOL_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown pool settings: {', '.join(sorted(unknown))}")
+    with _clients_lock:
+        POOL_SETTINGS.update(settings)
+        _close_all()
+
+
+def get_client(provider: str = "OpenAI", base_url: Optional[str] = None) -> openai.OpenAI:
+    """
+    Return the shared client for (provider, base_url), creating it once.
+    Clients keep their keep-alive connection pool between calls and are
+    safe to share across threads and Streamlit sessions.
+    """
+    config = PROVIDERS.get(provider, PROVIDERS["OpenAI"])
+    base_url = base_url or config["base_url"]
+    key = (provider, base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = openai.DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=POOL_SETTINGS["max_connections"],
+                    max_keepalive_connections=POOL_SETTINGS["max_keepalive_connections"],
+                    keepalive_expiry=POOL_SETTINGS["keepalive_expiry"],
+                ),
+                timeout=httpx.Timeout(
+                    POOL_SETTINGS["timeout"],
+                    connect=POOL_SETTINGS["connect_timeout"],
+                ),
+            )
+            client = openai.OpenAI(
+                api_key=os.getenv(config["api_key_env"]),
+                base_url=base_url,
+                http_client=http_client,
+                max_retries=0,  # Retries are owned by the provider scheduler
+            )
+            _clients[key] = client
+            logger.info("Created pooled %s client for %s", provider, base_url or "default endpoint")
+        return client
+
+
+def close_clients() -> None:
+    """Close every pooled client and its connections"""
+    with _clients_lock:
+        _close_all()
+
+
+def _close_all() -> None:
+    for client in _clients.values():
+        try:
+            client.close()
+        except Exception:
+            logger.debug("Error closing client", exc_info=True)
+    _clients.clear()
+
+
+def cache_disabled() -> bool:
+    """Global bypass: set AUTOCODER_NO_CACHE=1 to always hit the provider"""
+    return os.getenv("AUTOCODER_NO_CACHE", "").lower() in ("1", "true", "yes")
+
+
+def chat_completion(
+    client,
+    messages: List[Dict[str, str]],
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    max_tokens: int = 1000,
+    use_cache: bool = True
+) -> str:
+    """
+    Run a chat completion and return the message text.
+    Identical requests are answered from the shared response cache; the
+    rest go through the provider's scheduler (rate limits and retries).
+    If hedging is enabled for the provider, slow or failing requests are
+    duplicated to its secondary and the first valid reply is returned.
+    """
+    use_cache = use_cache and not cache_disabled()
+    key = make_cache_key(provider, model, temperature, messages, max_tokens)
+    if use_cache:
+        cached = get_cache().get(key)
+        if cached is not None:
+            logger.info("Cache hit for %s/%s request", provider, model)
+            return cached
+
+    policy = get_policy(provider)
+    if policy is not None:
+        secondary = policy.secondary
+        content, _ = hedged_completion([
+            (provider, model, lambda: stream_chat_completion(
+                client, messages, provider, model, temperature, max_tokens, use_cache)),
+            (secondary, policy.secondary_model, lambda: stream_chat_completion(
+                get_client(secondary), messages, secondary, policy.secondary_model,
+                temperature, max_tokens, use_cache)),
+        ], policy)
+        return content
+
+    timing = {}
+
+    def _create():
+        timing["start"] = time.monotonic()
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    response = get_scheduler(provider).call(_create, tokens=count_message_tokens(messages, model) + max_tokens)
+    record_usage(provider, model, getattr(response, "usage", None), time.monotonic() - timing["start"])
+    choice = response.choices[0]
+    content = choice.message.content or ""
+
+    # Don't cache replies that were cut off by max_tokens
+    if use_cache and content and getattr(choice, "finish_reason", None) != "length":
+        get_cache().put(key, content, provider=provider, model=model)
+    return content
+
+
+def stream_chat_completion(
+    client,
+    messages: List[Dict[str, str]],
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    max_tokens: int = 1000,
+    use_cache: bool = True
+) -> Iterator[str]:
+    """
+    Stream a chat completion, yielding text deltas as they arrive.
+    A cache hit is yielded as a single chunk; a complete streamed reply
+    is written back to the cache.
+    """
+    use_cache = use_cache and not cache_disabled()
+    key = make_cache_key(provider, model, temperature, messages, max_tokens)
+    if use_cache:
+        cached = get_cache().get(key)
+        if cached is not None:
+            logger.info("Cache hit for %s/%s request", provider, model)
+            yield cached
+            return
+
+    timing = {}
+
+    def _create():
+        timing["start"] = time.monotonic()
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+    stream = get_scheduler(provider).stream(_create, tokens=count_message_tokens(messages, model) + max_tokens)
+    parts = []
+    finish_reason = None
+    first_token = None
+    usage = None
+    for event in stream:
+        # With include_usage the final event carries usage and no choices
+        usage = getattr(event, "usage", None) or usage
+        if not event.choices:
+            continue
+        choice = event.choices[0]
+        delta = choice.delta.content if choice.delta else None
+        if delta:
+            if first_token is None:
+                first_token = time.monotonic() - timing["start"]
+            parts.append(delta)
+            yield delta
+        finish_reason = choice.finish_reason or finish_reason
+
+    # Streams record time to first token, the part prompt caching speeds up
+    record_usage(provider, model, usage, ttft=first_token)
+    content = "".join(parts)
+    if use_cache and content and finish_reason != "length":
+        get_cache().put(key, content, provider=provider, model=model)
@@ -16,29 +16,14 @@ import sqlite3
 
 from utils.file_utils import read_file
 from memory.database import initialize_database
+from backend.llm_client import chat_completion, get_client
+from backend.response_parser import parse_file_blocks
 
 load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def parse_response(response):
     """Parse GPT response into files dictionary"""
-    files = {}
-    current_file = None
-    content_lines = []
-    
-    for line in response.split('\n'):
-        if line.startswith("FILE:"):
-            if current_file:
-                files[current_file] = '\n'.join(content_lines).strip()
-                content_lines = []
-            current_file = line.split("FILE:", 1)[1].strip()
-        elif current_file:
-            content_lines.append(line)
-    
-    if current_file and content_lines:
-        files[current_file] = '\n'.join(content_lines).strip()
-    
-    return files
+    return dict(parse_file_blocks(response))
 
 def generate_structure(prompt):
     """Generate project structure with enhanced prompt"""
@@ -65,14 +50,13 @@ def generate_structure(prompt):
     ]
 
     try:
-        response = client.chat.completions.create(
+        output = chat_completion(
+            get_client(),
+            messages,
             model="gpt-4-turbo",
-            messages=messages,
             temperature=0.4,
             max_tokens=3000
-        )
-
-        output = response.choices[0].message.content.strip()
+        ).strip()
         files = parse_response(output)
         
         if not files:
@@ -0,0 +1,202 @@
+# backend/patch_apply.py
+
+import re
+import difflib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A hunk is (search, replace): lines to find and what replaces them
+Hunk = Tuple[str, str]
+
+HEADER_RE = re.compile(r"^(?:File|FILE):\s*(?P<fname>.+?)\s*$")
+DIFF_FILE_RE = re.compile(r"^\+\+\+ (?:b/)?(?P<fname>\S+)")
+SEARCH_MARK = re.compile(r"^<{5,9} ?SEARCH\s*$")
+DIVIDER_MARK = re.compile(r"^={5,9}\s*$")
+REPLACE_MARK = re.compile(r"^>{5,9} ?REPLACE\s*$")
+
+# Minimum similarity for a fuzzy (last resort) match
+FUZZY_THRESHOLD = 0.85
+
+EDIT_FORMAT_INSTRUCTIONS = (
+    "Respond with SEARCH/REPLACE blocks for each change:\n"
+    "File: path/to/file.ext\n"
+    "<<<<<<< SEARCH\n<exact original lines>\n=======\n<replacement lines>\n>>>>>>> REPLACE\n"
+    "The SEARCH part must copy the original lines exactly, including indentation.\n"
+    "Use several small blocks rather than one large one; a unified diff is also accepted.\n"
+    "Important: Only return files that change."
+)
+
+
+def parse_edits(output: str) -> Dict[str, List[Hunk]]:
+    """
+    Extract edits from model output, grouped by file.
+    Understands SEARCH/REPLACE blocks and unified diff hunks.
+    """
+    edits: Dict[str, List[Hunk]] = {}
+    fname: Optional[str] = None
+    lines = output.split("\n")
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        header = HEADER_RE.match(line) or DIFF_FILE_RE.match(line)
+        if header:
+            fname = header.group("fname")
+            i += 1
+            continue
+
+        if fname and SEARCH_MARK.match(line):
+            search, replace, i = _read_search_replace(lines, i + 1)
+            edits.setdefault(fname, []).append((search, replace))
+            continue
+
+        if fname and line.startswith("@@"):
+            hunk, i = _read_diff_hunk(lines, i + 1)
+            if hunk[0] or hunk[1]:
+                edits.setdefault(fname, []).append(hunk)
+            continue
+        i += 1
+    return edits
+
+
+def _read_search_replace(lines: List[str], i: int) -> Tuple[str, str, int]:
+    search, replace = [], []
+    target = search
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if DIVIDER_MARK.match(line) and target is search:
+            target = replace
+        elif REPLACE_MARK.match(line):
+            break
+        else:
+            target.append(line)
+    return "\n".join(search), "\n".join(replace), i
+
+
+def _read_diff_hunk(lines: List[str], i: int) -> Tuple[Hunk, int]:
+    search, replace = [], []
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith(("@@", "--- ", "+++ ", "```")) or HEADER_RE.match(line):
+            break
+        if line.startswith("-"):
+            search.append(line[1:])
+        elif line.startswith("+"):
+            replace.append(line[1:])
+        elif line.startswith(" ") or line == "":
+            search.append(line[1:])
+            replace.append(line[1:])
+        i += 1
+    # Drop blank context picked up between hunks
+    while search and replace and not search[-1].strip() and not replace[-1].strip():
+        search.pop()
+        replace.pop()
+    return ("\n".join(search), "\n".join(replace)), i
+
+
+def apply_hunks(content: str, hunks: List[Hunk]) -> Tuple[str, List[Hunk]]:
+    """
+    Apply hunks in order, tolerating whitespace drift and small context
+    differences. Returns (new_content, hunks_that_failed).
+    """
+    failed = []
+    for hunk in hunks:
+        updated = apply_hunk(content, hunk)
+        if updated is None:
+            failed.append(hunk)
+        else:
+            content = updated
+    return content, failed
+
+
+def apply_hunk(content: str, hunk: Hunk) -> Optional[str]:
+    """Apply a single hunk, or return None if its context can't be located"""
+    search, replace = hunk
+    if not search.strip():
+        # Nothing to find: treat as an append (or a new file)
+        if not content:
+            return replace
+        return content.rstrip("\n") + "\n" + replace + ("\n" if content.endswith("\n") else "")
+
+    lines = content.split("\n")
+    search_lines = search.split("\n")
+    replace_lines = replace.split("\n")
+
+    # 1) Exact match on whole lines; a substring match could start mid-line
+    start = _find_exact(lines, search_lines)
+    if start is None:
+        # 2) Same lines modulo indentation / trailing whitespace
+        start = _find_stripped(lines, search_lines)
+    if start is None:
+        # 3) Closest window above the similarity threshold
+        start = _find_fuzzy(lines, search_lines)
+    if start is None:
+        return None
+
+    window = lines[start:start + len(search_lines)]
+    replace_lines = _reindent(replace_lines, search_lines, window)
+    return "\n".join(lines[:start] + replace_lines + lines[start + len(search_lines):])
+
+
+def _find_exact(lines: List[str], search_lines: List[str]) -> Optional[int]:
+    size = len(search_lines)
+    for start in range(len(lines) - size + 1):
+        if lines[start] == search_lines[0] and lines[start:start + size] == search_lines:
+            return start
+    return None
+
+
+def _find_stripped(lines: List[str], search_lines: List[str]) -> Optional[int]:
+    target = [line.strip() for line in search_lines]
+    stripped = [line.strip() for line in lines]
+    size = len(target)
+    for start in range(len(lines) - size + 1):
+        if stripped[start:start + size] == target:
+            return start
+    return None
+
+
+def _find_fuzzy(lines: List[str], search_lines: List[str]) -> Optional[int]:
+    size = len(search_lines)
+    if size == 0 or size > len(lines):
+        return None
+    target = "\n".join(line.strip() for line in search_lines)
+    matcher = difflib.SequenceMatcher(None, "", target, autojunk=False)
+    best, best_ratio = None, FUZZY_THRESHOLD
+    for start in range(len(lines) - size + 1):
+        candidate = "\n".join(line.strip() for line in lines[start:start + size])
+        matcher.set_seq1(candidate)
+        if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+            continue
+        ratio = matcher.ratio()
+        if ratio >= best_ratio:
+            best, best_ratio = start, ratio
+    return best
+
+
+def _leading(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _reindent(replace_lines: List[str], search_lines: List[str], window: List[str]) -> List[str]:
+    """Shift the replacement by the indentation the model got wrong"""
+    model_indent = next((_leading(l) for l in search_lines if l.strip()), "")
+    file_indent = next((_leading(l) for l in window if l.strip()), "")
+    if model_indent == file_indent:
+        return replace_lines
+    result = []
+    for line in replace_lines:
+        if line.startswith(model_indent):
+            line = file_indent + line[len(model_indent):]
+        elif line.strip():
+            line = file_indent + line.lstrip()
+        result.append(line)
+    return result
+
+
+def format_hunk(fname: str, hunk: Hunk) -> str:
+    """Render a hunk back into SEARCH/REPLACE form (for retry prompts)"""
+    search, replace = hunk
+    return f"File: {fname}\n<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
@@ -0,0 +1,260 @@
+# backend/project_index.py
+
+import os
+import re
+import ast
+import hashlib
+import logging
+import posixpath
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.ignore import walk
+from memory.code_index import delete_entries, load_index, save_entries
+
+logger = logging.getLogger(__name__)
+
+PY_EXTENSIONS = (".py",)
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+DEFAULT_DEPTH = 2
+DEFAULT_MAX_FILES = 20
+
+# import x from './x' / import './x' / export {x} from './x' / require('./x') / import('./x')
+JS_IMPORT_RE = re.compile(
+    r"""(?:\bimport\s+(?:[\w$*{}\s,]+?\s+from\s+)?|\bexport\s+[\w$*{}\s,]+?\s+from\s+|"""
+    r"""\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"\n]+)['"]"""
+)
+JS_SYMBOL_RE = re.compile(
+    r"^\s*(?:export\s+(?:default\s+)?)?(?:async\s+)?"
+    r"(?:function\s*\*?|class|const|let|var|interface|type|enum)\s+([A-Za-z_$][\w$]*)",
+    re.MULTILINE
+)
+
+
+def _language(path: str) -> Optional[str]:
+    if path.endswith(PY_EXTENSIONS):
+        return "python"
+    if path.endswith(JS_EXTENSIONS):
+        return "js"
+    return None
+
+
+def module_name(relpath: str) -> str:
+    """Dotted module name for a root-relative Python path"""
+    parts = relpath[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def parse_python(relpath: str, source: str) -> Tuple[List[str], List[str]]:
+    """(absolute imported module names, defined symbols) for a Python file"""
+    tree = ast.parse(source)
+    module = module_name(relpath)
+    package = module.split(".") if relpath.endswith("__init__.py") else module.split(".")[:-1]
+
+    imports, symbols = [], []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - (node.level - 1)] if node.level > 1 else package
+                prefix = ".".join(base + ([node.module] if node.module else []))
+            else:
+                prefix = node.module or ""
+            # "from pkg import name" may name a submodule; resolution falls back to pkg
+            imports.extend(f"{prefix}.{alias.name}" if prefix else alias.name for alias in node.names)
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            symbols.append(node.name)
+            if isinstance(node, ast.ClassDef):
+                symbols.extend(
+                    f"{node.name}.{child.name}" for child in node.body
+                    if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                )
+        elif isinstance(node, ast.Assign):
+            symbols.extend(t.id for t in node.targets if isinstance(t, ast.Name))
+    return imports, symbols
+
+
+def parse_js(source: str) -> Tuple[List[str], List[str]]:
+    """(import specifiers, top-level symbols) for JS/TS, by regex"""
+    return JS_IMPORT_RE.findall(source), JS_SYMBOL_RE.findall(source)
+
+
+class ProjectIndex:
+    """Import graph and symbol table for the Python and JS/TS files under a root"""
+
+    def __init__(self, root: str, entries: Dict[str, Dict]):
+        self.root = root
+        self.entries = entries
+        self.modules = {e["module"]: path for path, e in entries.items() if e["module"]}
+        # Scripts often put src/ on sys.path and import `calc` for src/calc.py;
+        # map unambiguous trailing module names too (None when ambiguous)
+        self.short_modules: Dict[str, Optional[str]] = {}
+        for module, path in self.modules.items():
+            parts = module.split(".")
+            for start in range(1, len(parts)):
+                suffix = ".".join(parts[start:])
+                if suffix in self.modules:
+                    continue
+                known = self.short_modules.get(suffix, path)
+                self.short_modules[suffix] = path if known == path else None
+        self.symbols: Dict[str, List[str]] = {}
+        for path, entry in entries.items():
+            for symbol in entry["symbols"]:
+                self.symbols.setdefault(symbol, []).append(path)
+
+        self.dependencies: Dict[str, Set[str]] = {path: set() for path in entries}
+        self.dependents: Dict[str, Set[str]] = {path: set() for path in entries}
+        for path, entry in entries.items():
+            for name in entry["imports"]:
+                target = self._resolve_import(path, entry["language"], name)
+                if target and target != path:
+                    self.dependencies[path].add(target)
+                    self.dependents[target].add(path)
+
+    @classmethod
+    def build(cls, root: str) -> "ProjectIndex":
+        """Index `root`, re-parsing only files whose content hash changed"""
+        root = os.path.abspath(root)
+        stored = load_index(root)
+        entries, changed = {}, {}
+        for dirpath, _, filenames in walk(root):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                relpath = os.path.relpath(full, root).replace(os.sep, "/")
+                language = _language(relpath)
+                if language is None:
+                    continue
+                entry = _index_file(full, relpath, language, stored.get(relpath))
+                if entry is None:
+                    continue
+                entries[relpath] = entry
+                if entry is not stored.get(relpath):
+                    changed[relpath] = entry
+        save_entries(root, changed)
+        delete_entries(root, set(stored) - set(entries))
+        logger.info("Indexed %d files under %s (%d updated)", len(entries), root, len(changed))
+        return cls(root, entries)
+
+    def _resolve_import(self, path: str, language: str, name: str) -> Optional[str]:
+        if language == "python":
+            parts = name.split(".")
+            while parts:
+                dotted = ".".join(parts)
+                target = self.modules.get(dotted) or self.short_modules.get(dotted)
+                if target:
+                    return target
+                parts.pop()
+            return None
+        if not name.startswith("."):
+            return None  # A package, not a project file
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(path), name))
+        for candidate in [base] + [base + ext for ext in JS_EXTENSIONS] + \
+                [f"{base}/index{ext}" for ext in JS_EXTENSIONS]:
+            if candidate in self.entries:
+                return candidate
+        return None
+
+    def resolve_target(self, target: str) -> List[str]:
+        """Files for a target given as a path (absolute or root-relative) or a symbol name"""
+        if os.path.isabs(target):
+            target = os.path.relpath(target, self.root)
+        relpath = posixpath.normpath(target.replace(os.sep, "/"))
+        if relpath in self.entries:
+            return [relpath]
+        if target in self.symbols:
+            return sorted(self.symbols[target])
+        # A bare method name: match Class.<name> anywhere
+        methods = {p for symbol, paths in self.symbols.items() if symbol.endswith("." + target) for p in paths}
+        return sorted(methods)
+
+    def closure(
+        self,
+        targets: List[str],
+        max_depth: int = DEFAULT_DEPTH,
+        max_files: int = DEFAULT_MAX_FILES
+    ) -> List[Tuple[str, int]]:
+        """
+        Targets plus the files they import and the files importing them,
+        up to `max_depth` hops, as (path, distance) ranked by distance.
+        At equal distance dependencies come before dependents.
+        """
+        distance = {path: 0 for path in targets}
+        rank = {path: 0 for path in targets}
+        queue = deque(targets)
+        while queue:
+            path = queue.popleft()
+            if distance[path] >= max_depth:
+                continue
+            for kind, neighbours in ((0, self.dependencies[path]), (1, self.dependents[path])):
+                for neighbour in neighbours:
+                    if neighbour not in distance:
+                        distance[neighbour] = distance[path] + 1
+                        rank[neighbour] = kind
+                        queue.append(neighbour)
+        ranked = sorted(distance, key=lambda p: (distance[p], rank[p], p))
+        if max_files:
+            ranked = ranked[:max(max_files, len(targets))]
+        return [(path, distance[path]) for path in ranked]
+
+
+def _index_file(full: str, relpath: str, language: str, previous: Optional[Dict]) -> Optional[Dict]:
+    """Entry for one file; `previous` is reused as-is when the file is unchanged"""
+    try:
+        stat = os.stat(full)
+        if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+            return previous
+        with open(full, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logger.warning("Skipping %s: %s", relpath, e)
+        return None
+
+    digest = hashlib.sha256(data).hexdigest()
+    if previous and previous["hash"] == digest:
+        return dict(previous, size=stat.st_size, mtime=stat.st_mtime)
+
+    source = data.decode("utf-8", errors="ignore")
+    module = None
+    if language == "python":
+        module = module_name(relpath)
+        try:
+            imports, symbols = parse_python(relpath, source)
+        except SyntaxError as e:
+            logger.warning("Could not parse %s (%s); indexing without imports", relpath, e)
+            imports, symbols = [], []
+    else:
+        imports, symbols = parse_js(source)
+    return {
+        "hash": digest,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "language": language,
+        "module": module,
+        "imports": imports,
+        "symbols": symbols,
+    }
+
+
+def select_context(
+    root: str,
+    target: str,
+    max_depth: int = DEFAULT_DEPTH,
+    max_files: int = DEFAULT_MAX_FILES
+) -> List[Tuple[str, int]]:
+    """
+    Absolute paths of `target` (a file or symbol) and its bounded import
+    closure, ranked by graph distance. Raises ValueError for unknown targets.
+    """
+    index = ProjectIndex.build(root)
+    targets = index.resolve_target(target)
+    if not targets:
+        raise ValueError(f"No file or symbol named {target!r} under {root}")
+    return [
+        (os.path.join(index.root, path), distance)
+        for path, distance in index.closure(targets, max_depth, max_files)
+    ]
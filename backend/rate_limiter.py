@@ -0,0 +1,238 @@
+# backend/rate_limiter.py
+
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterator, Optional, TypeVar
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Requests/tokens per minute and the ceiling for adaptive concurrency
+PROVIDER_LIMITS = {
+    "OpenAI": {"rpm": 500, "tpm": 300000, "max_concurrency": 16},
+    "DeepSeek": {"rpm": 300, "tpm": 200000, "max_concurrency": 8},
+}
+DEFAULT_LIMITS = {"rpm": 60, "tpm": 60000, "max_concurrency": 4}
+
+MAX_RETRIES = int(os.getenv("AUTOCODER_MAX_RETRIES", 5))
+BACKOFF_BASE = 1.0   # seconds
+BACKOFF_CAP = 60.0   # seconds
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1) -> None:
+        """Block until `amount` tokens are available, then take them"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(min(wait, 1.0))
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the provider says we're over quota"""
+        with self._lock:
+            self._refill()
+            self._tokens = 0
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by ~1 per window of healthy requests,
+    halves on throttling and eases off when latency climbs well past
+    its running baseline.
+    """
+
+    def __init__(self, max_limit: int, initial: int = 2, min_limit: int = 1):
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.baseline = None  # EWMA of healthy latency
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+            elif latency is not None:
+                if self.baseline is None:
+                    self.baseline = latency
+                if latency > self.baseline * 2:
+                    self.limit = max(self.min_limit, self.limit * 0.9)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.baseline = 0.9 * self.baseline + 0.1 * latency
+            self._cond.notify_all()
+
+
+class ProviderScheduler:
+    """Every request to a provider passes through here: rate buckets, concurrency and retries"""
+
+    def __init__(self, provider: str, rpm: int, tpm: int, max_concurrency: int):
+        self.provider = provider
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+
+    def _acquire(self, tokens: int) -> None:
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+        self.concurrency.acquire()
+
+    def call(self, fn: Callable[[], T], tokens: int = 0, max_retries: int = MAX_RETRIES) -> T:
+        """Run `fn` under the provider's limits, retrying throttling and server errors"""
+        for attempt in range(max_retries + 1):
+            self._acquire(tokens)
+            start = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                self.concurrency.release(throttled=is_throttled(e))
+                self._backoff_or_raise(e, attempt, max_retries)
+                continue
+            self.concurrency.release(latency=time.monotonic() - start)
+            return result
+
+    def stream(self, create: Callable[[], Iterator[T]], tokens: int = 0, max_retries: int = MAX_RETRIES) -> Iterator[T]:
+        """
+        Like call() for streaming responses: the concurrency slot is held
+        until the stream is consumed. Failures before the first event are
+        retried; later ones are raised since output was already delivered.
+        """
+        for attempt in range(max_retries + 1):
+            self._acquire(tokens)
+            start = time.monotonic()
+            latency = None
+            error = None
+            source = None
+            try:
+                source = create()
+                for event in source:
+                    if latency is None:
+                        latency = time.monotonic() - start
+                    yield event
+            except Exception as e:
+                if latency is not None:
+                    raise
+                error = e
+            finally:
+                # Also runs if the consumer stops early: drop the connection too
+                close = getattr(source, "close", None)
+                if close:
+                    try:
+                        close()
+                    except Exception:
+                        logger.debug("Error closing %s stream", self.provider, exc_info=True)
+                self.concurrency.release(latency=latency, throttled=error is not None and is_throttled(error))
+            if error is None:
+                return
+            self._backoff_or_raise(error, attempt, max_retries)
+
+    def _backoff_or_raise(self, error: Exception, attempt: int, max_retries: int) -> None:
+        if not is_retryable(error) or attempt >= max_retries:
+            raise error
+        delay = retry_after(error)
+        if delay is None:
+            # Full jitter exponential backoff
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        if is_throttled(error):
+            self.requests.drain()
+        logger.warning("%s request failed (%s); retry %d/%d in %.1fs",
+                       self.provider, error, attempt + 1, max_retries, delay)
+        time.sleep(delay)
+
+
+def _status(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def is_throttled(error: Exception) -> bool:
+    """True for provider rate-limit responses"""
+    return isinstance(error, openai.RateLimitError) or _status(error) == 429
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for throttling, transient server errors and connection problems"""
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return _status(error) in RETRYABLE_STATUS
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, from Retry-After(-ms) headers"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_schedulers: Dict[str, ProviderScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def configure_limits(provider: str, **limits) -> None:
+    """Override rpm / tpm / max_concurrency for a provider"""
+    with _schedulers_lock:
+        PROVIDER_LIMITS[provider] = {**PROVIDER_LIMITS.get(provider, DEFAULT_LIMITS), **limits}
+        _schedulers.pop(provider, None)
+
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    """Return the shared scheduler for a provider"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(provider)
+        if scheduler is None:
+            limits = PROVIDER_LIMITS.get(provider, DEFAULT_LIMITS)
+            scheduler = ProviderScheduler(provider, **limits)
+            _schedulers[provider] = scheduler
+        return scheduler
@@ -0,0 +1,166 @@
+# backend/response_parser.py
+
+import re
+import time
+import logging
+from typing import List, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+# "File: path/to/file.ext" / "FILE: path/to/file.ext" at column 0, optionally in
+# **bold** or behind a "#" / "//" comment marker. Indented lines are code, not
+# headers: "    file: str" is an annotation.
+HEADER_RE = re.compile(r"^(?:\*\*|(?:#+|//)\s*)?(?:file|FILE|File):\s*(?P<fname>.+?)\s*(?:\*\*)?\s*$")
+# Also accept markdown headings ("### path/to/file.ext") as file headers
+MARKDOWN_HEADER_RE = re.compile(
+    r"^(?:(?:\*\*|(?:#+|//)\s*)?(?:file|FILE|File):|###)\s*(?P<fname>.+?)\s*(?:\*\*)?\s*$"
+)
+FENCE = "```"
+
+
+class FileBlockParser:
+    """
+    Incremental parser for model output made of file blocks:
+
+        File: path/to/file.ext
+        ```lang
+        <code>
+        ```
+
+    Push text with feed() as it arrives; every call returns the
+    (path, content) pairs whose block closed in that chunk. Blocks
+    without a fence run until the next header or the end of output.
+    Contents are stripped unless `strip` is False.
+
+    Each character is scanned a constant number of times, so parsing is
+    linear in the size of the output however it is chunked.
+    """
+
+    def __init__(self, strip: bool = True, header_re: Pattern = HEADER_RE):
+        self.strip = strip
+        self.header_re = header_re
+        self._partial: List[str] = []
+        self._fname: Optional[str] = None
+        self._fenced: Optional[bool] = None  # None until the first body line
+        self._lines: List[str] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk of output and return the blocks it completed"""
+        completed = []
+        if not chunk:
+            return completed
+        if "\n" not in chunk:
+            self._partial.append(chunk)
+            return completed
+        lines = chunk.split("\n")
+        self._partial.append(lines[0])
+        lines[0] = "".join(self._partial)
+        self._partial = [lines.pop()]
+        for line in lines:
+            self._feed_line(line, completed)
+        return completed
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Flush the final line and return any block still open"""
+        completed = []
+        last = "".join(self._partial)
+        self._partial = []
+        if last:
+            self._feed_line(last, completed)
+        if self._fname is not None:
+            if self._fenced:
+                logger.warning("Discarding unterminated block for %s", self._fname)
+            elif self._lines:
+                self._emit(completed)
+            self._reset()
+        return completed
+
+    def _feed_line(self, line: str, completed: List[Tuple[str, str]]) -> None:
+        if self._fenced:
+            if line.strip() == FENCE:
+                self._emit(completed)
+                self._reset()
+            else:
+                self._lines.append(line)
+            return
+
+        header = self.header_re.match(line)
+        if header:
+            if self._fname is not None and self._lines:
+                self._emit(completed)
+            self._reset()
+            self._fname = header.group("fname").strip("`*")
+            return
+
+        if self._fname is None:
+            return
+        if self._fenced is None:
+            if not line.strip():
+                return
+            if line.lstrip().startswith(FENCE):
+                self._fenced = True
+                return
+            self._fenced = False
+        self._lines.append(line)
+
+    def _emit(self, completed: List[Tuple[str, str]]) -> None:
+        content = "\n".join(self._lines)
+        # strip=False keeps leading indentation, e.g. for excerpts of a class
+        content = content.strip() if self.strip else content.strip("\n")
+        completed.append((self._fname, content))
+
+    def _reset(self) -> None:
+        self._fname = None
+        self._fenced = None
+        self._lines = []
+
+
+def parse_file_blocks(text: str, header_re: Pattern = HEADER_RE, strip: bool = True) -> List[Tuple[str, str]]:
+    """Parse a complete response into (path, content) pairs in a single pass"""
+    parser = FileBlockParser(strip=strip, header_re=header_re)
+    return parser.feed(text) + parser.close()
+
+
+def _synthetic_output(size_bytes: int) -> str:
+    body = "\n".join(f"    value_{i} = compute(value_{i - 1}, '{i}')  # step {i}" for i in range(1, 60))
+    block = "File: src/module_{n}.py\n```python\ndef run():\n" + body + "\n    return value_59\n```\n\n"
+    parts, total, n = [], 0, 0
+    while total < size_bytes:
+        text = block.replace("{n}", str(n))
+        parts.append(text)
+        total += len(text)
+        n += 1
+    return "".join(parts)
+
+
+def benchmark(size_mb: float = 8.0, chunk_size: int = 64) -> None:
+    """Time the parser on a synthetic multi-megabyte response"""
+    text = _synthetic_output(int(size_mb * 1024 * 1024))
+    legacy = re.compile(r"File:\s*(.*?)\n```(?:[^\n]*)?\n([\s\S]*?)\n```", re.DOTALL)
+
+    start = time.perf_counter()
+    blocks = parse_file_blocks(text)
+    whole = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parser = FileBlockParser()
+    streamed = []
+    for i in range(0, len(text), chunk_size):
+        streamed.extend(parser.feed(text[i:i + chunk_size]))
+    streamed.extend(parser.close())
+    chunked = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy_blocks = legacy.findall(text)
+    regex = time.perf_counter() - start
+
+    assert len(blocks) == len(streamed) == len(legacy_blocks)
+    mb = len(text) / (1024 * 1024)
+    print(f"{mb:.1f} MB, {len(blocks)} files")
+    print(f"  single feed:          {whole * 1000:8.1f} ms  ({mb / whole:6.1f} MB/s)")
+    print(f"  {chunk_size}-byte stream feed:  {chunked * 1000:8.1f} ms  ({mb / chunked:6.1f} MB/s)")
+    print(f"  legacy regex only:    {regex * 1000:8.1f} ms  ({mb / regex:6.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,209 @@
+# backend/retrieval.py
+
+import os
+import re
+import math
+import hashlib
+import logging
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.ignore import walk
+from backend.chunking import split_source
+from memory.retrieval_index import (
+    chunk_locations, corpus_stats, document_frequencies, fetch_postings, load_files,
+    remove_files, replace_files, touch_files
+)
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+CHUNK_TOKENS = 400
+MAX_INDEXED_SIZE = 1000000  # bytes
+# In large corpora, terms in more than this share of chunks say little and have
+# huge posting lists. Smaller ones keep every term; BM25's IDF already
+# down-weights common ones, and dropping them loses words like "http" or "parse".
+MAX_DF_RATIO = 0.3
+DF_CUTOFF_MIN_CHUNKS = 5000
+REPLACE_BATCH = 200  # files re-indexed per transaction
+
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from if in into is it of on or that the this to with "
+    "all any each every".split()
+)
+
+
+class Hit(NamedTuple):
+    path: str
+    start: int
+    end: int
+    name: str
+    score: float
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Identifier-aware terms: `fetchHttpData` and `fetch_http_data` both
+    yield fetch / http / data plus the whole identifier, lowercased.
+    Comments and strings are tokenized the same way.
+    """
+    terms = []
+    for word in _IDENTIFIER_RE.findall(text):
+        lower = word.lower()
+        parts = [p.lower() for piece in word.split("_") for p in _CAMEL_RE.findall(piece)]
+        if len(parts) > 1 or (parts and parts[0] != lower):
+            terms.append(lower)
+        terms.extend(_stem(p) for p in parts if len(p) > 1 and p not in STOPWORDS)
+    return terms
+
+
+def _stem(term: str) -> str:
+    """Fold plurals so calls matches call and retries matches retry"""
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def build_index(root: str, extensions: Optional[Tuple[str, ...]] = None) -> int:
+    """
+    Bring the BM25 index for `root` up to date. Files are re-chunked only
+    when their content hash changes. Returns the number of files re-indexed.
+    """
+    root = os.path.abspath(root)
+    stored = load_files(root)
+    seen = set()
+    changed, touched = [], []
+    updated = 0
+    for dirpath, _, filenames in walk(root):
+        for filename in filenames:
+            if extensions and not filename.endswith(extensions):
+                continue
+            full = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(full)
+            except OSError:
+                continue
+            if stat.st_size > MAX_INDEXED_SIZE:
+                continue
+            seen.add(full)
+            previous = stored.get(full)
+            if previous and previous[1] == stat.st_size and previous[2] == stat.st_mtime:
+                continue
+            with open(full, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if previous and previous[0] == digest:
+                touched.append((full, stat.st_size, stat.st_mtime))
+                continue
+            changed.append((full, digest, stat.st_size, stat.st_mtime, _chunk_terms(full, data)))
+            if len(changed) >= REPLACE_BATCH:
+                replace_files(root, changed)
+                updated += len(changed)
+                changed = []
+    replace_files(root, changed)
+    updated += len(changed)
+    touch_files(root, touched)
+    remove_files(root, set(stored) - seen)
+    logger.info("Retrieval index for %s: %d files, %d re-indexed", root, len(seen), updated)
+    return updated
+
+
+def _chunk_terms(path: str, data: bytes) -> List[Tuple[int, int, str, int, Dict[str, int]]]:
+    source = data.decode("utf-8", errors="ignore")
+    _, chunks = split_source(path, source, CHUNK_TOKENS)
+    result = []
+    for chunk in chunks:
+        terms = tokenize(chunk.text)
+        # The path is part of every chunk: "http" should find http_client.py
+        terms.extend(tokenize(os.path.basename(path)))
+        result.append((chunk.start, chunk.end, chunk.name, len(terms), dict(Counter(terms))))
+    return result
+
+
+def search(root: str, query: str, k: int = 20) -> List[Hit]:
+    """Top-k chunks under `root` for `query`, best first"""
+    root = os.path.abspath(root)
+    n_chunks, avgdl = corpus_stats(root)
+    if not n_chunks:
+        return []
+    terms = set(tokenize(query))
+    df = document_frequencies(root, terms)
+    if not df:
+        return []
+    # In big corpora skip near-ubiquitous terms; if that leaves nothing, keep only the rarest
+    selective = df
+    if n_chunks >= DF_CUTOFF_MIN_CHUNKS:
+        selective = {t: d for t, d in df.items() if d <= n_chunks * MAX_DF_RATIO}
+    if not selective:
+        rarest = min(df, key=df.get)
+        selective = {rarest: df[rarest]}
+    idf = {t: math.log(1 + (n_chunks - d + 0.5) / (d + 0.5)) for t, d in selective.items()}
+    postings = fetch_postings(root, idf)
+    if not postings:
+        return []
+
+    if np is not None:
+        scores = _score_numpy(postings, idf, avgdl)
+    else:
+        scores = _score_python(postings, idf, avgdl)
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+    locations = chunk_locations(chunk_id for chunk_id, _ in best)
+    return [Hit(*locations[chunk_id], score) for chunk_id, score in best if chunk_id in locations]
+
+
+def _score_python(postings, idf: Dict[str, float], avgdl: float) -> Dict[int, float]:
+    scores: Dict[int, float] = {}
+    for term, chunk_id, tf, length in postings:
+        norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avgdl))
+        scores[chunk_id] = scores.get(chunk_id, 0.0) + idf[term] * norm
+    return scores
+
+
+def _score_numpy(postings, idf: Dict[str, float], avgdl: float) -> Dict[int, float]:
+    terms, chunk_ids, tfs, lengths = zip(*postings)
+    chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+    tfs = np.asarray(tfs, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.float64)
+    weights = np.fromiter((idf[t] for t in terms), dtype=np.float64, count=len(terms))
+    contributions = weights * tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * lengths / avgdl))
+    unique, inverse = np.unique(chunk_ids, return_inverse=True)
+    totals = np.bincount(inverse, weights=contributions)
+    return dict(zip(unique.tolist(), totals.tolist()))
+
+
+def rank_files(root: str, query: str, top_k: int = 10, chunks_per_query: int = 200) -> List[Tuple[str, float]]:
+    """
+    Files most relevant to `query`, scored by their best chunk plus a
+    smaller share of their other matching chunks.
+    """
+    per_file: Dict[str, List[float]] = {}
+    for hit in search(root, query, chunks_per_query):
+        per_file.setdefault(hit.path, []).append(hit.score)
+    ranked = [
+        (path, scores[0] + 0.25 * sum(scores[1:]))
+        for path, scores in per_file.items()
+    ]
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return ranked[:top_k]
+
+
+def relevant_files(
+    root: str,
+    query: str,
+    top_k: int = 10,
+    extensions: Optional[Tuple[str, ...]] = None
+) -> List[str]:
+    """Index `root` (incrementally) and return its top_k files for `query`"""
+    build_index(root, extensions)
+    return [path for path, _ in rank_files(root, query, top_k)]
@@ -0,0 +1,215 @@
+# backend/sandbox.py
+
+import os
+import sys
+import time
+import shutil
+import signal
+import logging
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: timeouts still apply, rlimits don't
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+SMOKE_SECONDS = 5  # a smoke run still going after this long counts as started fine
+MAX_OUTPUT = 100000  # characters kept per stream
+ENTRY_POINTS = ("src/main.py", "main.py", "src/app.py", "app.py", "run.py")
+KINDS = ("lint", "test", "smoke")
+PYTEST_NO_TESTS = 5  # exit code when nothing was collected
+
+# Applies the limits in the child, then execs the real command. Doing this in a
+# separate interpreter avoids preexec_fn, which is unsafe in threaded servers.
+_LAUNCHER = (
+    "import os, sys, resource\n"
+    "for name, value in zip(('RLIMIT_CPU', 'RLIMIT_AS', 'RLIMIT_NOFILE', 'RLIMIT_FSIZE'), sys.argv[1:5]):\n"
+    "    limit = getattr(resource, name, None)\n"
+    "    if limit is not None and int(value) > 0:\n"
+    "        try:\n"
+    "            resource.setrlimit(limit, (int(value), int(value)))\n"
+    "        except (ValueError, OSError):\n"
+    "            pass\n"
+    "os.execvp(sys.argv[5], sys.argv[5:])\n"
+)
+
+
+class Limits(NamedTuple):
+    wall_seconds: float = 120
+    cpu_seconds: int = 60
+    memory_bytes: int = 1024 * 1024 * 1024  # address space
+    open_files: int = 256
+    file_bytes: int = 50 * 1024 * 1024  # largest file the process may write
+
+
+class RunResult(NamedTuple):
+    kind: str
+    project: str
+    command: List[str]
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    duration: float
+    timed_out: bool
+
+    @property
+    def passed(self) -> bool:
+        if self.kind == "smoke":
+            # Games and servers don't exit on their own; not crashing is the test
+            return self.timed_out or self.returncode == 0
+        if self.kind == "test":
+            return not self.timed_out and self.returncode in (0, PYTEST_NO_TESTS)
+        return not self.timed_out and self.returncode == 0
+
+
+def sandbox_env(base_dir: str, home: str) -> Dict[str, str]:
+    """
+    A minimal environment: no API keys or other server secrets, the
+    project on PYTHONPATH, and headless drivers for pygame and matplotlib.
+    """
+    python_path = [base_dir]
+    if os.path.isdir(os.path.join(base_dir, "src")):
+        python_path.append(os.path.join(base_dir, "src"))
+    env = {
+        "PATH": os.environ.get("PATH", os.defpath),
+        "HOME": home,
+        "TMPDIR": home,
+        "PYTHONPATH": os.pathsep.join(python_path),
+        "PYTHONDONTWRITEBYTECODE": "1",
+        "PYTHONUNBUFFERED": "1",
+        "SDL_VIDEODRIVER": "dummy",
+        "SDL_AUDIODRIVER": "dummy",
+        "MPLBACKEND": "Agg",
+    }
+    for name in ("LANG", "LC_ALL", "SYSTEMROOT"):
+        if name in os.environ:
+            env[name] = os.environ[name]
+    return env
+
+
+def _limited(command: List[str], limits: Limits) -> List[str]:
+    if resource is None:
+        return command
+    values = (limits.cpu_seconds, limits.memory_bytes, limits.open_files, limits.file_bytes)
+    return [sys.executable, "-c", _LAUNCHER] + [str(int(v)) for v in values] + command
+
+
+def _kill(process: subprocess.Popen) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)  # the test runner and anything it spawned
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_sandboxed(
+    command: List[str],
+    base_dir: str,
+    kind: str = "run",
+    limits: Limits = Limits()
+) -> RunResult:
+    """Run `command` in `base_dir` under the limits, killing it at the wall-clock timeout"""
+    base_dir = os.path.abspath(base_dir)
+    home = tempfile.mkdtemp(prefix="sandbox-")
+    started = time.monotonic()
+    timed_out = False
+    try:
+        process = subprocess.Popen(
+            _limited(command, limits),
+            cwd=base_dir,
+            env=sandbox_env(base_dir, home),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            start_new_session=os.name == "posix"
+        )
+        try:
+            stdout, stderr = process.communicate(timeout=limits.wall_seconds)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            _kill(process)
+            stdout, stderr = process.communicate()
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    duration = time.monotonic() - started
+    if timed_out and kind != "smoke":
+        logger.warning("%s in %s timed out after %.0fs", kind, base_dir, limits.wall_seconds)
+        stderr += f"\nTimed out after {limits.wall_seconds:.0f}s"
+    return RunResult(
+        kind, base_dir, command, None if timed_out else process.returncode,
+        stdout[-MAX_OUTPUT:], stderr[-MAX_OUTPUT:], duration, timed_out
+    )
+
+
+def lint_command(paths: Iterable[str] = (".",)) -> List[str]:
+    return [sys.executable, "-m", "flake8"] + list(paths)
+
+
+def test_command(paths: Iterable[str] = (".",)) -> List[str]:
+    return [sys.executable, "-m", "pytest"] + list(paths) + ["--disable-warnings", "-p", "no:cacheprovider"]
+
+
+def find_entry_point(base_dir: str) -> Optional[str]:
+    for candidate in ENTRY_POINTS:
+        if os.path.isfile(os.path.join(base_dir, candidate)):
+            return candidate
+    return None
+
+
+def smoke_run(base_dir: str, limits: Limits = Limits(wall_seconds=SMOKE_SECONDS)) -> Optional[RunResult]:
+    """Start the app headless for a few seconds; None when there's no entry point"""
+    entry = find_entry_point(base_dir)
+    if entry is None:
+        return None
+    return run_sandboxed([sys.executable, entry], base_dir, "smoke", limits)
+
+
+class RunnerPool:
+    """Runs lint, tests and a smoke start for several projects at once"""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, limits: Limits = Limits()):
+        self.limits = limits
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+
+    def _run(self, base_dir: str, kind: str) -> Optional[RunResult]:
+        if kind == "lint":
+            return run_sandboxed(lint_command(), base_dir, kind, self.limits)
+        if kind == "test":
+            return run_sandboxed(test_command(), base_dir, kind, self.limits)
+        if kind == "smoke":
+            return smoke_run(base_dir, self.limits._replace(wall_seconds=min(self.limits.wall_seconds, SMOKE_SECONDS)))
+        raise ValueError(f"Unknown run kind: {kind}")
+
+    def run_many(self, projects: Iterable[str], kinds: Iterable[str] = KINDS) -> Dict[str, List[RunResult]]:
+        """{project: results}; every (project, kind) pair runs concurrently"""
+        kinds = list(kinds)
+        futures = {
+            (project, kind): self._pool.submit(self._run, project, kind)
+            for project in projects
+            for kind in kinds
+        }
+        results: Dict[str, List[RunResult]] = {}
+        for (project, kind), future in futures.items():
+            result = future.result()
+            if result is not None:
+                results.setdefault(project, []).append(result)
+        return results
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
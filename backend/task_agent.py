@@ -1,9 +1,10 @@
-import openai, os
+import openai
 from dotenv import load_dotenv
 import textwrap
 
+from backend.llm_client import chat_completion, get_client
+
 load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def break_down(prompt):
     """Break down tasks with enhanced formatting"""
@@ -31,13 +32,13 @@ def break_down(prompt):
     ]
     
     try:
-        res = client.chat.completions.create(
+        breakdown = chat_completion(
+            get_client(),
+            messages,
             model="gpt-4-turbo",
-            messages=messages,
             temperature=0.4,
             max_tokens=1000
         )
-        breakdown = res.choices[0].message.content
         print("\n🔧 Task Breakdown:")
         print(breakdown)
     except openai.APIError as e:
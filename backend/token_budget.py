@@ -0,0 +1,249 @@
+# backend/token_budget.py
+
+import math
+import re
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to the calibrated estimator
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# (context window, max completion tokens) per model
+MODEL_LIMITS = {
+    "gpt-4-turbo": (128000, 4096),
+    "gpt-4": (8192, 4096),
+    "gpt-3.5-turbo": (16385, 4096),
+    "deepseek-coder": (16384, 4096),
+}
+DEFAULT_LIMITS = (8192, 4096)
+
+# Chat format overhead (role markers etc.)
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Expected output per file: the model echoes the file back plus a header/fence
+OUTPUT_RATIO = 1.1
+# With search/replace edits only the changed regions come back
+DIFF_OUTPUT_RATIO = 0.3
+OUTPUT_OVERHEAD_PER_FILE = 20
+
+# Estimator calibration: BPE vocabularies hold ~4 chars of a word per token
+# and almost always split punctuation into its own token.
+CHARS_PER_WORD_TOKEN = 4
+# stream_batches sends a batch once this share of its output budget is used
+BATCH_FULL_RATIO = 0.9
+# Reference-only files may use at most this share of the context window
+CONTEXT_SHARE = 0.4
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Return the tiktoken encoding for `model`, or None when unavailable"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer-free estimate tuned for code: punctuation counts as a token each"""
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        tokens += math.ceil(len(piece) / CHARS_PER_WORD_TOKEN)
+    # Runs of indentation/newlines are merged but still cost something
+    tokens += text.count("\n") // 2
+    return tokens
+
+
+def count_tokens(text: str, model: str = "gpt-4-turbo") -> int:
+    """Count prompt tokens with the model's BPE tokenizer if installed"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: Iterable[Dict[str, str]], model: str = "gpt-4-turbo") -> int:
+    """Count tokens for a list of chat messages, including format overhead"""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE + count_tokens(message.get("content") or "", model)
+    return total
+
+
+def get_model_limits(model: str) -> Tuple[int, int]:
+    """Return (context window, max completion tokens) for `model`"""
+    return MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+
+
+def reserve_output_tokens(content_tokens: int, output_ratio: float = OUTPUT_RATIO) -> int:
+    """Output budget to reserve for a file whose body costs `content_tokens`"""
+    return int(content_tokens * output_ratio) + OUTPUT_OVERHEAD_PER_FILE
+
+
+def completion_budget(prompt_tokens: int, model: str) -> int:
+    """max_tokens to request: the completion limit, or what the prompt leaves of the window"""
+    context_window, max_output = get_model_limits(model)
+    return max(1, min(max_output, context_window - prompt_tokens))
+
+
+def pack_batches(
+    files: Dict[str, str],
+    model: str = "gpt-4-turbo",
+    overhead_tokens: int = 0,
+    max_files: int = 0,
+    output_ratio: float = OUTPUT_RATIO
+) -> List[Dict[str, str]]:
+    """
+    Bin-pack files into the fewest batches that fit the model's window.
+
+    Each file costs its prompt tokens plus a reserved share of output.
+    A batch must keep prompt + reserved output inside the context window
+    and the reserved output inside the completion limit. Uses first-fit
+    decreasing; files keep their original order inside each batch.
+    Files that can't fit even alone get a batch of their own.
+    """
+    context_window, max_output = get_model_limits(model)
+    prompt_capacity = context_window - overhead_tokens
+
+    sized = []
+    for index, (fname, content) in enumerate(files.items()):
+        prompt, output = _file_cost(fname, content, model, output_ratio)
+        sized.append((prompt, output, index, fname))
+    sized.sort(key=lambda item: (item[0] + item[1], -item[2]), reverse=True)
+
+    bins = []  # [prompt_used, output_used, [(index, fname), ...]]
+    for prompt, output, index, fname in sized:
+        if _oversized(fname, prompt, output, prompt_capacity, max_output, model):
+            bins.append([prompt, output, [(index, fname)]])
+            continue
+        for b in bins:
+            if _fits(b, prompt, output, prompt_capacity, max_output, len(b[2]), max_files):
+                b[0] += prompt
+                b[1] += output
+                b[2].append((index, fname))
+                break
+        else:
+            bins.append([prompt, output, [(index, fname)]])
+
+    bins.sort(key=lambda b: min(index for index, _ in b[2]))
+    return [{fname: files[fname] for _, fname in sorted(b[2])} for b in bins]
+
+
+def fits_in_request(
+    fname: str,
+    content: str,
+    model: str = "gpt-4-turbo",
+    overhead_tokens: int = 0,
+    output_ratio: float = OUTPUT_RATIO
+) -> bool:
+    """Whether a single file fits one request, prompt and reserved output included"""
+    context_window, max_output = get_model_limits(model)
+    prompt, output = _file_cost(fname, content, model, output_ratio)
+    return prompt + output <= context_window - overhead_tokens and output <= max_output
+
+
+def trim_context(context: Dict[str, str], model: str = "gpt-4-turbo", share: float = CONTEXT_SHARE) -> Dict[str, str]:
+    """Keep reference files, in their given (ranked) order, while they fit `share` of the window"""
+    budget = int(get_model_limits(model)[0] * share)
+    kept, used = {}, 0
+    for fname, content in context.items():
+        cost = count_tokens(f"File: {fname}\n\n{content}", model) + TOKENS_PER_MESSAGE
+        if used + cost > budget:
+            continue
+        kept[fname] = content
+        used += cost
+    return kept
+
+
+def chunk_token_limit(model: str = "gpt-4-turbo", overhead_tokens: int = 0) -> int:
+    """Largest chunk body whose echoed output still fits one completion"""
+    context_window, max_output = get_model_limits(model)
+    by_output = int((max_output - OUTPUT_OVERHEAD_PER_FILE) / OUTPUT_RATIO)
+    by_context = int((context_window - overhead_tokens) / (1 + OUTPUT_RATIO))
+    return max(1, min(by_output, by_context))
+
+
+def stream_batches(
+    items: Iterable[Tuple[str, str]],
+    model: str = "gpt-4-turbo",
+    overhead_tokens: int = 0,
+    max_files: int = 0,
+    max_resident_bytes: int = 0,
+    output_ratio: float = OUTPUT_RATIO
+) -> Iterator[Dict[str, str]]:
+    """
+    Online counterpart of pack_batches for lazily read files.
+
+    Files are placed first-fit into open batches. A batch is yielded as
+    soon as it is nearly full or hits `max_files`, and whenever buffered
+    content exceeds `max_resident_bytes` the fullest batch is flushed,
+    so memory stays bounded no matter how large the tree is.
+    """
+    context_window, max_output = get_model_limits(model)
+    prompt_capacity = context_window - overhead_tokens
+
+    bins = []  # [prompt_used, output_used, bytes, {fname: content}]
+    resident = 0
+    for fname, content in items:
+        prompt, output = _file_cost(fname, content, model, output_ratio)
+        if _oversized(fname, prompt, output, prompt_capacity, max_output, model):
+            yield {fname: content}
+            continue
+
+        size = len(content.encode("utf-8"))
+        for b in bins:
+            if _fits(b, prompt, output, prompt_capacity, max_output, len(b[3]), max_files):
+                break
+        else:
+            b = [0, 0, 0, {}]
+            bins.append(b)
+        b[0] += prompt
+        b[1] += output
+        b[2] += size
+        b[3][fname] = content
+        resident += size
+
+        if b[1] >= max_output * BATCH_FULL_RATIO or (max_files and len(b[3]) >= max_files):
+            bins.remove(b)
+            resident -= b[2]
+            yield b[3]
+
+        while max_resident_bytes and resident > max_resident_bytes and bins:
+            fullest = max(bins, key=lambda item: item[1])
+            bins.remove(fullest)
+            resident -= fullest[2]
+            yield fullest[3]
+
+    for b in bins:
+        yield b[3]
+
+
+def _file_cost(fname: str, content: str, model: str, output_ratio: float = OUTPUT_RATIO) -> Tuple[int, int]:
+    """(prompt tokens, reserved output tokens) for one file"""
+    prompt = TOKENS_PER_MESSAGE + count_tokens(f"File: {fname}\n\n{content}", model)
+    return prompt, reserve_output_tokens(prompt, output_ratio)
+
+
+def _oversized(fname: str, prompt: int, output: int, prompt_capacity: int, max_output: int, model: str) -> bool:
+    """True (and logged) when a file can't fit a request even on its own"""
+    if prompt + output > prompt_capacity or output > max_output:
+        logger.warning("%s needs ~%d tokens and exceeds a single request for %s",
+                       fname, prompt + output, model)
+        return True
+    return False
+
+
+def _fits(b, prompt: int, output: int, prompt_capacity: int, max_output: int, count: int, max_files: int) -> bool:
+    """Whether a file of the given cost fits into batch `b`"""
+    if max_files and count >= max_files:
+        return False
+    return b[0] + prompt + b[1] + output <= prompt_capacity and b[1] + output <= max_output
@@ -1,11 +1,35 @@
 import os
-import re
 import argparse
+import ast
+import atexit
+import json
+import uuid
+import hashlib
 import logging
-import openai
-from openai import OpenAI
-from typing import Dict, Union
+import textwrap
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from memory.logger import log_edit
+from utils.ignore import walk
+from utils.context_threads import ContextThreadPoolExecutor
+from backend.token_budget import (
+    DIFF_OUTPUT_RATIO, OUTPUT_RATIO, chunk_token_limit, count_message_tokens, completion_budget,
+    fits_in_request, pack_batches, stream_batches, trim_context
+)
+from backend.chunking import split_source, stitch
+from backend.compression import compress_context
+from backend.validation import validate_files
+from backend.patch_apply import EDIT_FORMAT_INSTRUCTIONS, apply_hunks, format_hunk, parse_edits
+from backend.llm_client import chat_completion, get_client, stream_chat_completion
+from backend.hedging import DEFAULT_PERCENTILE, enable_hedging
+from backend.project_index import DEFAULT_DEPTH, DEFAULT_MAX_FILES, select_context
+from backend.retrieval import relevant_files
+from backend.batch_backends import BATCH_BACKENDS, COMPLETED, FAILED, BatchBackend, echo_responder
+from memory.usage_metrics import format_summary, run_summary
+from memory.batch_jobs import (
+    BATCH_DIR, create_job, find_open_job, get_job, item_counts, mark_item, pending_items, update_job
+)
+from backend.response_parser import FileBlockParser, parse_file_blocks
 
 # Setup logging
 logging.basicConfig(
@@ -19,44 +43,94 @@ logging.basicConfig(
 
 VALID_EXTENSIONS = (".py", ".html", ".css", ".js", ".ts", ".jsx", ".tsx", ".md", ".txt")
 MAX_FILE_SIZE = 100000  # 100KB
+MAX_CHUNKED_FILE_SIZE = 5000000  # 5MB, upgraded chunk by chunk
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RESIDENT_BYTES = 64 * 1024 * 1024  # 64MB of buffered file content
+EDIT_FORMATS = ("whole", "diff")  # full files back, or SEARCH/REPLACE hunks
+MAX_HUNK_RETRIES = 1
+MAX_REPAIR_ROUNDS = 2  # Repair requests per invalid file before keeping the original
 
-def is_valid_file(filepath: str) -> bool:
+def is_valid_file(filepath: str, allow_large: bool = False) -> bool:
     """Check if file should be processed"""
-    if filepath.startswith((".", "__")):
+    if os.path.basename(filepath).startswith("."):
         return False
     if filepath.endswith("~"):
         return False
     if not filepath.endswith(VALID_EXTENSIONS):
         return False
-    if os.path.getsize(filepath) > MAX_FILE_SIZE:
+    size = os.path.getsize(filepath)
+    if size > MAX_FILE_SIZE and not (allow_large and size <= MAX_CHUNKED_FILE_SIZE):
         logging.warning(f"Skipping large file: {filepath}")
         return False
     return True
 
-def read_code(path: str) -> Dict[str, str]:
-    """
-    Read a single file or all valid files from a directory.
-    Returns dictionary of {file_path: content}
-    """
-    files = {}
-    
+def iter_paths(path: str, include_large: bool = False) -> Iterator[str]:
+    """Yield the valid file paths under a directory (or the file itself) without reading them"""
     if os.path.isdir(path):
-        for dp, _, filenames in os.walk(path):
+        for dp, _, filenames in walk(path):
             for f in filenames:
                 full_path = os.path.join(dp, f)
-                if is_valid_file(full_path):
-                    try:
-                        files[full_path] = read_file(full_path)
-                    except Exception as e:
-                        logging.error(f"Error reading {full_path}: {str(e)}")
-        if not files:
+                if is_valid_file(full_path, include_large):
+                    yield full_path
+    elif os.path.isfile(path) and is_valid_file(path, include_large):
+        yield path
+
+def iter_code(path: str, include_large: bool = False) -> Iterator[Tuple[str, str]]:
+    """
+    Lazily yield (file_path, content) for a single file or every valid
+    file in a directory, reading each file only when it's requested.
+    include_large admits files above MAX_FILE_SIZE (they're upgraded in chunks).
+    """
+    found = False
+    for full_path in iter_paths(path, include_large):
+        try:
+            content = read_file(full_path)
+        except Exception as e:
+            logging.error(f"Error reading {full_path}: {str(e)}")
+            continue
+        found = True
+        yield full_path, content
+    if not found:
+        if os.path.isdir(path):
             logging.error(f"❌ No valid files found in directory: {path}")
-    elif os.path.isfile(path) and is_valid_file(path):
-        files[path] = read_file(path)
-    else:
-        logging.error(f"❌ Path not found or invalid file: {path}")
-        
-    return files
+        else:
+            logging.error(f"❌ Path not found or invalid file: {path}")
+
+def read_code(path: str, include_large: bool = False) -> Dict[str, str]:
+    """
+    Read a single file or all valid files from a directory.
+    Returns dictionary of {file_path: content}
+    """
+    return dict(iter_code(path, include_large))
+
+def read_targeted(
+    path: str,
+    target: str,
+    max_depth: int = DEFAULT_DEPTH,
+    max_files: int = DEFAULT_MAX_FILES
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Read only what an upgrade of `target` (a file or symbol under `path`)
+    needs: returns (target files, reference files) where the reference
+    files are its import closure, nearest first.
+    """
+    targets, context = {}, {}
+    for fname, distance in select_context(path, target, max_depth, max_files):
+        if not is_valid_file(fname, allow_large=not distance):
+            continue
+        (context if distance else targets)[fname] = read_file(fname)
+    logging.info(f"🎯 {target}: {len(targets)} target files, {len(context)} related files")
+    return targets, context
+
+def select_relevant(files: Dict[str, str], path: str, upgrade_instruction: str, top_k: int) -> Dict[str, str]:
+    """Keep the top_k files under `path` that best match the instruction (BM25), best first"""
+    if not top_k or len(files) <= top_k or not os.path.isdir(path):
+        return files
+    by_path = {os.path.abspath(fname): fname for fname in files}
+    ranked = relevant_files(path, upgrade_instruction, top_k, VALID_EXTENSIONS)
+    selected = {by_path[p]: files[by_path[p]] for p in ranked if p in by_path}
+    logging.info(f"🔍 Sending the {len(selected)} of {len(files)} files most relevant to the instruction")
+    return selected or files
 
 def read_file(filepath: str) -> str:
     """Safely read a file and return its content"""
@@ -81,11 +155,17 @@ def upgrade_code(
     upgrade_instruction: str,
     provider: str = "OpenAI",
     model: str = "gpt-4-turbo",
-    temperature: float = 0.3
+    temperature: float = 0.3,
+    edit_format: str = "whole",
+    context: Optional[Dict[str, str]] = None
 ) -> Dict[str, str]:
     """
     Send files and instruction to AI, return updated versions.
-    Handles token limits by processing in chunks.
+    Handles token limits by bin-packing files into as few requests as fit.
+    With edit_format="diff" the model returns SEARCH/REPLACE hunks that
+    are applied locally instead of echoing every file back.
+    `context` holds reference-only files (most relevant first) that are
+    sent with every request but never rewritten.
     """
     if not files:
         logging.error("❌ No files to upgrade")
@@ -95,94 +175,663 @@ def upgrade_code(
         logging.error("❌ Empty upgrade instruction")
         return files
 
+    context = _fit_context(context, files, model)
+    batches = _batch_files(files, upgrade_instruction, model, edit_format=edit_format, context=context)
+    if len(batches) > 1:
+        logging.info(f"📦 Splitting {len(files)} files into {len(batches)} requests to fit {model}")
+
+    result = {}
+    for batch in batches:
+        result.update(_upgrade_batch(batch, upgrade_instruction, provider, model, temperature, edit_format, context))
+    return validate_and_repair(result, files, upgrade_instruction, provider, model, temperature)
+
+def upgrade_code_concurrent(
+    files: Dict[str, str],
+    upgrade_instruction: str,
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    max_workers: int = DEFAULT_CONCURRENCY,
+    files_per_request: int = 1,
+    edit_format: str = "whole",
+    context: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    """
+    Fan-out mode: split files into small groups and upgrade each group in
+    its own request, running at most `max_workers` requests at a time.
+    Returns the merged {file_path: content} dict, same shape as upgrade_code.
+    """
+    if not files:
+        logging.error("❌ No files to upgrade")
+        return {}
+
+    if not upgrade_instruction.strip():
+        logging.error("❌ Empty upgrade instruction")
+        return files
+
+    context = _fit_context(context, files, model)
+    groups = _batch_files(
+        files, upgrade_instruction, model, max_files=files_per_request, edit_format=edit_format, context=context
+    )
+    if len(groups) == 1:
+        result = _upgrade_batch(files, upgrade_instruction, provider, model, temperature, edit_format, context)
+        return validate_and_repair(result, files, upgrade_instruction, provider, model, temperature)
+
+    logging.info(f"🚀 Fanning out {len(files)} files into {len(groups)} requests "
+                 f"({max_workers} concurrent)")
+    result = {}
+    failures = []
+    with ContextThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(
+                _upgrade_batch, group, upgrade_instruction, provider, model, temperature, edit_format, context
+            ): group
+            for group in groups
+        }
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                result.update(future.result())
+            except Exception as e:
+                failures.append(e)
+                logging.error(f"❌ Request for {', '.join(group)} failed: {e}")
+                # Keep originals so one failed group doesn't drop files
+                result.update(group)
+
+    if failures and len(failures) == len(groups):
+        raise failures[0]
+
+    # Preserve the input ordering for callers that display results
+    ordered = {fname: result[fname] for fname in files if fname in result}
+    ordered.update(result)
+    return validate_and_repair(ordered, files, upgrade_instruction, provider, model, temperature)
+
+def upgrade_path(
+    path: str,
+    upgrade_instruction: str,
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    max_workers: int = 1,
+    files_per_request: int = 0,
+    max_resident_bytes: int = DEFAULT_MAX_RESIDENT_BYTES,
+    edit_format: str = "whole",
+    include_large: bool = False
+) -> List[str]:
+    """
+    Upgrade a file or directory without holding the whole tree in memory.
+    Files are read lazily, packed into batches as they fill and each
+    batch is written back as soon as its response arrives.
+    Returns the list of written file paths.
+    """
+    if not upgrade_instruction.strip():
+        logging.error("❌ Empty upgrade instruction")
+        return []
+
+    overhead = count_message_tokens(_build_messages({}, upgrade_instruction, edit_format), model)
+    batches = stream_batches(
+        iter_code(path, include_large),
+        model,
+        overhead_tokens=overhead,
+        max_files=files_per_request,
+        max_resident_bytes=max_resident_bytes,
+        output_ratio=_output_ratio(edit_format)
+    )
+
+    written = []
+    pending = set()
+    with ContextThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for batch in batches:
+            pending.add(pool.submit(
+                _upgrade_validated, batch, upgrade_instruction, provider, model, temperature, edit_format
+            ))
+            # Don't read ahead more than the pool can work on
+            if len(pending) >= max(1, max_workers):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written.extend(_write_finished(done))
+        done, _ = wait(pending)
+        written.extend(_write_finished(done))
+
+    if not written:
+        logging.error("❌ Upgrade produced no files")
+    return written
+
+def _upgrade_validated(
+    batch: Dict[str, str],
+    upgrade_instruction: str,
+    provider: str,
+    model: str,
+    temperature: float,
+    edit_format: str
+) -> Dict[str, str]:
+    result = _upgrade_batch(batch, upgrade_instruction, provider, model, temperature, edit_format)
+    return validate_and_repair(result, batch, upgrade_instruction, provider, model, temperature)
+
+def _write_finished(futures) -> List[str]:
+    """Write the results of finished batch futures and return their paths"""
+    written = []
+    for future in futures:
+        try:
+            updated = future.result()
+        except Exception as e:
+            logging.error(f"❌ Batch failed: {e}")
+            continue
+        write_code(updated)
+        written.extend(updated)
+    return written
+
+def _batch_files(
+    files: Dict[str, str],
+    upgrade_instruction: str,
+    model: str,
+    max_files: int = 0,
+    edit_format: str = "whole",
+    context: Optional[Dict[str, str]] = None
+) -> List[Dict[str, str]]:
+    """Bin-pack files into request batches that fit the model's context and output limits"""
+    overhead = count_message_tokens(_build_messages({}, upgrade_instruction, edit_format, context), model)
+    return pack_batches(
+        files, model, overhead_tokens=overhead, max_files=max_files, output_ratio=_output_ratio(edit_format)
+    )
+
+def _fit_context(
+    context: Optional[Dict[str, str]],
+    files: Dict[str, str],
+    model: str
+) -> Optional[Dict[str, str]]:
+    """
+    Drop reference files that are also targets, reduce the rest to
+    skeletons (targets always stay verbatim) and trim to the context budget.
+    """
+    if not context:
+        return None
+    context = {fname: content for fname, content in context.items() if fname not in files}
+    context, before, after = compress_context(context, model)
+    if before:
+        logging.info(f"🗜️ Reference files compressed from {before} to {after} tokens "
+                     f"({1 - after / before:.0%} saved per request)")
+    kept = trim_context(context, model)
+    if len(kept) < len(context):
+        logging.info(f"✂️ Sending {len(kept)} of {len(context)} reference files to fit {model}")
+    return kept
+
+def _output_ratio(edit_format: str) -> float:
+    """Expected output size relative to the input for an edit format"""
+    if edit_format not in EDIT_FORMATS:
+        raise ValueError(f"Unknown edit format: {edit_format}")
+    return DIFF_OUTPUT_RATIO if edit_format == "diff" else OUTPUT_RATIO
+
+def _build_messages(
+    files: Dict[str, str],
+    upgrade_instruction: str,
+    edit_format: str = "whole",
+    context: Optional[Dict[str, str]] = None
+) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for one upgrade request.
+    Everything shared between requests (system prompt, instruction, response
+    format) comes first and the per-file payload last, so concurrent and
+    repeated requests share a prefix the provider can serve from its prompt cache.
+    """
     # Prepare system message
     system_msg = {
         "role": "system", 
         "content": "You are an expert full-stack developer. Apply requested upgrades to the provided code."
     }
     
-    # Build messages with files
-    messages = [system_msg]
-    token_count = 1000  # Start with system message tokens
-    
-    for fname, content in files.items():
-        file_msg = f"File: {fname}\n\n{content}"
-        file_tokens = len(file_msg.split())  # Approximate token count
-        
-        # Check token limit (GPT-4-turbo has 128K context)
-        if token_count + file_tokens > 120000:
-            logging.warning(f"⚠️ Token limit reached. Processing {len(messages)-1} files.")
-            break
-            
-        messages.append({"role": "user", "content": file_msg})
-        token_count += file_tokens
-    
     # Add upgrade instruction
-    upgrade_msg = {
-        "role": "user",
-        "content": (
-            "Apply these upgrades across all files:\n"
-            f"{upgrade_instruction}\n\n"
+    if edit_format == "diff":
+        response_format = EDIT_FORMAT_INSTRUCTIONS
+    else:
+        response_format = (
             "Respond format for each file:\n"
             "File: path/to/file.ext\n"
             "```\n<updated code>\n```\n"
             "Important: Only return updated files."
         )
+    upgrade_msg = {
+        "role": "user",
+        "content": (
+            "Apply these upgrades across all of the following files:\n"
+            f"{upgrade_instruction}\n\n"
+            f"{response_format}"
+        )
     }
-    messages.append(upgrade_msg)
+    messages = [system_msg, upgrade_msg]
+
+    # Reference files are shared by every request of an upgrade
+    for fname, content in (context or {}).items():
+        messages.append({
+            "role": "user",
+            "content": f"Reference only (bodies may be elided), do not return: {fname}\n\n{content}"
+        })
+
+    # Files go last: they differ from request to request
+    for fname, content in files.items():
+        messages.append({"role": "user", "content": f"File: {fname}\n\n{content}"})
+    return messages
+
+def _upgrade_batch(
+    files: Dict[str, str],
+    upgrade_instruction: str,
+    provider: str,
+    model: str,
+    temperature: float,
+    edit_format: str = "whole",
+    context: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    """Send a single request for `files` and parse the updated versions"""
+    if len(files) == 1:
+        fname, content = next(iter(files.items()))
+        overhead = count_message_tokens(_build_messages({}, upgrade_instruction, edit_format, context), model)
+        if not fits_in_request(fname, content, model, overhead, _output_ratio(edit_format)):
+            return {fname: upgrade_large_file(fname, content, upgrade_instruction, provider, model, temperature)}
+
+    messages = _build_messages(files, upgrade_instruction, edit_format, context)
+    prompt_tokens = count_message_tokens(messages, model)
     
     try:
-        if provider == "DeepSeek":
-            api_key = os.getenv("DEEPSEEK_API_KEY")
-            client = openai.OpenAI(
-                api_key=api_key,
-                base_url="https://api.deepseek.com/v1"
-            )
-        else:
-            api_key = os.getenv("OPENAI_API_KEY")
-            client = openai.OpenAI(api_key=api_key)
-            
-        response = client.chat.completions.create(
+        output = chat_completion(
+            get_client(provider),
+            messages,
+            provider=provider,
             model=model,
-            messages=messages,
             temperature=temperature,
-            max_tokens=4000
+            max_tokens=completion_budget(prompt_tokens, model)
         )
-        output = response.choices[0].message.content
-        return parse_response(output, files)
+        if edit_format == "diff":
+            updated = apply_edit_response(output, files, provider, model, temperature)
+        else:
+            updated = parse_response(output, files)
+        # Reference files are never rewritten, even if the model returns them
+        return {fname: content for fname, content in updated.items() if fname not in (context or {})}
     except Exception as e:
         logging.exception(f"❌ Error from {provider} API")
         raise
 
-def parse_response(gpt_output: str, original_files: Dict[str, str]) -> Dict[str, str]:
+def upgrade_large_file(
+    fname: str,
+    content: str,
+    upgrade_instruction: str,
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    max_workers: int = DEFAULT_CONCURRENCY
+) -> str:
     """
-    Extract new code blocks from GPT output with improved parsing
+    Upgrade a file too large for one request.
+    The file is split into top-level functions/classes (line windows for
+    non-Python files), chunks are upgraded in parallel with the file's
+    imports and signatures as shared context, then stitched back together.
+    Returns the new content, or the original if the result doesn't validate.
     """
-    result = {}
-    pattern = r"File:\s*(.*?)\n```(?:[^\n]*)?\n([\s\S]*?)\n```"
-    blocks = re.findall(pattern, gpt_output, re.DOTALL)
-    
+    overhead = count_message_tokens(_chunk_messages(fname, "", None, upgrade_instruction), model)
+    header_budget = chunk_token_limit(model, overhead) // 4
+    header, chunks = split_source(fname, content, chunk_token_limit(model, overhead))
+    if count_message_tokens([{"content": header}], model) > header_budget:
+        header = ""  # Too big to be worth repeating in every request
+    if header:
+        overhead = count_message_tokens(_chunk_messages(fname, header, None, upgrade_instruction), model)
+        header, chunks = split_source(fname, content, chunk_token_limit(model, overhead))
+    logging.info(f"🧩 Upgrading {fname} in {len(chunks)} chunks")
+
+    replacements = {}
+    with ContextThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {
+            pool.submit(_upgrade_chunk, fname, header, chunk, upgrade_instruction, provider, model, temperature): index
+            for index, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                updated = future.result()
+            except Exception as e:
+                logging.error(f"❌ Chunk {chunks[index].name} of {fname} failed: {e}")
+                continue
+            if updated is not None:
+                replacements[index] = updated
+
+    try:
+        result = stitch(content, chunks, replacements)
+    except ValueError as e:
+        logging.error(f"❌ Could not stitch {fname}: {e}. Keeping original.")
+        return content
+    if fname.endswith(".py"):
+        try:
+            ast.parse(result)
+        except SyntaxError as e:
+            logging.error(f"❌ Stitched {fname} doesn't parse ({e}). Keeping original.")
+            return content
+    if result != content:
+        log_edit(fname, result)
+    return result
+
+def _chunk_messages(fname: str, header: str, chunk, upgrade_instruction: str) -> List[Dict[str, str]]:
+    """Build the messages for one chunk (chunk=None sizes the fixed overhead)"""
+    # Shared prefix first: system prompt, instruction, then the file's header
+    messages = [{
+        "role": "system",
+        "content": "You are an expert full-stack developer. Apply requested upgrades to the provided code."
+    }, {
+        "role": "user",
+        "content": (
+            "Apply these upgrades to the excerpt below only:\n"
+            f"{upgrade_instruction}\n\n"
+            "Respond with the whole updated excerpt, keeping its indentation:\n"
+            "File: path/to/file.ext\n"
+            "```\n<updated excerpt>\n```"
+        )
+    }]
+    if header:
+        messages.append({
+            "role": "user",
+            "content": f"Context from {fname} (imports and signatures, for reference only):\n\n{header}"
+        })
+    if chunk is not None:
+        messages.append({"role": "user", "content": f"File: {fname} ({chunk.name})\n\n{chunk.text}"})
+    return messages
+
+def _upgrade_chunk(
+    fname: str,
+    header: str,
+    chunk,
+    upgrade_instruction: str,
+    provider: str,
+    model: str,
+    temperature: float
+) -> Optional[str]:
+    """Upgrade one chunk; returns None when the reply is missing or invalid"""
+    messages = _chunk_messages(fname, header, chunk, upgrade_instruction)
+    output = chat_completion(
+        get_client(provider),
+        messages,
+        provider=provider,
+        model=model,
+        temperature=temperature,
+        max_tokens=completion_budget(count_message_tokens(messages, model), model)
+    )
+    parser = FileBlockParser(strip=False)
+    blocks = parser.feed(output) + parser.close()
     if not blocks:
-        logging.warning("⚠️ No code blocks found. Trying fallback parsing.")
-        # Fallback: Look for FILE: headers
-        current_file = None
-        current_content = []
-        
-        for line in gpt_output.split('\n'):
-            if line.startswith("File:") or line.startswith("FILE:"):
-                if current_file:
-                    result[current_file] = '\n'.join(current_content).strip()
-                    current_content = []
-                current_file = line.split(":", 1)[1].strip()
-            elif current_file:
-                current_content.append(line)
-                
-        if current_file and current_content:
-            result[current_file] = '\n'.join(current_content).strip()
-    else:
-        for fname, content in blocks:
-            fname = fname.strip()
-            result[fname] = content.strip()
+        logging.warning(f"⚠️ No code returned for {fname} {chunk.name}. Keeping original.")
+        return None
+    updated = blocks[0][1]
+    if fname.endswith(".py") and not _chunk_parses(chunk.text, updated):
+        logging.warning(f"⚠️ Upgraded {fname} {chunk.name} doesn't parse. Keeping original.")
+        return None
+    return updated
+
+def _chunk_parses(original: str, updated: str) -> bool:
+    """Excerpts that parsed on their own must still parse after the upgrade"""
+    try:
+        ast.parse(textwrap.dedent(original))
+    except SyntaxError:
+        return True  # Can't be checked in isolation; the stitched file is
+    try:
+        ast.parse(textwrap.dedent(updated))
+        return True
+    except SyntaxError:
+        return False
+
+def apply_edit_response(
+    gpt_output: str,
+    original_files: Dict[str, str],
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3
+) -> Dict[str, str]:
+    """
+    Apply SEARCH/REPLACE (or unified diff) hunks from GPT output.
+    Hunks whose context can't be found are re-requested one at a time.
+    Files without edits are returned unchanged.
+    """
+    result = dict(original_files)
+    edits = parse_edits(gpt_output)
+    if not edits:
+        logging.warning("⚠️ No edit blocks found. Keeping originals.")
+
+    for fname, hunks in edits.items():
+        try:
+            fname = _match_path(fname, original_files)
+        except ValueError as e:
+            logging.warning(f"⚠️ Skipping edits: {e}")
+            continue
+        original = original_files.get(fname, "")
+        updated, failed = apply_hunks(original, hunks)
+        for hunk in failed:
+            updated = _retry_hunk(fname, updated, hunk, provider, model, temperature)
+        result[fname] = updated
+        if updated != original:
+            log_edit(fname, updated)
+    return result
+
+def _retry_hunk(
+    fname: str,
+    content: str,
+    hunk,
+    provider: str,
+    model: str,
+    temperature: float
+) -> str:
+    """Ask the model to redo a single hunk that didn't apply"""
+    for attempt in range(MAX_HUNK_RETRIES):
+        messages = [
+            {"role": "system", "content": "You are an expert full-stack developer. Fix edits that failed to apply."},
+            {"role": "user", "content": (
+                "The edit at the end could not be applied because its SEARCH lines don't match the file.\n"
+                "Return a single corrected block that makes the same change.\n"
+                f"{EDIT_FORMAT_INSTRUCTIONS}"
+            )},
+            {"role": "user", "content": f"File: {fname}\n\n{content}"},
+            {"role": "user", "content": format_hunk(fname, hunk)}
+        ]
+        output = chat_completion(
+            get_client(provider),
+            messages,
+            provider=provider,
+            model=model,
+            temperature=temperature,
+            max_tokens=completion_budget(count_message_tokens(messages, model), model)
+        )
+        retried = [h for hunks in parse_edits(output).values() for h in hunks]
+        updated, failed = apply_hunks(content, retried)
+        if retried and not failed:
+            return updated
+    logging.warning(f"⚠️ Dropping an edit to {fname} that could not be applied")
+    return content
+
+def _match_path(fname: str, files: Dict[str, str]) -> str:
+    """
+    Map a path as echoed by the model onto the caller's key for that file,
+    matching whole trailing path components. Raises ValueError when the
+    echoed path fits more than one file.
+    """
+    if fname in files:
+        return fname
+    normalized = fname.replace("\\", "/")
+    while normalized.startswith("./"):
+        normalized = normalized[2:]
+    matches = [
+        known for known in files
+        if known.replace("\\", "/") == normalized or known.replace("\\", "/").endswith("/" + normalized)
+    ]
+    if len(matches) > 1:
+        raise ValueError(f"{fname} matches several files: {', '.join(sorted(matches))}")
+    return matches[0] if matches else fname
+
+def validate_and_repair(
+    updated: Dict[str, str],
+    original_files: Dict[str, str],
+    upgrade_instruction: str,
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    max_rounds: int = MAX_REPAIR_ROUNDS
+) -> Dict[str, str]:
+    """
+    Syntax-check upgraded files before anything is written. Only the files
+    that broke are sent back, each with its own error, for at most
+    `max_rounds` rounds; files still invalid after that keep their original.
+    """
+    result = dict(updated)
+    changed = {fname: content for fname, content in result.items() if content != original_files.get(fname)}
+    errors = validate_files(changed)
+    # Don't blame the upgrade for errors the original already had
+    preexisting = validate_files({fname: original_files[fname] for fname in errors if fname in original_files})
+    errors = {fname: error for fname, error in errors.items() if fname not in preexisting}
+
+    for attempt in range(max_rounds):
+        if not errors:
+            break
+        logging.warning(f"🩹 Repairing {len(errors)} invalid files (attempt {attempt + 1}/{max_rounds})")
+        with ContextThreadPoolExecutor(max_workers=min(DEFAULT_CONCURRENCY, len(errors))) as pool:
+            futures = {
+                fname: pool.submit(
+                    _repair_file, fname, result[fname], error, upgrade_instruction, provider, model, temperature
+                )
+                for fname, error in errors.items()
+            }
+        for fname, future in futures.items():
+            repaired = future.result()
+            if repaired is not None:
+                result[fname] = repaired
+        errors = validate_files({fname: result[fname] for fname in errors})
+
+    for fname, error in errors.items():
+        logging.error(f"❌ {fname} is still invalid ({error}). Keeping original.")
+        if fname in original_files:
+            result[fname] = original_files[fname]
+        else:
+            del result[fname]
+    return result
+
+def _repair_file(
+    fname: str,
+    content: str,
+    error: str,
+    upgrade_instruction: str,
+    provider: str,
+    model: str,
+    temperature: float
+) -> Optional[str]:
+    """Ask for a fix of one invalid file, quoting its error; None if no usable reply"""
+    messages = [
+        {"role": "system", "content": "You are an expert full-stack developer. Fix files that fail to parse."},
+        {"role": "user", "content": (
+            "This file was upgraded with the instruction below and no longer parses.\n"
+            f"{upgrade_instruction}\n\n"
+            "Fix the reported error while keeping the upgrade. Respond with the whole file:\n"
+            "File: path/to/file.ext\n"
+            "```\n<fixed code>\n```"
+        )},
+        {"role": "user", "content": f"File: {fname}\n\n{content}"},
+        {"role": "user", "content": f"Error: {error}"}
+    ]
+    try:
+        output = chat_completion(
+            get_client(provider),
+            messages,
+            provider=provider,
+            model=model,
+            temperature=temperature,
+            max_tokens=completion_budget(count_message_tokens(messages, model), model)
+        )
+    except Exception as e:
+        logging.error(f"❌ Repair request for {fname} failed: {e}")
+        return None
+    blocks = dict(parse_file_blocks(output))
+    if not blocks:
+        return None
+    return blocks.get(fname) or next(iter(blocks.values()))
+
+def upgrade_code_streaming(
+    files: Dict[str, str],
+    upgrade_instruction: str,
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    on_file: Optional[Callable[[str, str], None]] = None,
+    context: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    """
+    Streaming variant of upgrade_code, always with whole-file responses.
+    Each file is validated (and repaired, or kept as it was) as soon as its
+    block closes in the response, then handed to `on_file(path, content)`,
+    e.g. `lambda p, c: write_code({p: c})`.
+    `context` holds reference-only files, as for upgrade_code.
+    Returns the same {file_path: content} dict as upgrade_code.
+    """
+    if not files:
+        logging.error("❌ No files to upgrade")
+        return {}
+
+    if not upgrade_instruction.strip():
+        logging.error("❌ Empty upgrade instruction")
+        return files
+
+    context = _fit_context(context, files, model)
+    result = {}
+
+    def _emit(fname: str, content: str) -> None:
+        checked = validate_and_repair({fname: content}, files, upgrade_instruction, provider, model, temperature)
+        if fname in checked:  # A new file that never validated is dropped
+            _emit_file(fname, checked[fname], result, on_file)
+
+    overhead = count_message_tokens(_build_messages({}, upgrade_instruction, context=context), model)
+    for batch in _batch_files(files, upgrade_instruction, model, context=context):
+        if len(batch) == 1:
+            fname, content = next(iter(batch.items()))
+            if not fits_in_request(fname, content, model, overhead, _output_ratio("whole")):
+                # Too big to stream whole: upgrade chunk by chunk, emit when stitched
+                upgraded = upgrade_large_file(fname, content, upgrade_instruction, provider, model, temperature)
+                _emit_file(fname, upgraded, result, on_file)
+                continue
+        messages = _build_messages(batch, upgrade_instruction, context=context)
+        prompt_tokens = count_message_tokens(messages, model)
+        parser = FileBlockParser()
+        try:
+            chunks = stream_chat_completion(
+                get_client(provider),
+                messages,
+                provider=provider,
+                model=model,
+                temperature=temperature,
+                max_tokens=completion_budget(prompt_tokens, model)
+            )
+            for chunk in chunks:
+                for fname, content in parser.feed(chunk):
+                    _emit(fname, content)
+            for fname, content in parser.close():
+                _emit(fname, content)
+        except Exception:
+            logging.exception(f"❌ Error from {provider} API")
+            raise
+
+        for fname in batch:
+            if fname not in result:
+                logging.warning(f"⚠️ No update found for {fname}. Keeping original.")
+                result[fname] = batch[fname]
+    return result
+
+def _emit_file(
+    fname: str,
+    content: str,
+    result: Dict[str, str],
+    on_file: Optional[Callable[[str, str], None]]
+) -> None:
+    """Record a streamed file and pass it to the caller right away"""
+    result[fname] = content
+    log_edit(fname, content)
+    if on_file:
+        on_file(fname, content)
+
+def parse_response(gpt_output: str, original_files: Dict[str, str]) -> Dict[str, str]:
+    """
+    Extract new code blocks from GPT output in a single pass
+    """
+    result = dict(parse_file_blocks(gpt_output))
+    if not result:
+        logging.warning("⚠️ No code blocks found in response.")
 
     # Add files that weren't modified
     for fname in original_files:
@@ -195,16 +844,211 @@ def parse_response(gpt_output: str, original_files: Dict[str, str]) -> Dict[str,
 
     return result
 
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def build_batch_requests(
+    files: Dict[str, str],
+    upgrade_instruction: str,
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    files_per_request: int = 0
+) -> List[Tuple[str, Dict[str, str], Dict]]:
+    """
+    Turn files into batch API request lines, one per packed batch.
+    Returns (custom_id, files, request) triples. Files too large for a
+    single request are left out; upgrade those interactively.
+    """
+    requests = []
+    for index, batch in enumerate(_batch_files(files, upgrade_instruction, model, files_per_request)):
+        if len(batch) == 1:
+            fname, content = next(iter(batch.items()))
+            overhead = count_message_tokens(_build_messages({}, upgrade_instruction), model)
+            if not fits_in_request(fname, content, model, overhead, OUTPUT_RATIO):
+                logging.warning(f"⚠️ {fname} is too large for a batch request. Skipping.")
+                continue
+        messages = _build_messages(batch, upgrade_instruction)
+        custom_id = f"upgrade-{index}"
+        requests.append((custom_id, batch, {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": completion_budget(count_message_tokens(messages, model), model),
+            },
+        }))
+    return requests
+
+def batch_upgrade(
+    path: str,
+    upgrade_instruction: str,
+    backend: BatchBackend,
+    provider: str = "OpenAI",
+    model: str = "gpt-4-turbo",
+    temperature: float = 0.3,
+    files_per_request: int = 0
+) -> Optional[List[str]]:
+    """
+    Offline upgrade through a batch backend. Each call moves the job one
+    step: submit it, check on it, or apply its results. Job state lives in
+    SQLite, so a crashed or repeated run picks up where the last one left
+    off. Returns the paths written, or None while the batch is still running.
+    """
+    job = find_open_job(path, upgrade_instruction, provider, model, backend.name)
+    if job is None:
+        files = read_code(path)
+        if not files:
+            logging.error("❌ No files to process.")
+            return []
+        requests = build_batch_requests(files, upgrade_instruction, model, temperature, files_per_request)
+        job_id = uuid.uuid4().hex
+        input_file = os.path.join(BATCH_DIR, f"{job_id}.jsonl")
+        os.makedirs(BATCH_DIR, exist_ok=True)
+        with open(input_file, "w", encoding="utf-8") as f:
+            for _, _, request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        items = [
+            (custom_id, fname, _content_hash(content))
+            for custom_id, batch, _ in requests
+            for fname, content in batch.items()
+        ]
+        create_job(job_id, backend.name, path, upgrade_instruction, provider, model, input_file, items)
+        job = get_job(job_id)
+        logging.info(f"📝 Created batch job {job_id} with {len(requests)} requests")
+
+    if not job["remote_id"]:
+        # A run that died between submit() and update_job() left the job
+        # "submitting": look for its batch before sending another one
+        remote_id = backend.find(job["id"]) if job["status"] == "submitting" else None
+        if remote_id is None:
+            update_job(job["id"], status="submitting")
+            remote_id = backend.submit(job["input_file"], job["id"])
+        update_job(job["id"], status="submitted", remote_id=remote_id)
+        job = get_job(job["id"])
+        logging.info(f"📤 Submitted batch job {job['id']} to {backend.name} as {remote_id}")
+
+    status = backend.status(job["remote_id"])
+    if status == FAILED:
+        update_job(job["id"], status="failed")
+        logging.error(f"❌ Batch job {job['id']} failed on {backend.name}")
+        return []
+    if status != COMPLETED:
+        logging.info(f"⏳ Batch job {job['id']} is still running")
+        return None
+    return apply_batch_results(job, backend)
+
+def apply_batch_results(job: Dict, backend: BatchBackend) -> List[str]:
+    """
+    Parse, validate and write every result not applied yet. Files that
+    changed on disk since the batch was built are skipped rather than
+    overwritten; results that don't validate are not written.
+    """
+    pending = pending_items(job["id"])
+    written = []
+    for custom_id, output in backend.results(job["remote_id"]):
+        items = pending.pop(custom_id, None)
+        if items is None:
+            continue  # Applied by an earlier run
+        if output is None:
+            mark_item(job["id"], custom_id, "failed")
+            continue
+
+        originals = {fname: read_file(fname) for fname, _ in items if os.path.exists(fname)}
+        updated = parse_response(output, originals)
+        # Same checks as an interactive run, but no repair requests for an offline batch
+        checked = validate_and_repair(updated, originals, job["instruction"], job["provider"], job["model"], max_rounds=0)
+        for fname, original_hash in items:
+            content = checked.get(fname)
+            current = originals.get(fname)
+            if content is None or current is None or content != updated.get(fname):
+                mark_item(job["id"], custom_id, "failed", fname)
+            elif current == content:
+                mark_item(job["id"], custom_id, "applied", fname)  # Unchanged, or written before a crash
+            elif _content_hash(current) != original_hash:
+                logging.warning(f"⚠️ {fname} changed since the batch was submitted. Skipping.")
+                mark_item(job["id"], custom_id, "skipped", fname)
+            else:
+                write_code({fname: content})
+                mark_item(job["id"], custom_id, "applied", fname)
+                written.append(fname)
+
+    for custom_id in pending:
+        logging.warning(f"⚠️ No result for batch request {custom_id}")
+        mark_item(job["id"], custom_id, "failed")
+    update_job(job["id"], status="applied")
+    logging.info(f"✅ Batch job {job['id']} applied: {item_counts(job['id'])}")
+    return written
+
+def _log_usage() -> None:
+    summary = run_summary()
+    if summary["requests"]:
+        logging.info(f"📊 {format_summary(summary)}")
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Upgrade code files using AI.")
-    parser.add_argument("--path", required=True, help="Path to file or directory")
-    parser.add_argument("--upgrade", required=True, help="Upgrade instruction")
+    parser.add_argument("--path", help="Path to file or directory")
+    parser.add_argument("--upgrade", help="Upgrade instruction")
+    parser.add_argument("--manifest",
+                        help="JSON/JSONL list of {path, instruction[, model, provider]} jobs to run resumably")
+    parser.add_argument("--run-id",
+                        help="With --manifest, checkpoint under this id instead of the manifest's hash")
+    parser.add_argument("--restart", action="store_true",
+                        help="With --manifest, clear the run's checkpoints and process every file again")
     parser.add_argument("--provider", default="OpenAI", help="AI provider (OpenAI or DeepSeek)")
     parser.add_argument("--model", default="gpt-4-turbo", help="Model to use")
-    return parser.parse_args()
+    parser.add_argument("--fan-out", action="store_true",
+                        help="Send files in separate concurrent requests instead of one")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum concurrent requests in fan-out mode")
+    parser.add_argument("--files-per-request", type=int, default=1,
+                        help="Files grouped into each request in fan-out mode")
+    parser.add_argument("--include-large", action="store_true",
+                        help="Also upgrade files above MAX_FILE_SIZE, chunk by chunk")
+    parser.add_argument("--max-memory", type=int, default=0,
+                        help="Read files lazily and cap buffered content at this many MB")
+    parser.add_argument("--edit-format", choices=EDIT_FORMATS, default="whole",
+                        help="Have the model return whole files or SEARCH/REPLACE hunks")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream the response and write each file as soon as it arrives")
+    parser.add_argument("--target", metavar="FILE_OR_SYMBOL",
+                        help="Upgrade only this file or symbol, sending its import closure as reference")
+    parser.add_argument("--context-depth", type=int, default=DEFAULT_DEPTH,
+                        help="Import hops to follow from --target")
+    parser.add_argument("--top-k", type=int, default=0,
+                        help="Only upgrade the K files most relevant to the instruction (BM25 over the project)")
+    parser.add_argument("--batch", choices=sorted(BATCH_BACKENDS),
+                        help="Upgrade offline through a batch backend; rerun the same command to collect results")
+    parser.add_argument("--batch-echo", action="store_true",
+                        help="With --batch local, answer with the files unchanged instead of calling the provider")
+    parser.add_argument("--hedge", metavar="PROVIDER:MODEL",
+                        help="Duplicate slow or failing requests to this provider (e.g. DeepSeek:deepseek-coder)")
+    parser.add_argument("--hedge-percentile", type=float, default=DEFAULT_PERCENTILE,
+                        help="Hedge once the primary is slower to first token than this latency percentile")
+    args = parser.parse_args()
+    if not args.manifest and not (args.path and args.upgrade):
+        parser.error("--path and --upgrade are required unless --manifest is given")
+    if args.stream:
+        # Streaming sends whole-file requests one batch at a time
+        conflicts = [
+            flag for flag, given in (
+                ("--edit-format diff", args.edit_format == "diff"),
+                ("--fan-out", args.fan_out),
+                ("--concurrency", args.concurrency != DEFAULT_CONCURRENCY),
+                ("--max-memory", args.max_memory),
+                ("--batch", args.batch),
+                ("--manifest", args.manifest),
+            ) if given
+        ]
+        if conflicts:
+            parser.error(f"--stream can't be combined with {', '.join(conflicts)}")
+    return args
 
 if __name__ == "__main__":
     args = parse_args()
+    atexit.register(_log_usage)
 
     if not os.getenv("OPENAI_API_KEY") and args.provider == "OpenAI":
         logging.error("❌ OPENAI_API_KEY environment variable not set.")
@@ -213,19 +1057,97 @@ if __name__ == "__main__":
         logging.error("❌ DEEPSEEK_API_KEY environment variable not set.")
         exit(1)
 
-    files = read_code(args.path)
+    if args.hedge:
+        hedge_provider, _, hedge_model = args.hedge.partition(":")
+        if not hedge_model:
+            logging.error("❌ --hedge expects PROVIDER:MODEL")
+            exit(1)
+        enable_hedging(args.provider, hedge_provider, hedge_model, percentile=args.hedge_percentile)
+        logging.info(f"🪁 Hedging {args.provider} requests with {hedge_provider}/{hedge_model}")
+
+    if args.manifest:
+        from backend.batch_runner import run_manifest  # Imports this module
+        counts = run_manifest(args.manifest, max_workers=args.concurrency, run_id=args.run_id, restart=args.restart)
+        exit(1 if counts.get("failed") else 0)
+
+    if args.batch:
+        backend_options = {"provider": args.provider}
+        if args.batch == "local" and args.batch_echo:
+            backend_options = {"respond": echo_responder}
+        elif args.batch == "local":
+            # Work the batch through on this machine, one request at a time
+            backend_options = {"respond": lambda body: chat_completion(
+                get_client(args.provider), body["messages"], provider=args.provider, model=body["model"],
+                temperature=body["temperature"], max_tokens=body["max_tokens"]
+            )}
+        written = batch_upgrade(
+            args.path,
+            args.upgrade,
+            BATCH_BACKENDS[args.batch](**backend_options),
+            provider=args.provider,
+            model=args.model,
+            files_per_request=args.files_per_request if args.fan_out else 0
+        )
+        if written is None:
+            logging.info("⏳ Run the same command again to collect the results")
+        exit(0 if written is None or written else 1)
+
+    if args.max_memory:
+        written = upgrade_path(
+            args.path,
+            args.upgrade,
+            provider=args.provider,
+            model=args.model,
+            max_workers=args.concurrency if args.fan_out else 1,
+            files_per_request=args.files_per_request if args.fan_out else 0,
+            max_resident_bytes=args.max_memory * 1024 * 1024,
+            edit_format=args.edit_format,
+            include_large=args.include_large
+        )
+        exit(0 if written else 1)
+
+    context = None
+    if args.target:
+        files, context = read_targeted(args.path, args.target, max_depth=args.context_depth)
+    else:
+        files = read_code(args.path, include_large=args.include_large)
+        files = select_relevant(files, args.path, args.upgrade, args.top_k)
     if not files:
         logging.error("❌ No files to process. Exiting.")
         exit(1)
         
-    updated_files = upgrade_code(
-        files, 
-        args.upgrade,
-        provider=args.provider,
-        model=args.model
-    )
+    if args.stream:
+        updated_files = upgrade_code_streaming(
+            files,
+            args.upgrade,
+            provider=args.provider,
+            model=args.model,
+            on_file=lambda fname, content: write_code({fname: content}),
+            context=context
+        )
+    elif args.fan_out:
+        updated_files = upgrade_code_concurrent(
+            files,
+            args.upgrade,
+            provider=args.provider,
+            model=args.model,
+            max_workers=args.concurrency,
+            files_per_request=args.files_per_request,
+            edit_format=args.edit_format,
+            context=context
+        )
+    else:
+        updated_files = upgrade_code(
+            files, 
+            args.upgrade,
+            provider=args.provider,
+            model=args.model,
+            edit_format=args.edit_format,
+            context=context
+        )
     if updated_files:
-        write_code(updated_files)
+        if not args.stream:  # Streamed files were written as they arrived
+            write_code(updated_files)
         logging.info("✅ Upgrade completed successfully")
     else:
         logging.error("❌ Upgrade failed. No changes made.")
\ No newline at end of file
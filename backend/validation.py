@@ -0,0 +1,261 @@
+# backend/validation.py
+
+import os
+import json
+import atexit
+import shutil
+import logging
+import tempfile
+import subprocess
+import threading
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Content -> error message, or None when the content is valid
+Validator = Callable[[str], Optional[str]]
+
+# Below this many files the pool costs more than it saves
+POOL_MIN_FILES = 8
+NODE_TIMEOUT = 10  # seconds
+VOID_TAGS = frozenset(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+
+
+def validate_python(content: str) -> Optional[str]:
+    try:
+        compile(content, "<upgraded>", "exec")
+    except SyntaxError as e:
+        return f"line {e.lineno}: {e.msg}"
+    except ValueError as e:  # e.g. null bytes
+        return str(e)
+    return None
+
+
+def validate_json(content: str) -> Optional[str]:
+    try:
+        json.loads(content)
+    except json.JSONDecodeError as e:
+        return f"line {e.lineno}: {e.msg}"
+    return None
+
+
+class _TagBalance(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.stack = []
+        self.error = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, self.getpos()[0]))
+
+    def handle_endtag(self, tag):
+        if self.error or tag in VOID_TAGS:
+            return
+        # Browsers auto-close <p>, <li> and friends; only flag tags never opened
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                del self.stack[index:]
+                return
+        self.error = f"line {self.getpos()[0]}: closing </{tag}> without an opening tag"
+
+
+def validate_html(content: str) -> Optional[str]:
+    parser = _TagBalance()
+    parser.feed(content)
+    parser.close()
+    if parser.error:
+        return parser.error
+    for tag, line in parser.stack:
+        if tag in ("html", "head", "body", "div", "script", "style", "table", "form", "section"):
+            return f"line {line}: <{tag}> is never closed"
+    return None
+
+
+def validate_js(content: str) -> Optional[str]:
+    """`node --check` when Node is installed, otherwise a bracket balance scan"""
+    node = shutil.which("node")
+    if node:
+        with tempfile.NamedTemporaryFile("w", suffix=".js", delete=False, encoding="utf-8") as f:
+            f.write(content)
+        try:
+            result = subprocess.run(
+                [node, "--check", f.name], capture_output=True, text=True, timeout=NODE_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            return None
+        finally:
+            os.unlink(f.name)
+        if result.returncode != 0:
+            lines = [line for line in result.stderr.splitlines() if "Error" in line]
+            return lines[0].strip() if lines else result.stderr.strip()[:200]
+        return None
+    return check_brackets(content)
+
+
+# After these a `/` starts a regex literal rather than a division
+_REGEX_PRECEDERS = frozenset("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = frozenset(("return", "typeof", "case", "in", "of", "delete", "void", "throw", "new", "yield", "await"))
+
+
+def check_brackets(content: str) -> Optional[str]:
+    """Unbalanced (), [] or {} outside strings, comments and regex literals, for JS/TS"""
+    return _scan_brackets(content, js=True)
+
+
+def check_css(content: str) -> Optional[str]:
+    """Unbalanced (), [] or {} outside strings and /* */ comments"""
+    return _scan_brackets(content, js=False)
+
+
+def _scan_brackets(content: str, js: bool) -> Optional[str]:
+    pairs = {")": "(", "]": "[", "}": "{"}
+    quotes = "'\"`" if js else "'\""
+    stack = []
+    i, line, length = 0, 1, len(content)
+    prev = ""  # last significant character, for telling regexes from division
+    word_start = 0
+    while i < length:
+        ch = content[i]
+        if ch == "\n":
+            line += 1
+        elif ch in quotes:
+            i += 1
+            while i < length and content[i] != ch:
+                if content[i] == "\\":
+                    i += 1
+                elif content[i] == "\n":
+                    line += 1
+                    if ch != "`":
+                        break
+                i += 1
+            prev = ch
+        elif content.startswith("/*", i):
+            end = content.find("*/", i + 2)
+            end = length if end == -1 else end + 2
+            line += content.count("\n", i, end)
+            i = end
+            continue
+        elif js and content.startswith("//", i):
+            while i < length and content[i] != "\n":
+                i += 1
+            continue
+        elif js and ch == "/" and _starts_regex(content, i, prev, word_start):
+            i += 1
+            in_class = False
+            while i < length and content[i] != "\n":
+                if content[i] == "\\":
+                    i += 1
+                elif content[i] == "[":
+                    in_class = True
+                elif content[i] == "]":
+                    in_class = False
+                elif content[i] == "/" and not in_class:
+                    break
+                i += 1
+            prev = "/"
+        elif ch in "([{":
+            stack.append((ch, line))
+            prev = ch
+        elif ch in pairs:
+            if not stack or stack[-1][0] != pairs[ch]:
+                return f"line {line}: unexpected '{ch}'"
+            stack.pop()
+            prev = ch
+        elif not ch.isspace():
+            if (ch.isalnum() or ch in "_$") and not (prev.isalnum() or prev in "_$"):
+                word_start = i
+            prev = ch
+        i += 1
+    if stack:
+        ch, opened = stack[-1]
+        return f"line {opened}: '{ch}' is never closed"
+    return None
+
+
+def _starts_regex(content: str, i: int, prev: str, word_start: int) -> bool:
+    if not prev or prev in _REGEX_PRECEDERS:
+        return True
+    if prev.isalnum() or prev in "_$":
+        # `return /x/` is a regex, `total / count` is division
+        return content[word_start:i].strip() in _REGEX_KEYWORDS
+    return False
+
+
+VALIDATORS: Dict[str, Validator] = {
+    ".py": validate_python,
+    ".json": validate_json,
+    ".html": validate_html,
+    ".htm": validate_html,
+    ".js": validate_js,
+    ".ts": check_brackets,
+    ".css": check_css,
+}
+
+
+def register_validator(extension: str, validator: Validator) -> None:
+    """
+    Use `validator` for files ending in `extension`. It must be a
+    module-level function so worker processes can unpickle it.
+    """
+    VALIDATORS[extension] = validator
+
+
+def validate_content(fname: str, content: str) -> Optional[str]:
+    """Error for one file, or None if it's valid or has no validator"""
+    validator = next((v for ext, v in VALIDATORS.items() if fname.endswith(ext)), None)
+    if validator is None:
+        return None
+    try:
+        return validator(content)
+    except Exception as e:
+        logger.debug("Validator for %s crashed", fname, exc_info=True)
+        return f"validator error: {e}"
+
+
+def _validate_item(item):
+    fname, content = item
+    return fname, validate_content(fname, content)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+            atexit.register(_pool.shutdown, wait=False)
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def validate_files(files: Dict[str, str]) -> Dict[str, str]:
+    """
+    Validate every file, in a process pool for larger sets.
+    Returns {file_path: error} for the files that failed.
+    """
+    items = list(files.items())
+    if len(items) < POOL_MIN_FILES:
+        results = map(_validate_item, items)
+    else:
+        try:
+            results = list(_get_pool().map(_validate_item, items, chunksize=max(1, len(items) // 32)))
+        except Exception as e:  # e.g. a broken pool or an unpicklable validator
+            logger.warning("Validation pool failed (%s); validating in-process", e)
+            _reset_pool()
+            results = map(_validate_item, items)
+    return {fname: error for fname, error in results if error}
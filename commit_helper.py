@@ -1,9 +1,10 @@
-import subprocess, openai, os
+import subprocess, openai
 from dotenv import load_dotenv
 import re
 
+from backend.llm_client import chat_completion, get_client
+
 load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def get_git_diff():
     """Get staged git diff with error handling"""
@@ -38,13 +39,13 @@ def generate_commit_message(diff):
     """
     
     try:
-        res = client.chat.completions.create(
+        message = chat_completion(
+            get_client(),
+            [{"role": "user", "content": prompt}],
             model="gpt-4-turbo",
-            messages=[{"role": "user", "content": prompt}],
             temperature=0.3,
             max_tokens=100
-        )
-        message = res.choices[0].message.content.strip()
+        ).strip()
         # Clean up message
         message = re.sub(r'^"|"$', '', message)  # Remove quotes
         return message[:72]  # Git commit message line length limit
@@ -1,31 +1,15 @@
 import openai
-import os
 from dotenv import load_dotenv
 from pathlib import Path
-import re
+
+from backend.llm_client import chat_completion, get_client
+from backend.response_parser import parse_file_blocks
 
 load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def parse_project_structure(response):
     """Parse GPT response into file structure"""
-    files = {}
-    current_file = None
-    current_content = []
-    
-    for line in response.split('\n'):
-        if line.startswith("FILE:"):
-            if current_file:
-                files[current_file] = '\n'.join(current_content).strip()
-                current_content = []
-            current_file = line.split("FILE:")[1].strip()
-        elif current_file:
-            current_content.append(line)
-    
-    if current_file and current_content:
-        files[current_file] = '\n'.join(current_content).strip()
-    
-    return files
+    return dict(parse_file_blocks(response))
 
 def generate_project(prompt):
     """Generate project with enhanced prompt and parsing"""
@@ -51,16 +35,16 @@ def generate_project(prompt):
     """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
+        project = chat_completion(
+            get_client(),
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": f"Project spec:\n\n{prompt}"}
             ],
+            model="gpt-4-turbo",
             temperature=0.3,
             max_tokens=3000
         )
-        project = response.choices[0].message.content
         files = parse_project_structure(project)
         
         if not files:
@@ -0,0 +1,127 @@
+import sqlite3
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from memory.database import DB_PATH
+
+BATCH_DIR = os.path.join(os.path.dirname(__file__), 'batches')
+
+# Job lifecycle: created -> submitting -> submitted -> applied | failed
+OPEN_STATUSES = ("created", "submitting", "submitted")
+
+
+def _connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('''CREATE TABLE IF NOT EXISTS batch_jobs (
+        id TEXT PRIMARY KEY,
+        backend TEXT NOT NULL,
+        remote_id TEXT,
+        path TEXT NOT NULL,
+        instruction TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        model TEXT NOT NULL,
+        input_file TEXT NOT NULL,
+        status TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS batch_items (
+        job_id TEXT NOT NULL,
+        custom_id TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        original_hash TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        PRIMARY KEY (job_id, custom_id, file_path),
+        FOREIGN KEY (job_id) REFERENCES batch_jobs (id)
+    )''')
+    return conn
+
+
+def create_job(job_id, backend, path, instruction, provider, model, input_file, items, db_path=DB_PATH):
+    """Record a new job; items are (custom_id, file_path, original_hash)"""
+    now = time.time()
+    conn = _connect(db_path)
+    with conn:
+        conn.execute(
+            "INSERT INTO batch_jobs VALUES (?, ?, NULL, ?, ?, ?, ?, ?, 'created', ?, ?)",
+            (job_id, backend, path, instruction, provider, model, input_file, now, now)
+        )
+        conn.executemany(
+            "INSERT INTO batch_items (job_id, custom_id, file_path, original_hash) VALUES (?, ?, ?, ?)",
+            [(job_id, custom_id, fname, digest) for custom_id, fname, digest in items]
+        )
+    conn.close()
+
+
+def get_job(job_id, db_path=DB_PATH) -> Optional[Dict]:
+    conn = _connect(db_path)
+    row = conn.execute("SELECT * FROM batch_jobs WHERE id=?", (job_id,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def find_open_job(path, instruction, provider, model, backend, db_path=DB_PATH) -> Optional[Dict]:
+    """The most recent unfinished job for the same upgrade, if any"""
+    conn = _connect(db_path)
+    row = conn.execute(
+        f"""SELECT * FROM batch_jobs
+            WHERE path=? AND instruction=? AND provider=? AND model=? AND backend=?
+              AND status IN ({', '.join('?' * len(OPEN_STATUSES))})
+            ORDER BY created_at DESC LIMIT 1""",
+        (path, instruction, provider, model, backend, *OPEN_STATUSES)
+    ).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
+def update_job(job_id, status=None, remote_id=None, db_path=DB_PATH):
+    conn = _connect(db_path)
+    with conn:
+        if remote_id is not None:
+            conn.execute("UPDATE batch_jobs SET remote_id=? WHERE id=?", (remote_id, job_id))
+        if status is not None:
+            conn.execute("UPDATE batch_jobs SET status=? WHERE id=?", (status, job_id))
+        conn.execute("UPDATE batch_jobs SET updated_at=? WHERE id=?", (time.time(), job_id))
+    conn.close()
+
+
+def pending_items(job_id, db_path=DB_PATH) -> Dict[str, List[Tuple[str, str]]]:
+    """{custom_id: [(file_path, original_hash)]} for requests not yet applied"""
+    conn = _connect(db_path)
+    rows = conn.execute(
+        "SELECT custom_id, file_path, original_hash FROM batch_items WHERE job_id=? AND status='pending'",
+        (job_id,)
+    ).fetchall()
+    conn.close()
+    items: Dict[str, List[Tuple[str, str]]] = {}
+    for row in rows:
+        items.setdefault(row["custom_id"], []).append((row["file_path"], row["original_hash"]))
+    return items
+
+
+def mark_item(job_id, custom_id, status, file_path=None, db_path=DB_PATH):
+    """Set the status of one file of a request, or of the whole request"""
+    conn = _connect(db_path)
+    with conn:
+        if file_path is None:
+            conn.execute(
+                "UPDATE batch_items SET status=? WHERE job_id=? AND custom_id=? AND status='pending'",
+                (status, job_id, custom_id)
+            )
+        else:
+            conn.execute(
+                "UPDATE batch_items SET status=? WHERE job_id=? AND custom_id=? AND file_path=?",
+                (status, job_id, custom_id, file_path)
+            )
+    conn.close()
+
+
+def item_counts(job_id, db_path=DB_PATH) -> Dict[str, int]:
+    conn = _connect(db_path)
+    rows = conn.execute(
+        "SELECT status, COUNT(*) FROM batch_items WHERE job_id=? GROUP BY status", (job_id,)
+    ).fetchall()
+    conn.close()
+    return {status: count for status, count in rows}
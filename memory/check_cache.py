@@ -0,0 +1,78 @@
+import sqlite3
+import json
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from memory.database import DB_PATH
+
+# (line, column, code, message)
+Violation = Tuple[int, int, str, str]
+
+
+def _connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('''CREATE TABLE IF NOT EXISTS lint_cache (
+        hash TEXT PRIMARY KEY,
+        violations TEXT NOT NULL,
+        checked_at REAL NOT NULL
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS test_cache (
+        root TEXT NOT NULL,
+        test_path TEXT NOT NULL,
+        signature TEXT NOT NULL,
+        passed INTEGER NOT NULL,
+        output TEXT NOT NULL,
+        checked_at REAL NOT NULL,
+        PRIMARY KEY (root, test_path)
+    )''')
+    return conn
+
+
+def load_lint_results(hashes: Iterable[str], db_path=DB_PATH) -> Dict[str, List[Violation]]:
+    """{content_hash: violations} for the hashes already linted"""
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    conn = _connect(db_path)
+    rows = []
+    for start in range(0, len(hashes), 500):
+        batch = hashes[start:start + 500]
+        rows.extend(conn.execute(
+            f"SELECT hash, violations FROM lint_cache WHERE hash IN ({','.join('?' * len(batch))})", batch
+        ).fetchall())
+    conn.close()
+    return {digest: [tuple(v) for v in json.loads(violations)] for digest, violations in rows}
+
+
+def save_lint_results(results: Dict[str, List[Violation]], db_path=DB_PATH) -> None:
+    if not results:
+        return
+    conn = _connect(db_path)
+    now = time.time()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO lint_cache VALUES (?, ?, ?)",
+            [(digest, json.dumps(violations), now) for digest, violations in results.items()]
+        )
+    conn.close()
+
+
+def load_test_results(root, db_path=DB_PATH) -> Dict[str, Tuple[str, bool, str]]:
+    """{test_path: (signature, passed, output)} for a project"""
+    conn = _connect(db_path)
+    rows = conn.execute(
+        "SELECT test_path, signature, passed, output FROM test_cache WHERE root=?", (root,)
+    ).fetchall()
+    conn.close()
+    return {path: (signature, bool(passed), output) for path, signature, passed, output in rows}
+
+
+def save_test_result(root, test_path, signature, passed, output, db_path=DB_PATH) -> None:
+    conn = _connect(db_path)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO test_cache VALUES (?, ?, ?, ?, ?, ?)",
+            (root, test_path, signature, int(passed), output, time.time())
+        )
+    conn.close()
+
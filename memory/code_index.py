@@ -0,0 +1,71 @@
+import sqlite3
+import json
+from typing import Dict, Iterable
+
+from memory.database import DB_PATH
+
+
+def _connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('''CREATE TABLE IF NOT EXISTS code_index (
+        root TEXT NOT NULL,
+        path TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        language TEXT NOT NULL,
+        module TEXT,
+        imports TEXT NOT NULL,
+        symbols TEXT NOT NULL,
+        PRIMARY KEY (root, path)
+    )''')
+    return conn
+
+
+def load_index(root, db_path=DB_PATH) -> Dict[str, Dict]:
+    """Every indexed file under `root`, keyed by its root-relative path"""
+    conn = _connect(db_path)
+    rows = conn.execute(
+        "SELECT path, hash, size, mtime, language, module, imports, symbols FROM code_index WHERE root=?",
+        (root,)
+    ).fetchall()
+    conn.close()
+    return {
+        path: {
+            "hash": digest,
+            "size": size,
+            "mtime": mtime,
+            "language": language,
+            "module": module,
+            "imports": json.loads(imports),
+            "symbols": json.loads(symbols),
+        }
+        for path, digest, size, mtime, language, module, imports, symbols in rows
+    }
+
+
+def save_entries(root, entries: Dict[str, Dict], db_path=DB_PATH):
+    """Insert or replace index entries for `root`"""
+    if not entries:
+        return
+    conn = _connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO code_index VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (root, path, e["hash"], e["size"], e["mtime"], e["language"], e["module"],
+                 json.dumps(e["imports"]), json.dumps(e["symbols"]))
+                for path, e in entries.items()
+            ]
+        )
+    conn.close()
+
+
+def delete_entries(root, paths: Iterable[str], db_path=DB_PATH):
+    paths = list(paths)
+    if not paths:
+        return
+    conn = _connect(db_path)
+    with conn:
+        conn.executemany("DELETE FROM code_index WHERE root=? AND path=?", [(root, p) for p in paths])
+    conn.close()
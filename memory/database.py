@@ -3,6 +3,7 @@ import os
 import json
 from datetime import datetime
 import hashlib
+from utils.ignore import walk
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'autocoder.db')
 
@@ -104,7 +105,7 @@ def hash_project(project_path):
     
     # For directories, hash the structure
     structure = []
-    for root, dirs, files in os.walk(project_path):
+    for root, dirs, files in walk(project_path):
         for file in files:
             path = os.path.join(root, file)
             structure.append(path)
@@ -0,0 +1,156 @@
+import sqlite3
+import os
+import json
+import time
+import hashlib
+import threading
+
+CACHE_DB_PATH = os.path.join(os.path.dirname(__file__), 'llm_cache.db')
+
+DEFAULT_TTL = int(os.getenv("AUTOCODER_CACHE_TTL", 7 * 24 * 3600))  # seconds
+DEFAULT_MAX_BYTES = int(os.getenv("AUTOCODER_CACHE_MAX_MB", 200)) * 1024 * 1024
+
+
+def make_cache_key(provider, model, temperature, messages, max_tokens):
+    """Content-address a chat request"""
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "messages": messages,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed LLM response cache.
+    Entries expire after `ttl` seconds; once the cache grows past
+    `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path=CACHE_DB_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialize()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _initialize(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            provider TEXT,
+            model TEXT,
+            response TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)")
+        conn.commit()
+        conn.close()
+
+    def get(self, key):
+        """Return the cached response for `key`, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key=?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    conn.execute("UPDATE responses SET last_access=? WHERE key=?", (now, key))
+                    conn.commit()
+                    self.hits += 1
+                    return row[0]
+                if row:
+                    conn.execute("DELETE FROM responses WHERE key=?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            finally:
+                conn.close()
+
+    def put(self, key, response, provider=None, model=None):
+        """Store a response and evict expired / least recently used entries"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, provider, model, response, size, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, provider, model, response, size, now, now)
+                )
+                self._evict(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key=?", stale)
+
+    def clear(self):
+        """Drop every cached response"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses")
+            conn.commit()
+            conn.close()
+
+    def stats(self):
+        """Return hit/miss counters for this process plus the cache's size"""
+        conn = self._connect()
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        conn.close()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache instance"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,170 @@
+import sqlite3
+import os
+from typing import Dict, Iterable, List, Tuple
+
+RETRIEVAL_DB_PATH = os.path.join(os.path.dirname(__file__), 'retrieval.db')
+
+
+def _connect(db_path=RETRIEVAL_DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute('''CREATE TABLE IF NOT EXISTS indexed_files (
+        root TEXT NOT NULL,
+        path TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        PRIMARY KEY (root, path)
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS chunks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        root TEXT NOT NULL,
+        path TEXT NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL,
+        name TEXT,
+        length INTEGER NOT NULL
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS postings (
+        root TEXT NOT NULL,
+        term TEXT NOT NULL,
+        chunk_id INTEGER NOT NULL,
+        tf INTEGER NOT NULL
+    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS term_stats (
+        root TEXT NOT NULL,
+        term TEXT NOT NULL,
+        df INTEGER NOT NULL,
+        PRIMARY KEY (root, term)
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_path ON chunks (root, path)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_term ON postings (root, term)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings (chunk_id)")
+    return conn
+
+
+def load_files(root, db_path=RETRIEVAL_DB_PATH) -> Dict[str, Tuple[str, int, float]]:
+    """{path: (hash, size, mtime)} for every indexed file under `root`"""
+    conn = _connect(db_path)
+    rows = conn.execute("SELECT path, hash, size, mtime FROM indexed_files WHERE root=?", (root,)).fetchall()
+    conn.close()
+    return {path: (digest, size, mtime) for path, digest, size, mtime in rows}
+
+
+def _remove(conn, root, path):
+    """Drop a file's chunks and postings, keeping document frequencies in step"""
+    chunk_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM chunks WHERE root=? AND path=?", (root, path)
+    )]
+    for chunk_id in chunk_ids:
+        terms = [row[0] for row in conn.execute("SELECT term FROM postings WHERE chunk_id=?", (chunk_id,))]
+        conn.executemany(
+            "UPDATE term_stats SET df = df - 1 WHERE root=? AND term=?", [(root, t) for t in terms]
+        )
+        conn.execute("DELETE FROM postings WHERE chunk_id=?", (chunk_id,))
+    conn.execute("DELETE FROM chunks WHERE root=? AND path=?", (root, path))
+    conn.execute("DELETE FROM indexed_files WHERE root=? AND path=?", (root, path))
+
+
+def replace_files(root, files: Iterable[Tuple], db_path=RETRIEVAL_DB_PATH):
+    """
+    Re-index files in one transaction. Each item is
+    (path, hash, size, mtime, chunks) with chunks as
+    (start_line, end_line, name, length, {term: tf}).
+    """
+    conn = _connect(db_path)
+    with conn:
+        for path, digest, size, mtime, chunks in files:
+            _remove(conn, root, path)
+            conn.execute(
+                "INSERT INTO indexed_files VALUES (?, ?, ?, ?, ?)", (root, path, digest, size, mtime)
+            )
+            for start, end, name, length, counts in chunks:
+                chunk_id = conn.execute(
+                    "INSERT INTO chunks (root, path, start_line, end_line, name, length) VALUES (?, ?, ?, ?, ?, ?)",
+                    (root, path, start, end, name, length)
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?, ?)",
+                    [(root, term, chunk_id, tf) for term, tf in counts.items()]
+                )
+                conn.executemany(
+                    '''INSERT INTO term_stats VALUES (?, ?, 1)
+                       ON CONFLICT (root, term) DO UPDATE SET df = df + 1''',
+                    [(root, term) for term in counts]
+                )
+    conn.close()
+
+
+def touch_files(root, files: Iterable[Tuple[str, int, float]], db_path=RETRIEVAL_DB_PATH):
+    """Record new (size, mtime) for files whose content hash didn't change"""
+    conn = _connect(db_path)
+    with conn:
+        conn.executemany(
+            "UPDATE indexed_files SET size=?, mtime=? WHERE root=? AND path=?",
+            [(size, mtime, root, path) for path, size, mtime in files]
+        )
+    conn.close()
+
+
+def remove_files(root, paths: Iterable[str], db_path=RETRIEVAL_DB_PATH):
+    conn = _connect(db_path)
+    with conn:
+        for path in paths:
+            _remove(conn, root, path)
+        conn.execute("DELETE FROM term_stats WHERE root=? AND df <= 0", (root,))
+    conn.close()
+
+
+def corpus_stats(root, db_path=RETRIEVAL_DB_PATH) -> Tuple[int, float]:
+    """(number of chunks, average chunk length in terms)"""
+    conn = _connect(db_path)
+    count, average = conn.execute(
+        "SELECT COUNT(*), AVG(length) FROM chunks WHERE root=?", (root,)
+    ).fetchone()
+    conn.close()
+    return count, average or 0.0
+
+
+def document_frequencies(root, terms: Iterable[str], db_path=RETRIEVAL_DB_PATH) -> Dict[str, int]:
+    terms = list(terms)
+    if not terms:
+        return {}
+    conn = _connect(db_path)
+    rows = conn.execute(
+        f"SELECT term, df FROM term_stats WHERE root=? AND term IN ({', '.join('?' * len(terms))})",
+        (root, *terms)
+    ).fetchall()
+    conn.close()
+    return {term: df for term, df in rows if df > 0}
+
+
+def fetch_postings(root, terms: Iterable[str], db_path=RETRIEVAL_DB_PATH) -> List[Tuple[str, int, int, int]]:
+    """(term, chunk_id, tf, chunk length) for every posting of `terms`"""
+    terms = list(terms)
+    if not terms:
+        return []
+    conn = _connect(db_path)
+    rows = conn.execute(
+        f'''SELECT p.term, p.chunk_id, p.tf, c.length
+            FROM postings p JOIN chunks c ON c.id = p.chunk_id
+            WHERE p.root=? AND p.term IN ({', '.join('?' * len(terms))})''',
+        (root, *terms)
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def chunk_locations(chunk_ids: Iterable[int], db_path=RETRIEVAL_DB_PATH) -> Dict[int, Tuple[str, int, int, str]]:
+    """{chunk_id: (path, start_line, end_line, name)}"""
+    chunk_ids = list(chunk_ids)
+    if not chunk_ids:
+        return {}
+    conn = _connect(db_path)
+    rows = conn.execute(
+        f"SELECT id, path, start_line, end_line, name FROM chunks WHERE id IN ({', '.join('?' * len(chunk_ids))})",
+        chunk_ids
+    ).fetchall()
+    conn.close()
+    return {row[0]: tuple(row[1:]) for row in rows}
@@ -0,0 +1,60 @@
+import sqlite3
+import time
+from typing import Dict, Optional, Tuple
+
+from memory.database import DB_PATH
+
+# Per-file states: writing -> done | unchanged | failed
+FINISHED = ("done", "unchanged")
+
+
+def _connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('''CREATE TABLE IF NOT EXISTS run_checkpoints (
+        run_id TEXT NOT NULL,
+        job INTEGER NOT NULL,
+        file_path TEXT NOT NULL,
+        status TEXT NOT NULL,
+        new_hash TEXT,
+        error TEXT,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (run_id, job, file_path)
+    )''')
+    return conn
+
+
+def load_checkpoints(run_id, db_path=DB_PATH) -> Dict[Tuple[int, str], Tuple[str, Optional[str]]]:
+    """{(job, file_path): (status, new_hash)} for a run"""
+    conn = _connect(db_path)
+    rows = conn.execute(
+        "SELECT job, file_path, status, new_hash FROM run_checkpoints WHERE run_id=?", (run_id,)
+    ).fetchall()
+    conn.close()
+    return {(job, path): (status, new_hash) for job, path, status, new_hash in rows}
+
+
+def save_checkpoint(run_id, job, file_path, status, new_hash=None, error=None, db_path=DB_PATH):
+    conn = _connect(db_path)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO run_checkpoints VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (run_id, job, file_path, status, new_hash, error, time.time())
+        )
+    conn.close()
+
+
+def clear_checkpoints(run_id, db_path=DB_PATH) -> None:
+    """Forget a run's progress, so its next start processes every file again"""
+    conn = _connect(db_path)
+    with conn:
+        conn.execute("DELETE FROM run_checkpoints WHERE run_id=?", (run_id,))
+    conn.close()
+
+
+def run_counts(run_id, db_path=DB_PATH) -> Dict[str, int]:
+    conn = _connect(db_path)
+    rows = conn.execute(
+        "SELECT status, COUNT(*) FROM run_checkpoints WHERE run_id=? GROUP BY status", (run_id,)
+    ).fetchall()
+    conn.close()
+    return {status: count for status, count in rows}
@@ -0,0 +1,152 @@
+import sqlite3
+import time
+import uuid
+import logging
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from memory.database import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Share of the input price saved on a prompt-cache hit
+CACHED_DISCOUNT = {"OpenAI": 0.5, "DeepSeek": 0.9}
+# USD per million uncached input tokens, for rough savings estimates
+INPUT_PRICE_PER_M = {
+    "gpt-4-turbo": 10.0,
+    "gpt-4": 30.0,
+    "gpt-3.5-turbo": 0.5,
+    "deepseek-coder": 0.14,
+}
+
+# Per context, so concurrent sessions don't share a run; worker threads
+# inherit it through utils.context_threads
+_run_id: ContextVar[str] = ContextVar("usage_run_id", default=uuid.uuid4().hex)
+
+
+def new_run() -> str:
+    """Start a new run id; later usage rows from this context are grouped under it"""
+    run_id = uuid.uuid4().hex
+    _run_id.set(run_id)
+    return run_id
+
+
+def current_run() -> str:
+    return _run_id.get()
+
+
+def _connect(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('''CREATE TABLE IF NOT EXISTS llm_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        model TEXT NOT NULL,
+        prompt_tokens INTEGER NOT NULL,
+        cached_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        latency REAL,
+        created_at REAL NOT NULL,
+        ttft REAL
+    )''')
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(llm_usage)")}
+    if "ttft" not in columns:
+        conn.execute("ALTER TABLE llm_usage ADD COLUMN ttft REAL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_run ON llm_usage (run_id)")
+    return conn
+
+
+def usage_counts(usage) -> Optional[Dict[str, int]]:
+    """Token counts from a response's usage block (OpenAI or DeepSeek style)"""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    if cached is None:
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)  # DeepSeek
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "cached_tokens": cached or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+    }
+
+
+def record_usage(provider, model, usage, latency=None, ttft=None, run_id=None, db_path=DB_PATH):
+    """
+    Store the token usage of one provider response; never raises.
+    `latency` is the total time of a whole response, `ttft` the time to
+    first token of a streamed one.
+    """
+    counts = usage_counts(usage)
+    if counts is None:
+        return
+    try:
+        conn = _connect(db_path)
+        with conn:
+            conn.execute(
+                '''INSERT INTO llm_usage
+                   (run_id, provider, model, prompt_tokens, cached_tokens, completion_tokens, latency, ttft, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (run_id or current_run(), provider, model, counts["prompt_tokens"], counts["cached_tokens"],
+                 counts["completion_tokens"], latency, ttft, time.time())
+            )
+        conn.close()
+    except sqlite3.Error:
+        logger.debug("Could not record usage", exc_info=True)
+
+
+def run_summary(run_id=None, db_path=DB_PATH) -> Dict:
+    """Prompt-cache hit rate plus cost and latency savings for one run"""
+    conn = _connect(db_path)
+    rows = conn.execute(
+        '''SELECT provider, model, prompt_tokens, cached_tokens, completion_tokens, latency, ttft
+           FROM llm_usage WHERE run_id=?''',
+        (run_id or current_run(),)
+    ).fetchall()
+    conn.close()
+
+    summary = {
+        "requests": len(rows),
+        "prompt_tokens": 0,
+        "cached_tokens": 0,
+        "completion_tokens": 0,
+        "cache_hit_rate": 0.0,
+        "estimated_savings_usd": 0.0,
+        "avg_latency_cached": None,
+        "avg_latency_uncached": None,
+        "avg_ttft_cached": None,
+        "avg_ttft_uncached": None,
+    }
+    # Total latency and time to first token measure different things; average them apart
+    samples = {key: [] for key in ("latency_cached", "latency_uncached", "ttft_cached", "ttft_uncached")}
+    for provider, model, prompt, cached, completion, latency, ttft in rows:
+        summary["prompt_tokens"] += prompt
+        summary["cached_tokens"] += cached
+        summary["completion_tokens"] += completion
+        price = INPUT_PRICE_PER_M.get(model, 0.0)
+        summary["estimated_savings_usd"] += cached * price * CACHED_DISCOUNT.get(provider, 0.5) / 1e6
+        suffix = "cached" if cached else "uncached"
+        if latency is not None:
+            samples[f"latency_{suffix}"].append(latency)
+        if ttft is not None:
+            samples[f"ttft_{suffix}"].append(ttft)
+    if summary["prompt_tokens"]:
+        summary["cache_hit_rate"] = summary["cached_tokens"] / summary["prompt_tokens"]
+    for key, values in samples.items():
+        if values:
+            summary[f"avg_{key}"] = sum(values) / len(values)
+    return summary
+
+
+def format_summary(summary: Dict) -> str:
+    """One-line description of run_summary() output"""
+    text = (
+        f"{summary['requests']} requests, {summary['prompt_tokens']} prompt tokens "
+        f"({summary['cache_hit_rate']:.0%} cached), {summary['completion_tokens']} completion tokens, "
+        f"~${summary['estimated_savings_usd']:.4f} saved by prompt caching"
+    )
+    for key, label in (("latency", "latency"), ("ttft", "time to first token")):
+        cached, uncached = summary[f"avg_{key}_cached"], summary[f"avg_{key}_uncached"]
+        if cached is not None and uncached is not None:
+            text += f"; {label} {cached:.2f}s cached vs {uncached:.2f}s uncached"
+    return text
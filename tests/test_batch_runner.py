@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs a manifest in its own process, so a "crash" can really kill it
+DRIVER = '''
+import functools, os, sys
+from backend import batch_runner
+from memory import run_checkpoints
+
+manifest, db, calls, kill, fail, restart = sys.argv[1:7]
+for name in ("load_checkpoints", "save_checkpoint", "run_counts", "clear_checkpoints"):
+    setattr(batch_runner, name, functools.partial(getattr(run_checkpoints, name), db_path=db))
+
+def fake_upgrade(files, instruction, **kwargs):
+    (fname, content), = files.items()
+    with open(calls, "a") as f:
+        f.write(os.path.basename(fname) + "\\n")
+    if os.path.basename(fname) == fail:
+        raise RuntimeError("provider error")
+    return {fname: content.replace("= 1", "= 2")}
+
+def write_then_maybe_die(files):
+    real_write(files)
+    if any(os.path.basename(fname) == kill for fname in files):
+        os._exit(9)  # killed after writing, before the checkpoint
+
+real_write = batch_runner.write_code
+batch_runner.upgrade_code = fake_upgrade
+batch_runner.write_code = write_then_maybe_die
+print(batch_runner.run_manifest(manifest, max_workers=1, restart=restart == "1"))
+'''
+
+
+def _run(tmp_path, kill="", fail="", restart=False):
+    calls = tmp_path / "calls.txt"
+    calls.write_text("")
+    result = subprocess.run(
+        [sys.executable, str(tmp_path / "driver.py"), str(tmp_path / "manifest.jsonl"), str(tmp_path / "runs.db"),
+         str(calls), kill, fail, "1" if restart else "0"],
+        cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True
+    )
+    return result.returncode, calls.read_text().split()
+
+
+def _setup(tmp_path):
+    (tmp_path / "driver.py").write_text(DRIVER)
+    src = tmp_path / "src"
+    src.mkdir()
+    with open(tmp_path / "manifest.jsonl", "w") as manifest:
+        for name in ("a.py", "b.py", "c.py", "d.py"):
+            (src / name).write_text(f"{name[0]} = 1\n")
+            manifest.write(json.dumps({"path": str(src / name), "instruction": "bump"}) + "\n")
+    return src
+
+
+def test_rerun_after_crash_skips_done_retries_failed_and_trusts_written(tmp_path):
+    src = _setup(tmp_path)
+    code, calls = _run(tmp_path, kill="c.py", fail="b.py")
+    assert code == 9
+    assert calls == ["a.py", "b.py", "c.py"]  # d.py never started
+    assert (src / "c.py").read_text() == "c = 2\n"
+
+    code, calls = _run(tmp_path)
+    assert code == 0
+    # a.py is done; c.py was written before the crash and is recognised by its hash
+    assert calls == ["b.py", "d.py"]
+    assert all((src / name).read_text().endswith("= 2\n") for name in ("a.py", "b.py", "c.py", "d.py"))
+
+
+def test_finished_manifest_runs_again_only_on_restart(tmp_path):
+    _setup(tmp_path)
+    assert _run(tmp_path) == (0, ["a.py", "b.py", "c.py", "d.py"])
+    assert _run(tmp_path) == (0, [])
+    assert _run(tmp_path, restart=True) == (0, ["a.py", "b.py", "c.py", "d.py"])
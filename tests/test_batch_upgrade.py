@@ -0,0 +1,81 @@
+import functools
+
+import pytest
+
+from backend import upgrade_project
+from backend.batch_backends import LocalFileBackend, echo_responder
+from memory import batch_jobs
+
+
+class CountingBackend(LocalFileBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submits = 0
+
+    def submit(self, batch_path, job_id):
+        self.submits += 1
+        return super().submit(batch_path, job_id)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    db = str(tmp_path / "jobs.db")
+    for name in ("create_job", "find_open_job", "get_job", "item_counts", "mark_item", "pending_items", "update_job"):
+        monkeypatch.setattr(upgrade_project, name, functools.partial(getattr(batch_jobs, name), db_path=db))
+    monkeypatch.setattr(upgrade_project, "BATCH_DIR", str(tmp_path / "batches"))
+    monkeypatch.setattr(upgrade_project, "log_edit", lambda fname, content: None)
+    root = tmp_path / "app"
+    root.mkdir()
+    (root / "a.py").write_text("x = 1\n")
+    (root / "b.py").write_text("y = 1\n")
+    return root
+
+
+def _upgrade(root, backend):
+    return upgrade_project.batch_upgrade(str(root), "bump the numbers", backend, files_per_request=1)
+
+
+def test_submit_poll_apply(project, tmp_path):
+    backend = CountingBackend(str(tmp_path / "local"))
+    assert _upgrade(project, backend) is None  # Submitted; no one has answered yet
+
+    for batch_id in (tmp_path / "local").iterdir():
+        backend.process(batch_id.name, lambda body: echo_responder(body).replace("= 1", "= 2"))
+    written = _upgrade(project, backend)
+
+    assert sorted(written) == sorted(str(project / name) for name in ("a.py", "b.py"))
+    assert (project / "a.py").read_text().strip() == "x = 2"
+    assert (project / "b.py").read_text().strip() == "y = 2"
+    assert backend.submits == 1
+
+
+def test_crash_after_submit_does_not_resubmit(project, tmp_path, monkeypatch):
+    backend = CountingBackend(str(tmp_path / "local"), respond=echo_responder)
+    update_job = upgrade_project.update_job
+
+    def crash_on_submitted(job_id, status=None, **kwargs):
+        if status == "submitted":
+            raise SystemExit("killed")
+        return update_job(job_id, status=status, **kwargs)
+
+    monkeypatch.setattr(upgrade_project, "update_job", crash_on_submitted)
+    with pytest.raises(SystemExit):
+        _upgrade(project, backend)
+    monkeypatch.setattr(upgrade_project, "update_job", update_job)
+
+    written = _upgrade(project, backend)
+    assert len(written) == 2
+    assert backend.submits == 1
+
+
+def test_invalid_batch_results_are_not_written(project, tmp_path):
+    def respond(body):
+        return echo_responder(body).replace("x = 1", "def broken(:")
+
+    backend = CountingBackend(str(tmp_path / "local"), respond=respond)
+    written = _upgrade(project, backend)
+
+    assert written == [str(project / "b.py")]
+    assert (project / "a.py").read_text() == "x = 1\n"
+    (batch_dir,) = (tmp_path / "local").iterdir()  # the local batch id is the job id
+    assert upgrade_project.item_counts(batch_dir.name) == {"applied": 1, "failed": 1}
@@ -0,0 +1,10 @@
+from backend.compression import JS_KEEP_RE
+
+
+def test_js_skeleton_keeps_methods_but_not_control_flow():
+    for line in ("  render() {", "  async load(id: string): Promise<void> {", "  static create(a, b) {",
+                 "  getItem(key) {", "  iffy(x) {"):
+        assert JS_KEEP_RE.match(line), line
+    for line in ("  if (ready) {", "  for (const x of xs) {", "  while (true) {", "  switch (kind) {",
+                 "  catch (e) {", "  with (scope) {", "  if(ready) {"):
+        assert not JS_KEEP_RE.match(line), line
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend import hedging, llm_client
+from backend.hedging import HedgePolicy, hedging_scope
+
+
+def _stub_server(reply, first_token_delay):
+    """An OpenAI-compatible /v1/chat/completions that streams `reply`"""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests.append(body["model"])
+            time.sleep(first_token_delay)
+            self.send_response(200)
+            if not body.get("stream"):
+                payload = json.dumps({
+                    "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                }).encode()
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for word in reply.split(" "):
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    slow, slow_requests = _stub_server("from slow", first_token_delay=2.0)
+    fast, fast_requests = _stub_server("from fast", first_token_delay=0)
+    monkeypatch.setattr(llm_client, "PROVIDERS", dict(llm_client.PROVIDERS))
+    monkeypatch.setattr(llm_client, "record_usage", lambda *args, **kwargs: None)
+    monkeypatch.setattr(hedging, "_trackers", {})
+    monkeypatch.setattr(hedging, "_breakers", {})
+    monkeypatch.setenv("AUTOCODER_NO_CACHE", "1")
+    monkeypatch.setenv("STUB_KEY", "test")
+    llm_client.register_provider("Slow", f"http://127.0.0.1:{slow.server_port}/v1", "STUB_KEY")
+    llm_client.register_provider("Fast", f"http://127.0.0.1:{fast.server_port}/v1", "STUB_KEY")
+    yield slow_requests, fast_requests
+    llm_client.close_clients()
+    slow.shutdown()
+    fast.shutdown()
+
+
+def _ask(provider):
+    messages = [{"role": "user", "content": "hi"}]
+    return llm_client.chat_completion(llm_client.get_client(provider), messages, provider, "stub-model")
+
+
+def test_slow_primary_is_hedged_within_the_scope(stubs):
+    slow_requests, fast_requests = stubs
+    with hedging_scope("Slow", HedgePolicy("Fast", "fast-model", default_delay=0.2)):
+        started = time.monotonic()
+        assert _ask("Slow").strip() == "from fast"
+    assert time.monotonic() - started < 1.5
+    assert slow_requests == ["stub-model"]
+    assert fast_requests == ["fast-model"]
+
+
+def test_scope_without_policy_overrides_global_hedging(stubs):
+    slow_requests, fast_requests = stubs
+    hedging.enable_hedging("Fast", "Slow", "slow-model", default_delay=0.01)
+    try:
+        with hedging_scope("Fast", None):
+            assert _ask("Fast").strip() == "from fast"
+    finally:
+        hedging.disable_hedging("Fast")
+    assert fast_requests == ["stub-model"]
+    assert slow_requests == []
+
+
+def test_unlaunched_secondary_keeps_its_half_open_trial(stubs):
+    slow_requests, fast_requests = stubs
+    breaker = hedging.get_breaker("Slow")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout  # cool-down over: one trial is due
+    opened_at = breaker.opened_at
+
+    with hedging_scope("Fast", HedgePolicy("Slow", "slow-model", default_delay=1.0)):
+        assert _ask("Fast").strip() == "from fast"
+    assert slow_requests == []
+    assert breaker.opened_at == opened_at
+    assert breaker.allow()
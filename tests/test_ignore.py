@@ -0,0 +1,21 @@
+from utils.ignore import DEFAULT_IGNORES, IgnoreMatcher
+
+
+def test_leading_slash_anchors_directory_pattern():
+    matcher = IgnoreMatcher(["/build/"])
+    assert matcher.matches("build", is_dir=True)
+    assert not matcher.matches("src/build", is_dir=True)
+
+
+def test_unanchored_directory_pattern_matches_at_any_depth():
+    matcher = IgnoreMatcher(["logs/"])
+    assert matcher.matches("a/b/logs", is_dir=True)
+    assert not matcher.matches("a/b/logs", is_dir=False)
+
+
+def test_defaults_keep_nested_build_packages():
+    matcher = IgnoreMatcher(DEFAULT_IGNORES)
+    assert matcher.matches("build", is_dir=True)
+    assert not matcher.matches("src/mypkg/build", is_dir=True)
+    assert not matcher.matches("src/mypkg/env", is_dir=True)
+    assert matcher.matches("src/mypkg/node_modules", is_dir=True)
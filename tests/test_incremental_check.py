@@ -0,0 +1,44 @@
+import functools
+
+import pytest
+
+from backend import incremental_check
+from memory import check_cache
+
+LONG_LINE = "x = '" + "a" * 90 + "'\n"  # 96 characters
+
+
+@pytest.fixture(autouse=True)
+def lint_cache(tmp_path, monkeypatch):
+    db = str(tmp_path / "cache.db")
+    monkeypatch.setattr(incremental_check, "load_lint_results", functools.partial(check_cache.load_lint_results, db_path=db))
+    monkeypatch.setattr(incremental_check, "save_lint_results", functools.partial(check_cache.save_lint_results, db_path=db))
+
+
+def _project(path, config=None):
+    path.mkdir()
+    (path / "mod.py").write_text(LONG_LINE)
+    if config is not None:
+        (path / "setup.cfg").write_text(config)
+    return path
+
+
+def _codes(root):
+    target = str(root / "mod.py")
+    return [code for _, _, code, _ in incremental_check.lint_files([target], str(root))[target]]
+
+
+def test_each_project_is_linted_with_its_own_config(tmp_path):
+    strict = _project(tmp_path / "strict")
+    relaxed = _project(tmp_path / "relaxed", "[flake8]\nmax-line-length = 120\n")
+
+    assert _codes(strict) == ["E501"]
+    assert _codes(relaxed) == []
+
+
+def test_config_change_invalidates_cached_results(tmp_path):
+    root = _project(tmp_path / "app")
+    assert _codes(root) == ["E501"]
+
+    (root / "setup.cfg").write_text("[flake8]\nmax-line-length = 120\n")
+    assert _codes(root) == []
@@ -0,0 +1,25 @@
+import os
+from pathlib import Path
+
+from backend.lint_repair import group_by_file, parse_report
+
+
+def test_parse_report_with_relative_base_dir(tmp_path, monkeypatch):
+    project = tmp_path / "generated_app"
+    (project / "src").mkdir(parents=True)
+    (project / "src" / "a.py").write_text("import os\n")
+    monkeypatch.chdir(tmp_path)
+
+    report = "🔍 Lint errors:\nsrc/a.py:1:1: F401 'os' imported but unused\n"
+    diagnostics = parse_report(report, Path("generated_app"))
+
+    assert [(d.path, d.line, d.code) for d in diagnostics] == [
+        (os.path.join(str(project), "src", "a.py"), 1, "F401")
+    ]
+
+
+def test_paths_outside_the_project_are_ignored(tmp_path):
+    (tmp_path / "a.py").write_text("x = 1\n")
+    report = "../outside.py:1:1: E999 boom\n/usr/lib/python3/x.py:2:1: E1 boom\na.py:1:2: E225 missing whitespace\n"
+    by_file = group_by_file(parse_report(report, str(tmp_path)))
+    assert list(by_file) == [str(tmp_path / "a.py")]
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend import llm_client
+from memory import llm_cache
+from memory.llm_cache import LLMCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "cache.db"), ttl=60)
+    cache.put("key", "reply")
+    clock.now += 60
+    assert cache.get("key") == "reply"
+    clock.now += 1
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0  # the expired row is dropped on lookup
+
+
+def test_least_recently_used_entries_are_evicted_past_the_cap(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_bytes=25)
+    for key in ("a", "b"):
+        cache.put(key, key * 10)
+        clock.now += 1
+    assert cache.get("a") == "a" * 10  # b is now the least recently used
+    clock.now += 1
+    cache.put("c", "c" * 10)  # 30 bytes: one entry has to go
+
+    assert cache.get("a") == "a" * 10
+    assert cache.get("b") is None
+    assert cache.get("c") == "c" * 10
+    assert cache.stats()["bytes"] <= 25
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    cache.put("key", "reply")
+    cache.get("key")
+    cache.get("key")
+    cache.get("other")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+class FakeClient:
+    """Answers every chat completion with `reply`, cut off as given by `finish_reason`"""
+
+    def __init__(self, reply, finish_reason):
+        self.calls = 0
+        self.reply = reply
+        self.finish_reason = finish_reason
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=self.finish_reason)], usage=None)
+
+
+@pytest.mark.parametrize("finish_reason, calls", [("stop", 1), ("length", 2)])
+def test_replies_cut_off_by_max_tokens_are_not_cached(tmp_path, monkeypatch, finish_reason, calls):
+    cache = LLMCache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(llm_client, "get_cache", lambda: cache)
+    monkeypatch.setattr(llm_client, "record_usage", lambda *args, **kwargs: None)
+    monkeypatch.delenv("AUTOCODER_NO_CACHE", raising=False)
+    client = FakeClient("partial repl", finish_reason)
+    messages = [{"role": "user", "content": "hi"}]
+
+    for _ in range(2):
+        assert llm_client.chat_completion(client, messages, "OpenAI", "test-model") == "partial repl"
+    assert client.calls == calls
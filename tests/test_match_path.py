@@ -0,0 +1,21 @@
+import pytest
+
+from backend.upgrade_project import _match_path
+
+
+def test_matches_whole_path_components_only():
+    files = {"proj/data.py": "", "proj/a.py": ""}
+    assert _match_path("a.py", files) == "proj/a.py"
+    assert _match_path("./a.py", files) == "proj/a.py"
+    assert _match_path("ta.py", files) == "ta.py"
+
+
+def test_keeps_leading_dots_that_are_part_of_the_path():
+    files = {"repo/.github/workflows/ci.yml": "", "repo/x.py": ""}
+    assert _match_path(".github/workflows/ci.yml", files) == "repo/.github/workflows/ci.yml"
+    assert _match_path("../x.py", files) == "../x.py"
+
+
+def test_ambiguous_match_fails():
+    with pytest.raises(ValueError):
+        _match_path("util.py", {"a/util.py": "", "b/util.py": ""})
@@ -0,0 +1,60 @@
+from backend.patch_apply import apply_hunk, apply_hunks, format_hunk, parse_edits
+
+
+def test_parse_search_replace_and_unified_diff():
+    output = (
+        "File: a.py\n"
+        "<<<<<<< SEARCH\n"
+        "x = 1\n"
+        "=======\n"
+        "x = 2\n"
+        ">>>>>>> REPLACE\n"
+        "--- a/b.py\n"
+        "+++ b/b.py\n"
+        "@@ -1,3 +1,3 @@\n"
+        " def f():\n"
+        "-    return 1\n"
+        "+    return 2\n"
+    )
+    assert parse_edits(output) == {
+        "a.py": [("x = 1", "x = 2")],
+        "b.py": [("def f():\n    return 1", "def f():\n    return 2")],
+    }
+
+
+def test_format_hunk_round_trips():
+    hunk = ("a = 1\nb = 2", "a = 3\nb = 4")
+    assert parse_edits(format_hunk("m.py", hunk)) == {"m.py": [hunk]}
+
+
+def test_exact_match_is_line_aligned():
+    # "a = 1" is also a substring of "data = 10"; only the whole line may match
+    assert apply_hunk("data = 10\na = 1\n", ("a = 1", "a = 2")) == "data = 10\na = 2\n"
+    assert apply_hunk("data = 10\n", ("a = 1", "a = 2")) is None
+
+
+def test_whitespace_insensitive_match_is_reindented():
+    content = "class A:\n    def f(self):\n        return 1\n"
+    hunk = ("def f(self):\n    return 1", "def f(self):\n    return 2  ")
+    assert apply_hunk(content, hunk) == "class A:\n    def f(self):\n        return 2  \n"
+
+
+def test_fuzzy_match_tolerates_small_context_drift():
+    content = "def total(items):\n    result = 0\n    for item in items:\n        result += item.price\n    return result\n"
+    hunk = (
+        "def total(items):\n    result = 0\n    for item in items:\n        result += item.cost\n    return result",
+        "def total(items):\n    return sum(item.price for item in items)",
+    )
+    assert apply_hunk(content, hunk) == "def total(items):\n    return sum(item.price for item in items)\n"
+
+
+def test_apply_hunks_reports_failures_and_keeps_going():
+    content = "a = 1\nb = 2\n"
+    updated, failed = apply_hunks(content, [("a = 1", "a = 10"), ("zzz = 0", "zzz = 1"), ("b = 2", "b = 20")])
+    assert updated == "a = 10\nb = 20\n"
+    assert failed == [("zzz = 0", "zzz = 1")]
+
+
+def test_empty_search_appends():
+    assert apply_hunk("a = 1\n", ("", "b = 2")) == "a = 1\nb = 2\n"
+    assert apply_hunk("", ("", "b = 2")) == "b = 2"
@@ -0,0 +1,131 @@
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from backend import rate_limiter
+from backend.rate_limiter import AdaptiveConcurrency, ProviderScheduler, TokenBucket, retry_after
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping just advances the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(capacity=10, rate=2)  # 2 tokens per second
+    bucket.acquire(10)
+    assert clock.sleeps == []
+    bucket.acquire(4)  # empty: needs 2 seconds of refill
+    assert sum(clock.sleeps) == pytest.approx(2.0)
+
+    clock.now += 100
+    bucket.drain()
+    before = clock.now
+    bucket.acquire(1)
+    assert clock.now - before == pytest.approx(0.5)
+
+
+def test_token_bucket_caps_oversized_requests(clock):
+    bucket = TokenBucket(capacity=5, rate=1)
+    bucket.acquire(50)  # can never hold 50: takes the whole bucket instead of blocking forever
+    assert clock.sleeps == []
+
+
+def test_aimd_grows_additively_and_halves_on_throttling():
+    limit = AdaptiveConcurrency(max_limit=16, initial=4)
+    for _ in range(4):
+        limit.acquire()
+        limit.release(latency=1.0)
+    assert limit.limit == pytest.approx(5.0, abs=0.1)  # ~+1 per window of healthy requests
+
+    limit.acquire()
+    limit.release(throttled=True)
+    assert limit.limit == pytest.approx(2.5, abs=0.05)
+
+    limit.acquire()
+    limit.release(latency=10.0)  # well past the baseline: ease off
+    assert limit.limit == pytest.approx(2.25, abs=0.05)
+
+    for _ in range(5):
+        limit.acquire()
+        limit.release(throttled=True)
+    assert limit.limit == limit.min_limit
+
+
+def test_retry_after_headers(clock):
+    assert retry_after(FakeError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(FakeError(429, {"retry-after": "7"})) == 7.0
+    date = format_datetime(datetime.fromtimestamp(clock.now + 30, tz=timezone.utc), usegmt=True)
+    assert retry_after(FakeError(429, {"retry-after": date})) == pytest.approx(30, abs=1)
+    past = format_datetime(datetime.fromtimestamp(clock.now - 30, tz=timezone.utc), usegmt=True)
+    assert retry_after(FakeError(429, {"retry-after": past})) == 0.0
+    assert retry_after(FakeError(429, {"retry-after": "soon"})) is None
+    assert retry_after(FakeError(503)) is None
+
+
+def test_scheduler_retries_with_retry_after_then_succeeds(clock):
+    scheduler = ProviderScheduler("Test", rpm=600, tpm=100000, max_concurrency=4)
+    outcomes = [FakeError(429, {"retry-after": "3"}), FakeError(503, {"retry-after-ms": "250"}), "ok"]
+    drains = []
+    drain = scheduler.requests.drain
+    scheduler.requests.drain = lambda: (drains.append(1), drain())
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert scheduler.call(call, tokens=10) == "ok"
+    assert 3.0 in clock.sleeps and 0.25 in clock.sleeps
+    assert len(drains) == 1  # only the 429 empties the request bucket
+
+
+def test_scheduler_raises_non_retryable_and_exhausted_errors(clock):
+    scheduler = ProviderScheduler("Test", rpm=600, tpm=100000, max_concurrency=4)
+
+    def bad_request():
+        raise FakeError(400)
+
+    with pytest.raises(FakeError):
+        scheduler.call(bad_request)
+    assert clock.sleeps == []
+
+    calls = []
+
+    def unavailable():
+        calls.append(1)
+        raise FakeError(503, {"retry-after": "1"})
+
+    with pytest.raises(FakeError):
+        scheduler.call(unavailable, max_retries=2)
+    assert len(calls) == 3
@@ -0,0 +1,24 @@
+from backend.response_parser import MARKDOWN_HEADER_RE, parse_file_blocks
+
+
+def test_indented_annotation_is_not_a_header():
+    output = (
+        "File: models.py\n"
+        "class Record:\n"
+        "    file: str\n"
+        "    FILE: int\n"
+        "\n"
+        "File: main.py\n"
+        "print('hi')\n"
+    )
+    assert parse_file_blocks(output) == [
+        ("models.py", "class Record:\n    file: str\n    FILE: int"),
+        ("main.py", "print('hi')"),
+    ]
+
+
+def test_header_forms():
+    for header in ("File: a.py", "FILE: a.py", "**File: a.py**", "# File: a.py", "// FILE: a.py"):
+        assert parse_file_blocks(f"{header}\n```\nx = 1\n```\n") == [("a.py", "x = 1")], header
+    assert parse_file_blocks("### a.py\n```\nx = 1\n```\n", MARKDOWN_HEADER_RE) == [("a.py", "x = 1")]
+    assert parse_file_blocks("  File: a.py\n```\nx = 1\n```\n") == []
@@ -0,0 +1,50 @@
+import functools
+
+import pytest
+
+from backend import retrieval
+from memory import retrieval_index
+
+
+@pytest.fixture(autouse=True)
+def index_db(tmp_path, monkeypatch):
+    db = str(tmp_path / "retrieval.db")
+    for name in ("chunk_locations", "corpus_stats", "document_frequencies", "fetch_postings", "load_files",
+                 "remove_files", "replace_files", "touch_files"):
+        monkeypatch.setattr(retrieval, name, functools.partial(getattr(retrieval_index, name), db_path=db))
+
+
+def _project(tmp_path):
+    root = tmp_path / "proj"
+    root.mkdir()
+    files = {
+        "http_client.py": "def parse_http_response(raw):\n    return parse_headers(raw)\n",
+        "http_server.py": "def serve_http(port):\n    return listen(port)\n",
+        "parser.py": "def parse_config(text):\n    return text.split()\n",
+        "colors.py": "def blend(a, b):\n    return (a + b) / 2\n",
+    }
+    for name, content in files.items():
+        (root / name).write_text(content)
+    return root
+
+
+def test_tokenize_splits_identifiers():
+    assert retrieval.tokenize("fetchHttpData") == ["fetchhttpdata", "fetch", "http", "data"]
+    assert retrieval.tokenize("retries") == ["retry"]
+
+
+def test_common_terms_still_rank_in_a_small_project(tmp_path):
+    root = _project(tmp_path)
+    # "http" and "parse" each occur in half of the chunks, above MAX_DF_RATIO
+    ranked = retrieval.relevant_files(str(root), "parse the http response", top_k=3)
+    names = [p.rsplit("/", 1)[-1] for p in ranked]
+    assert names[0] == "http_client.py"
+    assert set(names) == {"http_client.py", "http_server.py", "parser.py"}
+
+
+def test_ubiquitous_terms_are_dropped_in_a_large_corpus(tmp_path, monkeypatch):
+    root = _project(tmp_path)
+    retrieval.build_index(str(root))
+    monkeypatch.setattr(retrieval, "DF_CUTOFF_MIN_CHUNKS", 1)
+    hits = retrieval.search(str(root), "parse http blend")
+    assert [hit.path.rsplit("/", 1)[-1] for hit in hits] == ["colors.py"]
@@ -0,0 +1,74 @@
+import pytest
+
+from backend import upgrade_project
+
+
+def test_streaming_routes_oversized_files_to_chunking(monkeypatch):
+    big = "".join(f"def f{i}():\n    return {i}\n\n" for i in range(20000))
+    files = {"big.py": big, "small.py": "x = 1\n"}
+    chunked, streamed = [], []
+
+    def fake_large(fname, content, *args, **kwargs):
+        chunked.append(fname)
+        return content + "# upgraded\n"
+
+    def fake_stream(client, messages, **kwargs):
+        streamed.append([m["content"].split("\n", 1)[0] for m in messages])
+        yield "File: small.py\n```\nx = 2\n```\n"
+
+    monkeypatch.setattr(upgrade_project, "upgrade_large_file", fake_large)
+    monkeypatch.setattr(upgrade_project, "stream_chat_completion", fake_stream)
+    monkeypatch.setattr(upgrade_project, "get_client", lambda provider: None)
+    monkeypatch.setattr(upgrade_project, "log_edit", lambda fname, content: None)
+
+    landed = []
+    result = upgrade_project.upgrade_code_streaming(
+        files, "modernize", on_file=lambda fname, content: landed.append(fname)
+    )
+
+    assert chunked == ["big.py"]
+    assert not any("File: big.py" in line for request in streamed for line in request)
+    assert result["big.py"].endswith("# upgraded\n")
+    assert result["small.py"].strip() == "x = 2"
+    assert sorted(landed) == ["big.py", "small.py"]
+
+
+def test_streamed_blocks_are_validated_before_on_file(monkeypatch):
+    files = {"good.py": "x = 1\n", "bad.py": "y = 1\n"}
+
+    def fake_stream(client, messages, **kwargs):
+        yield "File: good.py\n```\nx = 2\n```\nFile: bad.py\n```\ndef broken(:\n```\n"
+
+    repairs = []
+    monkeypatch.setattr(upgrade_project, "stream_chat_completion", fake_stream)
+    monkeypatch.setattr(upgrade_project, "get_client", lambda provider: None)
+    monkeypatch.setattr(upgrade_project, "log_edit", lambda fname, content: None)
+    monkeypatch.setattr(upgrade_project, "_repair_file", lambda fname, *args: repairs.append(fname))
+
+    landed = {}
+    upgrade_project.upgrade_code_streaming(files, "modernize", on_file=landed.__setitem__)
+
+    assert landed == {"good.py": "x = 2", "bad.py": "y = 1\n"}
+    assert repairs == ["bad.py"] * upgrade_project.MAX_REPAIR_ROUNDS
+
+
+def test_streaming_sends_reference_context(monkeypatch):
+    sent = []
+
+    def fake_stream(client, messages, **kwargs):
+        sent.extend(m["content"] for m in messages)
+        yield "File: a.py\n```\nx = 2\n```\n"
+
+    monkeypatch.setattr(upgrade_project, "stream_chat_completion", fake_stream)
+    monkeypatch.setattr(upgrade_project, "get_client", lambda provider: None)
+    monkeypatch.setattr(upgrade_project, "log_edit", lambda fname, content: None)
+
+    upgrade_project.upgrade_code_streaming({"a.py": "x = 1\n"}, "modernize", context={"lib.py": "def helper(): ..."})
+    assert any(content.startswith("Reference only") and "lib.py" in content for content in sent)
+
+
+@pytest.mark.parametrize("flags", [["--edit-format", "diff"], ["--fan-out"], ["--concurrency", "8"], ["--batch", "local"]])
+def test_stream_rejects_options_it_would_ignore(monkeypatch, flags):
+    monkeypatch.setattr("sys.argv", ["upgrade_project", "--path", ".", "--upgrade", "x", "--stream"] + flags)
+    with pytest.raises(SystemExit):
+        upgrade_project.parse_args()
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from backend import token_budget
+from backend.token_budget import _file_cost, completion_budget, pack_batches, stream_batches
+
+MODEL = "tiny-test-model"
+WINDOW, MAX_OUTPUT = 3000, 800
+OVERHEAD = 100
+
+
+@pytest.fixture(autouse=True)
+def tiny_model(monkeypatch):
+    monkeypatch.setitem(token_budget.MODEL_LIMITS, MODEL, (WINDOW, MAX_OUTPUT))
+
+
+def _files(count=60, seed=7):
+    rng = random.Random(seed)
+    files = {}
+    for i in range(count):
+        lines = rng.choice([1, 3, 10, 25, 60])
+        files[f"pkg/mod_{i}.py"] = "".join(f"value_{j} = compute({j}, 'x')\n" for j in range(lines))
+    files["pkg/huge.py"] = "".join(f"value_{j} = compute({j}, 'x')\n" for j in range(400))
+    return files
+
+
+def _check(batches, files, max_files=0):
+    seen = [fname for batch in batches for fname in batch]
+    assert sorted(seen) == sorted(files)  # nothing dropped or duplicated
+    order = list(files)
+    for batch in batches:
+        assert list(batch) == sorted(batch, key=order.index)
+        assert all(batch[fname] == files[fname] for fname in batch)
+        if max_files:
+            assert len(batch) <= max_files
+        costs = [_file_cost(fname, content, MODEL) for fname, content in batch.items()]
+        prompt, output = sum(c[0] for c in costs), sum(c[1] for c in costs)
+        if len(batch) == 1 and (prompt + output > WINDOW - OVERHEAD or output > MAX_OUTPUT):
+            continue  # oversized: alone in its batch
+        assert prompt + output <= WINDOW - OVERHEAD
+        assert output <= MAX_OUTPUT
+
+
+def test_pack_batches_keeps_every_file_within_limits():
+    files = _files()
+    batches = pack_batches(files, MODEL, overhead_tokens=OVERHEAD)
+    _check(batches, files)
+    assert {"pkg/huge.py": files["pkg/huge.py"]} in batches
+    assert len(batches) < len(files) / 2  # files were actually packed together
+
+
+def test_pack_batches_respects_max_files():
+    files = _files()
+    _check(pack_batches(files, MODEL, overhead_tokens=OVERHEAD, max_files=3), files, max_files=3)
+
+
+def test_stream_batches_keeps_every_file_within_limits():
+    files = _files()
+    batches = list(stream_batches(iter(files.items()), MODEL, overhead_tokens=OVERHEAD, max_files=4))
+    _check(batches, files, max_files=4)
+    assert {"pkg/huge.py": files["pkg/huge.py"]} in batches
+
+
+def test_stream_batches_flushes_at_max_resident_bytes():
+    files = _files()
+    limit = 2000
+    state = {"read": 0, "yielded": 0, "peak": 0}
+
+    def items():
+        for fname, content in files.items():
+            # Everything read but not yet handed out is buffered
+            state["peak"] = max(state["peak"], state["read"] - state["yielded"])
+            state["read"] += len(content.encode("utf-8"))
+            yield fname, content
+
+    batches = []
+    for batch in stream_batches(items(), MODEL, overhead_tokens=OVERHEAD, max_resident_bytes=limit):
+        state["yielded"] += sum(len(content.encode("utf-8")) for content in batch.values())
+        batches.append(batch)
+    _check(batches, files)
+    assert 0 < state["peak"] <= limit
+
+
+def test_completion_budget():
+    assert completion_budget(100, MODEL) == MAX_OUTPUT
+    assert completion_budget(WINDOW - 300, MODEL) == 300
+    assert completion_budget(WINDOW + 50, MODEL) == 1
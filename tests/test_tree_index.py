@@ -0,0 +1,35 @@
+import os
+
+from utils.tree_index import TreeIndex
+
+
+def _tree(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "other").mkdir()
+    (tmp_path / "pkg" / "mod.py").write_text("x = 1\n")
+    (tmp_path / "other" / "util.py").write_text("y = 1\n")
+    return TreeIndex(str(tmp_path)).refresh(force=True)
+
+
+def test_refresh_does_not_stat_files_in_unchanged_directories(tmp_path, monkeypatch):
+    index = _tree(tmp_path)
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda path, *a, **k: stats.append(str(path)) or real_stat(path, *a, **k))
+    index.refresh(force=True)
+    assert not any(path.endswith(".py") for path in stats)
+
+
+def test_restat_updates_sizes_of_shown_directories(tmp_path):
+    index = _tree(tmp_path)
+    assert index.total_size == 12
+    (tmp_path / "pkg" / "mod.py").write_text("x = 1\ny = 2\n")  # same listing, new size
+    (tmp_path / "other" / "util.py").write_text("y = 10\n")
+
+    index.restat(["pkg"])
+    assert index.find("pkg").files == {"mod.py": 12}
+    assert index.find("other").files == {"util.py": 6}  # not shown: as of the last listing
+    assert index.total_size == 18
+
+    index.restat()
+    assert index.total_size == 19
@@ -0,0 +1,68 @@
+import contextvars
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+from memory import usage_metrics
+from utils.context_threads import ContextThreadPoolExecutor
+
+
+def _usage(prompt, cached=0):
+    return SimpleNamespace(
+        prompt_tokens=prompt, completion_tokens=10,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached)
+    )
+
+
+def test_concurrent_runs_keep_their_own_rows(tmp_path):
+    db = str(tmp_path / "usage.db")
+    both_started = threading.Barrier(2)
+    run_ids = {}
+
+    def session(name):
+        run_ids[name] = usage_metrics.new_run()
+        both_started.wait()  # the other session has called new_run() too
+        with ContextThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda _: usage_metrics.record_usage("OpenAI", "gpt-4", _usage(100), db_path=db), range(3)))
+
+    threads = [
+        threading.Thread(target=contextvars.copy_context().run, args=(session, name)) for name in ("a", "b")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert run_ids["a"] != run_ids["b"]
+    for run_id in run_ids.values():
+        assert usage_metrics.run_summary(run_id, db_path=db)["requests"] == 3
+
+
+def test_streamed_and_whole_latencies_are_kept_apart(tmp_path):
+    db = str(tmp_path / "usage.db")
+    run_id = "run"
+    usage_metrics.record_usage("OpenAI", "gpt-4", _usage(100), latency=4.0, run_id=run_id, db_path=db)
+    usage_metrics.record_usage("OpenAI", "gpt-4", _usage(100, 50), latency=2.0, run_id=run_id, db_path=db)
+    usage_metrics.record_usage("OpenAI", "gpt-4", _usage(100), ttft=0.8, run_id=run_id, db_path=db)
+    usage_metrics.record_usage("OpenAI", "gpt-4", _usage(100, 50), ttft=0.2, run_id=run_id, db_path=db)
+
+    summary = usage_metrics.run_summary(run_id, db_path=db)
+    assert (summary["avg_latency_cached"], summary["avg_latency_uncached"]) == (2.0, 4.0)
+    assert (summary["avg_ttft_cached"], summary["avg_ttft_uncached"]) == (0.2, 0.8)
+    text = usage_metrics.format_summary(summary)
+    assert "latency 2.00s cached vs 4.00s uncached" in text
+    assert "time to first token 0.20s cached vs 0.80s uncached" in text
+
+
+def test_old_table_gains_ttft_column(tmp_path):
+    db = str(tmp_path / "usage.db")
+    conn = sqlite3.connect(db)
+    conn.execute('''CREATE TABLE llm_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL, provider TEXT NOT NULL,
+        model TEXT NOT NULL, prompt_tokens INTEGER NOT NULL, cached_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL, latency REAL, created_at REAL NOT NULL
+    )''')
+    conn.close()
+
+    usage_metrics.record_usage("OpenAI", "gpt-4", _usage(100), ttft=0.5, run_id="run", db_path=db)
+    assert usage_metrics.run_summary("run", db_path=db)["avg_ttft_uncached"] == 0.5
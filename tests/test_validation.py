@@ -0,0 +1,21 @@
+from backend.validation import check_brackets, check_css, validate_content
+
+
+def test_css_url_with_double_slash_is_valid():
+    css = "body { background: url(http://example.com/a.png); }\n/* a comment ( */\n"
+    assert check_css(css) is None
+    assert validate_content("style.css", css) is None
+
+
+def test_css_reports_unclosed_block():
+    assert check_css("body { color: red;\n") == "line 1: '{' is never closed"
+
+
+def test_regex_literals_are_skipped():
+    assert check_brackets("const re = /\\(/;\nfunction f() { return /[)]/.test(x); }\n") is None
+    assert validate_content("a.ts", "if (a.match(/\\{/)) { b(); }\n") is None
+
+
+def test_division_and_comments_still_handled():
+    assert check_brackets("const half = total / 2; // (\nlet y = (a / b) / c;\n") is None
+    assert check_brackets("function f() {\n  return (1;\n}\n") == "line 3: unexpected '}'"
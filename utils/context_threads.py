@@ -0,0 +1,23 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor whose tasks run in a copy of the submitting thread's
+    contextvars, so per-session settings (hedging policy, usage run id)
+    follow the work into the pool.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        context = contextvars.copy_context()
+        return super().submit(context.run, fn, *args, **kwargs)
+
+
+def start_thread(target, *args, daemon=True):
+    """Start a thread that runs `target` in a copy of the current context"""
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(target,) + args, daemon=daemon)
+    thread.start()
+    return thread
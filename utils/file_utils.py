@@ -1,13 +1,21 @@
 import os
+from html import escape
+from utils.ignore import get_matcher
+
+PAGE_SIZE = 200  # entries shown per directory before "more"
+MAX_NODES = 2000  # entries rendered per tree
 
 def scan_project_directory(path):
-    """Scan a directory and return its structure, skipping hidden entries."""
+    """Scan a directory and return its structure, skipping hidden and ignored entries."""
     if not os.path.exists(path):
         return {}
 
     if os.path.isfile(path):
         return {os.path.basename(path): None}
 
+    return _scan(path, get_matcher(path), "")
+
+def _scan(path, matcher, rel):
     structure = {}
     # Use os.scandir for better performance on large trees
     with os.scandir(path) as it:
@@ -16,25 +24,75 @@ def scan_project_directory(path):
             if entry.name.startswith('.'):
                 continue
 
-            if entry.is_dir(follow_symlinks=False):
-                structure[entry.name] = scan_project_directory(entry.path)
+            entry_rel = f"{rel}/{entry.name}" if rel else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if matcher.matches(entry_rel, is_dir=is_dir):
+                continue
+
+            if is_dir:
+                structure[entry.name] = _scan(entry.path, matcher, entry_rel)
             else:
                 structure[entry.name] = None
     return structure
 
-def format_directory_tree(tree, indent=0):
+def format_directory_tree(tree, indent=0, expanded=None, pages=None, page_size=PAGE_SIZE, max_nodes=MAX_NODES):
     """Format directory tree as nested HTML lists."""
-    html = "<ul>\n"
-    for name, contents in tree.items():
-        spacer = '  ' * indent
-        if contents is None:
-            html += f"{spacer}<li>📄 {name}</li>\n"
-        else:
-            html += f"{spacer}<li>📁 <strong>{name}</strong>\n"
-            html += format_directory_tree(contents, indent + 1)
-            html += f"{spacer}</li>\n"
-    html += "</ul>\n"
-    return html
+    return render_tree(tree, expanded, pages, page_size, max_nodes, indent).html
+
+class RenderedTree:
+    """HTML for the visible part of a tree, plus what was left out"""
+    def __init__(self, html, collapsed, paginated, nodes, truncated):
+        self.html = html
+        self.collapsed = collapsed  # visible directories that can be expanded
+        self.paginated = paginated  # directories with more entries than shown
+        self.nodes = nodes
+        self.truncated = truncated  # max_nodes was reached
+
+def render_tree(tree, expanded=None, pages=None, page_size=PAGE_SIZE, max_nodes=MAX_NODES, indent=0):
+    """
+    Render only what is visible: directories in `expanded` (relative paths,
+    or every directory when None), `pages[path]` pages of `page_size`
+    entries per directory, and at most `max_nodes` entries in total.
+    Output is collected in a list and joined once.
+    """
+    out, collapsed, paginated = [], [], []
+    budget = [max_nodes]
+    pages = pages or {}
+
+    def _render(subtree, rel, depth):
+        spacer = '  ' * depth
+        out.append(f"{spacer}<ul>\n")
+        names = list(subtree)
+        limit = page_size * pages.get(rel, 1)
+        for name in names[:limit]:
+            if budget[0] <= 0:
+                break
+            budget[0] -= 1
+            contents = subtree[name]
+            label = escape(name)
+            if contents is None:
+                out.append(f"{spacer}<li>📄 {label}</li>\n")
+                continue
+            path = f"{rel}/{name}" if rel else name
+            if expanded is None or path in expanded:
+                out.append(f"{spacer}<li>📁 <strong>{label}</strong>\n")
+                _render(contents, path, depth + 1)
+                out.append(f"{spacer}</li>\n")
+            else:
+                out.append(f"{spacer}<li>📁 <strong>{label}</strong> <em>({len(contents)} entries)</em></li>\n")
+                if contents:
+                    collapsed.append(path)
+        hidden = len(names) - min(len(names), limit)
+        if hidden and budget[0] > 0:
+            out.append(f"{spacer}<li><em>… {hidden} more</em></li>\n")
+            paginated.append(rel)
+        out.append(f"{spacer}</ul>\n")
+
+    _render(tree, "", indent)
+    truncated = budget[0] <= 0
+    if truncated:
+        out.append(f"<p><em>Showing the first {max_nodes} entries</em></p>\n")
+    return RenderedTree("".join(out), collapsed, paginated, max_nodes - budget[0], truncated)
 
 def read_file(file_path):
     """Read the content of a file"""
@@ -45,3 +103,40 @@ def write_file(file_path, content):
     """Write content to a file"""
     with open(file_path, 'w', encoding='utf-8') as file:
         file.write(content)
+
+def _synthetic_tree(entries, fanout=20, files_per_dir=50):
+    """Nested dict with about `entries` entries, for benchmarking"""
+    count = [0]
+    def _build(depth):
+        tree = {}
+        for i in range(files_per_dir):
+            if count[0] >= entries:
+                return tree
+            tree[f"file_{i}.py"] = None
+            count[0] += 1
+        if depth < 2:
+            for i in range(fanout):
+                if count[0] >= entries:
+                    break
+                count[0] += 1
+                tree[f"dir_{i}"] = _build(depth + 1)
+        return tree
+    while count[0] < entries:
+        count[0] += 1
+        yield f"root_{count[0]}", _build(0)
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    tree = dict(_synthetic_tree(entries))
+    for label, kwargs in (
+        ("everything", {"page_size": entries, "max_nodes": entries}),
+        ("capped", {}),
+        ("top level only", {"expanded": set()}),
+    ):
+        started = time.perf_counter()
+        rendered = render_tree(tree, **kwargs)
+        elapsed = time.perf_counter() - started
+        print(f"{label:>20}: {rendered.nodes:>7} nodes, {len(rendered.html) / 1024:>8.0f} KB in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+
+# Directories and files no walker should ever descend into or return
+DEFAULT_IGNORES = (
+    ".git/", ".hg/", ".svn/",
+    "__pycache__/", "*.py[cod]",
+    "node_modules/", "bower_components/",
+    ".venv/", "venv/", "/env/", "site-packages/",
+    ".tox/", ".nox/", ".eggs/", "*.egg-info/",
+    ".mypy_cache/", ".pytest_cache/", ".ruff_cache/",
+    ".idea/", ".vscode/",
+    # Anchored: packages may well have their own build/ or dist/ modules
+    "/build/", "/dist/",
+    ".DS_Store", "*~",
+)
+
+
+def _translate(pattern):
+    """Translate a single gitignore glob into a regex body"""
+    i, n = 0, len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 3] == "**/":
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern[i:i + 2] == "**":
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreMatcher:
+    """
+    Compiled .gitignore-style matcher.
+    Supports comments, negation (!), directory-only (trailing /),
+    anchored (leading or inner /) patterns and ** globs.
+    Paths are matched relative to the matcher's root.
+    """
+
+    def __init__(self, patterns=(), root="."):
+        self.root = os.path.abspath(root)
+        self._rules = []  # (regex, negate, dir_only)
+        for raw in patterns:
+            self._add(raw)
+
+    def _add(self, raw):
+        line = raw.rstrip("\n")
+        if not line.strip() or line.startswith("#"):
+            return
+        line = line.rstrip()
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/") if dir_only else line
+        anchored = line.startswith("/") or "/" in line
+        line = line.lstrip("/")
+        if not line:
+            return
+        prefix = "^" if anchored else "^(?:.*/)?"
+        regex = re.compile(prefix + _translate(line) + "$")
+        self._rules.append((regex, negate, dir_only))
+
+    def matches(self, relpath, is_dir=False):
+        """True if `relpath` (relative to root) itself is ignored"""
+        relpath = relpath.replace(os.sep, "/").strip("/")
+        ignored = False
+        for regex, negate, dir_only in self._rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relpath):
+                ignored = not negate
+        return ignored
+
+    def is_ignored(self, path, is_dir=None):
+        """True if `path` or any directory above it (up to root) is ignored"""
+        abspath = os.path.abspath(path)
+        relpath = os.path.relpath(abspath, self.root)
+        if relpath == "." or relpath.startswith(".."):
+            return False
+        if is_dir is None:
+            is_dir = os.path.isdir(abspath)
+        parts = relpath.replace(os.sep, "/").split("/")
+        for depth in range(1, len(parts)):
+            if self.matches("/".join(parts[:depth]), is_dir=True):
+                return True
+        return self.matches(relpath, is_dir=is_dir)
+
+    def walk(self, top=None):
+        """os.walk that prunes ignored directories before descending"""
+        top = top or self.root
+        for dirpath, dirnames, filenames in os.walk(top):
+            reldir = os.path.relpath(dirpath, self.root)
+            reldir = "" if reldir == "." else reldir
+            dirnames[:] = [
+                d for d in dirnames
+                if not self.matches(os.path.join(reldir, d), is_dir=True)
+            ]
+            filenames[:] = [
+                f for f in filenames
+                if not self.matches(os.path.join(reldir, f))
+            ]
+            yield dirpath, dirnames, filenames
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def _gitignore_mtime(root):
+    try:
+        return os.path.getmtime(os.path.join(root, ".gitignore"))
+    except OSError:
+        return None
+
+
+def get_matcher(root):
+    """
+    Return the compiled matcher for `root`: built-in defaults plus the
+    root's .gitignore. Cached per root and rebuilt when .gitignore changes.
+    """
+    root = os.path.abspath(root if os.path.isdir(root) else os.path.dirname(root) or ".")
+    mtime = _gitignore_mtime(root)
+    with _matchers_lock:
+        cached = _matchers.get(root)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    patterns = list(DEFAULT_IGNORES)
+    if mtime is not None:
+        with open(os.path.join(root, ".gitignore"), "r", encoding="utf-8", errors="ignore") as f:
+            patterns.extend(f.read().splitlines())
+    matcher = IgnoreMatcher(patterns, root)
+    with _matchers_lock:
+        _matchers[root] = (mtime, matcher)
+    return matcher
+
+
+def walk(root):
+    """Walk `root` with its cached ignore matcher"""
+    return get_matcher(root).walk(root)
@@ -0,0 +1,177 @@
+import os
+import time
+import threading
+
+from utils.ignore import get_matcher
+
+# Calls within this many seconds of a refresh reuse it without touching disk
+REFRESH_INTERVAL = 1.0
+
+
+class DirNode:
+    """
+    One directory of the index. Its listing is only re-read when the
+    directory's own mtime changes (an entry was added, removed or renamed).
+    In-place edits don't touch that mtime, so file sizes are as of the last
+    listing until TreeIndex.restat() is asked for this directory.
+    """
+    __slots__ = ("name", "mtime_ns", "dirs", "files", "file_count", "total_size", "_tree")
+
+    def __init__(self, name):
+        self.name = name
+        self.mtime_ns = None
+        self.dirs = {}  # name -> DirNode
+        self.files = {}  # name -> size in bytes
+        self.file_count = 0  # recursive
+        self.total_size = 0  # recursive
+        self._tree = None
+
+    def tree(self):
+        """Nested {name: None | {...}} dict, as scan_project_directory returns"""
+        if self._tree is None:
+            tree = {}
+            for name in sorted(set(self.dirs) | set(self.files)):
+                tree[name] = self.dirs[name].tree() if name in self.dirs else None
+            self._tree = tree
+        return self._tree
+
+
+class TreeIndex:
+    """
+    Cached, ignore-aware tree of a project directory with file counts and
+    sizes computed in the same pass. A refresh stats each directory once and
+    re-lists only the subtrees whose signature (directory mtime) changed;
+    restat() brings file sizes up to date where they are actually shown.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.node = DirNode(os.path.basename(self.root))
+        self._matcher = None
+        self._refreshed = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed < REFRESH_INTERVAL:
+                return self
+            matcher = get_matcher(self.root)
+            if matcher is not self._matcher:
+                # .gitignore changed: every listing may filter differently
+                self.node = DirNode(self.node.name)
+                self._matcher = matcher
+            self._refresh(self.node, self.root, "")
+            self._refreshed = time.monotonic()
+        return self
+
+    def _refresh(self, node, path, rel):
+        """Bring `node` up to date; True if anything under it changed"""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        changed = mtime_ns != node.mtime_ns
+        if changed:
+            self._relist(node, path, rel)
+            node.mtime_ns = mtime_ns
+
+        for name, child in node.dirs.items():
+            child_rel = f"{rel}/{name}" if rel else name
+            if self._refresh(child, os.path.join(path, name), child_rel):
+                changed = True
+
+        if changed:
+            node.file_count = len(node.files) + sum(c.file_count for c in node.dirs.values())
+            node.total_size = sum(node.files.values()) + sum(c.total_size for c in node.dirs.values())
+            node._tree = None
+        return changed
+
+    def restat(self, relpaths=None):
+        """
+        Re-read the file sizes of the directories at `relpaths` (root-relative,
+        "" for the root), or of the whole tree when None, and update the
+        totals above them. Unknown directories are ignored.
+        """
+        self.refresh()
+        with self._lock:
+            if relpaths is None:
+                self._restat_tree(self.node, self.root)
+                return self
+            for relpath in relpaths:
+                chain = [self.node]
+                for part in filter(None, relpath.replace(os.sep, "/").split("/")):
+                    child = chain[-1].dirs.get(part)
+                    if child is None:
+                        break
+                    chain.append(child)
+                else:
+                    path = os.path.join(self.root, *[node.name for node in chain[1:]])
+                    if self._restat(chain[-1], path):
+                        for node in reversed(chain):
+                            node.total_size = sum(node.files.values()) + sum(c.total_size for c in node.dirs.values())
+        return self
+
+    def _restat_tree(self, node, path):
+        changed = self._restat(node, path)
+        for name, child in node.dirs.items():
+            if self._restat_tree(child, os.path.join(path, name)):
+                changed = True
+        if changed:
+            node.total_size = sum(node.files.values()) + sum(c.total_size for c in node.dirs.values())
+        return changed
+
+    def _restat(self, node, path):
+        """Update the sizes of `node`'s own files; True if any changed"""
+        changed = False
+        for name, size in node.files.items():
+            try:
+                current = os.stat(os.path.join(path, name)).st_size
+            except OSError:
+                continue  # Gone: the directory's mtime catches that next time
+            if current != size:
+                node.files[name] = current
+                changed = True
+        return changed
+
+    def _relist(self, node, path, rel):
+        dirs, files = {}, {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    entry_rel = f"{rel}/{entry.name}" if rel else entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if self._matcher.matches(entry_rel, is_dir=is_dir):
+                            continue
+                        if is_dir:
+                            # Keep unchanged subtrees; their own mtimes decide
+                            dirs[entry.name] = node.dirs.get(entry.name) or DirNode(entry.name)
+                        else:
+                            files[entry.name] = entry.stat().st_size
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        node.dirs, node.files = dirs, files
+
+    def tree(self):
+        return self.refresh().node.tree()
+
+    @property
+    def file_count(self):
+        return self.refresh().node.file_count
+
+    @property
+    def total_size(self):
+        return self.refresh().node.total_size
+
+    def find(self, relpath):
+        """The DirNode for a root-relative directory, or None"""
+        node = self.refresh().node
+        for part in filter(None, relpath.replace(os.sep, "/").split("/")):
+            node = node.dirs.get(part)
+            if node is None:
+                return None
+        return node
@@ -2,26 +2,11 @@ import os
 from pathlib import Path
 import re
 
+from backend.response_parser import MARKDOWN_HEADER_RE, parse_file_blocks
+
 def parse_generated_content(content):
-    """Parse generated content with improved error handling"""
-    blocks = []
-    current_file = None
-    current_content = []
-    
-    # Try different delimiters
-    for line in content.split('\n'):
-        if line.startswith("FILE:") or line.startswith("File:") or line.startswith("### "):
-            if current_file:
-                blocks.append((current_file, "\n".join(current_content).strip()))
-                current_content = []
-            current_file = re.split(r"FILE:|File:|###", line, 1)[-1].strip()
-        elif current_file:
-            current_content.append(line)
-    
-    if current_file and current_content:
-        blocks.append((current_file, "\n".join(current_content).strip()))
-    
-    return blocks
+    """Parse generated content with FILE:, File: or ### headers"""
+    return parse_file_blocks(content, header_re=MARKDOWN_HEADER_RE)
 
 def main():
     input_path = "multi_output/generated.txt"